@@ -0,0 +1,152 @@
+"""
+Micro-benchmark for code-block extraction from fenced model output.
+
+Compares the single-pass fence scanner (services/fence_scanner.py) with the
+per-language regex searches it replaced, over synthetic outputs of growing
+size:
+
+    python -m bench.fence_bench --sizes 10000,100000,1000000 --repeat 5
+
+Scenarios: "typical" is one html/css/javascript block each, "many" splits
+the same code over many small blocks (the regexes only ever found the
+first), "truncated" stops inside the last block, and "adversarial" is an
+HTML block full of unclosed <script> tags, where each lazy regex attempt
+runs to the end of the text. Time per KB should stay flat for the scanner
+as sizes grow.
+"""
+import argparse
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from services.fence_scanner import FenceScanner, extract_ui_blocks
+
+HTML_LINE = '  <li class="item" id="item-{i}"><span>Task {i}</span><button class="remove">x</button></li>\n'
+CSS_LINE = ".item-{i} {{\n  margin: 0 0 4px;\n  color: #333;\n}}\n"
+JS_LINE = "document.getElementById('item-{i}').addEventListener('click', () => toggle({i}));\n"
+
+
+def _lines(template: str, size: int) -> str:
+    parts: List[str] = []
+    total = 0
+    i = 0
+    while total < size:
+        line = template.format(i=i)
+        parts.append(line)
+        total += len(line)
+        i += 1
+    return "".join(parts)
+
+
+def build_output(scenario: str, size: int) -> str:
+    """Synthetic model output of about `size` characters."""
+    third = max(1, size // 3)
+    if scenario == "adversarial":
+        # No css/javascript blocks, so the inline fallback scans markup full of unclosed tags
+        return "```html\n" + "<script>\n<p>x</p>\n" * (size // 18) + "```\n"
+    if scenario == "many":
+        blocks: List[str] = []
+        for chunk in range(max(1, third // 2000)):
+            blocks.append(f"```html\n{_lines(HTML_LINE, 600)}```\n\n```css\n{_lines(CSS_LINE, 600)}```\n\n"
+                          f"```js\n{_lines(JS_LINE, 600)}```\n\nPart {chunk} done.\n\n")
+        return "".join(blocks)
+    output = (
+        "Here is the implementation.\n\n"
+        f"```html\n{_lines(HTML_LINE, third)}```\n\n"
+        f"```css\n{_lines(CSS_LINE, third)}```\n\n"
+        f"```javascript\n{_lines(JS_LINE, third)}```\n"
+    )
+    if scenario == "truncated":
+        return output[:-5]
+    return output
+
+
+def regex_extract(text: str) -> Dict[str, str]:
+    """The per-language regex searches the scanner replaced, with the inline tag fallback."""
+    html = re.search(r"```html\s*(.*?)\s*```", text, re.DOTALL)
+    css = re.search(r"```css\s*(.*?)\s*```", text, re.DOTALL)
+    js = re.search(r"```javascript\s*(.*?)\s*```", text, re.DOTALL)
+    html_content = html.group(1).strip() if html else ""
+    css_content = css.group(1).strip() if css else ""
+    js_content = js.group(1).strip() if js else ""
+    if not css_content:
+        match = re.search(r"<style>(.*?)</style>", html_content, re.DOTALL)
+        css_content = match.group(1).strip() if match else ""
+    if not js_content:
+        match = re.search(r"<script>(.*?)</script>", html_content, re.DOTALL)
+        js_content = match.group(1).strip() if match else ""
+    return {"html": html_content, "css": css_content, "javascript": js_content}
+
+
+def streamed_extract(text: str, chunk_size: int = 64) -> Dict[str, str]:
+    """The scanner fed in provider-sized chunks, as it would be while streaming."""
+    scanner = FenceScanner()
+    for start in range(0, len(text), chunk_size):
+        scanner.feed(text[start:start + chunk_size])
+    scanner.finish()
+    return {language: "\n\n".join(blocks) for language, blocks in scanner.by_language().items()}
+
+
+EXTRACTORS: Dict[str, Callable[[str], Dict[str, str]]] = {
+    "regex": regex_extract,
+    "scanner": extract_ui_blocks,
+    "scanner-stream": streamed_extract,
+}
+
+
+def time_extractor(extract: Callable[[str], Dict[str, str]], text: str, repeat: int, budget: float) -> float:
+    """Best-of-`repeat` seconds per call, stopping early once a call exceeds `budget` seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extract(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        if elapsed > budget:
+            break
+    return best
+
+
+def main(args: argparse.Namespace) -> int:
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    print(f"{'scenario':<12} {'size':>10} " + " ".join(f"{name:>16}" for name in EXTRACTORS))
+    skip = set()
+    for scenario in scenarios:
+        for size in sizes:
+            text = build_output(scenario, size)
+            cells = []
+            for name, extract in EXTRACTORS.items():
+                if (scenario, name) in skip:
+                    cells.append(f"{'skipped':>16}")
+                    continue
+                seconds = time_extractor(extract, text, args.repeat, args.budget)
+                if seconds > args.budget:
+                    # Larger sizes would only take longer
+                    skip.add((scenario, name))
+                cells.append(f"{seconds * 1000:>9.2f} ms {seconds * 1e6 / max(1, len(text) / 1024):>4.0f}")
+            print(f"{scenario:<12} {len(text):>10} " + " ".join(cells))
+    print("\ncells are best-of-run milliseconds and microseconds per KB")
+
+    # The scanner must find what the regexes found wherever both apply
+    sample = build_output("typical", sizes[0])
+    if extract_ui_blocks(sample) != regex_extract(sample):
+        print("scanner and regex results differ on the typical output", file=sys.stderr)
+        return 1
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Micro-benchmark for fenced code-block extraction")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated output sizes in characters")
+    parser.add_argument("--scenarios", default="typical,many,truncated,adversarial",
+                        help="Comma-separated scenarios to run")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement; the best is reported")
+    parser.add_argument("--budget", type=float, default=10.0,
+                        help="Seconds after which an extractor is skipped for larger sizes")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
@@ -0,0 +1,234 @@
+"""
+End-to-end load benchmark for the backend.
+
+Drives /generate, /generate-prd and /approve-prd at a fixed concurrency and
+reports throughput, latency percentiles and provider calls per request.
+Intended to run against the backend pointed at bench/mock_replicate.py:
+
+    uvicorn bench.mock_replicate:app --port 9000
+    REPLICATE_API_BASE=http://localhost:9000/v1 uvicorn main:app --port 8000
+    python -m bench.load_test --scenarios generate,prd,approve --concurrency 8 --requests 100
+
+Save a run with --output and compare later runs against it with --baseline;
+the exit status is non-zero when a run regresses beyond --max-regression.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import string
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+SCENARIOS = {
+    "generate": "/generate",
+    "prd": "/generate-prd",
+    "approve": "/approve-prd",
+}
+
+SAMPLE_PRD = "1. Overview\nA todo list.\n\n2. Features\n- Add tasks\n- Complete tasks\n"
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def requirement_for(variant: int) -> str:
+    """
+    A requirement made of random words seeded by `variant`. Different
+    variants share almost no words or n-grams, so the similarity index
+    treats them as unrelated and every distinct request is generated fresh.
+    """
+    rng = random.Random(variant)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=8)) for _ in range(6)]
+    return f"Create an app named {' '.join(words)}"
+
+
+def build_payload(scenario: str, index: int, distinct: int, use_cache: bool) -> Dict[str, Any]:
+    # Requirements cycle through `distinct` variants so cache and coalescing
+    # effects can be measured by lowering --unique-ratio
+    requirement = requirement_for(index % distinct)
+    payload: Dict[str, Any] = {"requirement": requirement, "use_cache": use_cache}
+    if scenario == "approve":
+        payload.update(prd=SAMPLE_PRD, approved=True)
+    return payload
+
+
+async def provider_counters(client: httpx.AsyncClient, mock_url: Optional[str]) -> Dict[str, int]:
+    if not mock_url:
+        return {}
+    response = await client.get(f"{mock_url.rstrip('/')}/mock/stats")
+    response.raise_for_status()
+    return response.json()
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    target: str,
+    scenario: str,
+    requests: int,
+    concurrency: int,
+    unique_ratio: float,
+    use_cache: bool,
+    mock_url: Optional[str],
+) -> Dict[str, Any]:
+    """Send `requests` requests for one scenario with `concurrency` in flight."""
+    url = f"{target.rstrip('/')}{SCENARIOS[scenario]}"
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    next_index = iter(range(requests))
+    distinct = max(1, int(round(requests * unique_ratio)))
+
+    async def worker() -> None:
+        for index in next_index:
+            payload = build_payload(scenario, index, distinct, use_cache)
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json=payload)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            if status == "200":
+                latencies.append(elapsed)
+            else:
+                errors[status] = errors.get(status, 0) + 1
+
+    before = await provider_counters(client, mock_url)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+    after = await provider_counters(client, mock_url)
+
+    result: Dict[str, Any] = {
+        "requests": requests,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 3) if duration else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+    if mock_url:
+        creates = after.get("creates", 0) - before.get("creates", 0)
+        result["provider_calls"] = creates
+        result["provider_calls_per_request"] = round(creates / requests, 3) if requests else 0.0
+    return result
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Describe every metric that got worse than the baseline by more than `max_regression` percent."""
+    regressions: List[str] = []
+    # (metric, True when higher is better)
+    metrics: List[Tuple[str, bool]] = [
+        ("throughput_rps", True),
+        ("p50_ms", False),
+        ("p95_ms", False),
+        ("p99_ms", False),
+        ("provider_calls_per_request", False),
+    ]
+    for scenario, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous:
+            continue
+        for metric, higher_is_better in metrics:
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            if (change < -max_regression) if higher_is_better else (change > max_regression):
+                regressions.append(f"{scenario}.{metric}: {old} -> {new} ({change:+.1f}%)")
+    return regressions
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    header = f"{'scenario':<10}{'ok':>6}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'calls/req':>11}"
+    print(header)
+    print("-" * len(header))
+    for scenario, result in results["scenarios"].items():
+        calls = result.get("provider_calls_per_request")
+        print(
+            f"{scenario:<10}{result['succeeded']:>6}{sum(result['errors'].values()):>6}"
+            f"{result['throughput_rps']:>9}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+            f"{calls if calls is not None else '-':>11}"
+        )
+
+
+async def main(args: argparse.Namespace) -> int:
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        results: Dict[str, Any] = {
+            "config": {
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "unique_ratio": args.unique_ratio,
+                "use_cache": not args.no_cache,
+            },
+            "scenarios": {},
+        }
+        for scenario in scenarios:
+            results["scenarios"][scenario] = await run_scenario(
+                client,
+                args.target,
+                scenario,
+                args.requests,
+                args.concurrency,
+                args.unique_ratio,
+                not args.no_cache,
+                args.mock_url,
+            )
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print(f"\nRegressions beyond {args.max_regression}%:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.max_regression}% against {args.baseline}")
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load benchmark for the UI generator backend")
+    parser.add_argument("--target", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("--mock-url", default="http://localhost:9000",
+                        help="Mock provider base URL for call counts ('' to skip)")
+    parser.add_argument("--scenarios", default="generate,prd,approve", help="Comma-separated scenarios to run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per scenario")
+    parser.add_argument("--unique-ratio", type=float, default=1.0,
+                        help="Share of distinct requirements (below 1 repeats requirements)")
+    parser.add_argument("--no-cache", action="store_true", help="Send use_cache=false")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against results saved with --output")
+    parser.add_argument("--max-regression", type=float, default=10.0,
+                        help="Allowed worsening per metric, in percent")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,277 @@
+"""
+Local stand-in for the Replicate predictions API.
+
+Implements just enough of create / get / stream / cancel for LLMService to
+run against it, with configurable latency, failure rates and canned outputs,
+so throughput and latency can be measured without spending credits.
+
+Run it with:
+
+    uvicorn bench.mock_replicate:app --port 9000
+
+and point the backend at it with REPLICATE_API_BASE=http://localhost:9000/v1.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request  # type: ignore
+from fastapi.responses import JSONResponse, StreamingResponse  # type: ignore
+
+from config import env_float, env_int, env_str
+
+UI_OUTPUT = json.dumps({
+    "index.html": (
+        "<!DOCTYPE html>\n<html>\n<head>\n  <link rel=\"stylesheet\" href=\"style.css\">\n</head>\n"
+        "<body>\n  <h1>Todo List</h1>\n  <input id=\"task\">\n  <button id=\"add\">Add</button>\n"
+        "  <ul id=\"list\"></ul>\n  <script src=\"script.js\"></script>\n</body>\n</html>"
+    ),
+    "style.css": "body {\n  font-family: sans-serif;\n  margin: 2rem;\n}\n\nul {\n  padding: 0;\n}",
+    "script.js": (
+        "document.getElementById('add').addEventListener('click', () => {\n"
+        "  const item = document.createElement('li');\n"
+        "  item.textContent = document.getElementById('task').value;\n"
+        "  document.getElementById('list').appendChild(item);\n});"
+    ),
+})
+
+# Patch for edit prompts: anchored on the Add button, which the canned UI always has
+EDIT_OUTPUT = json.dumps({
+    "edits": [
+        {
+            "file": "index.html",
+            "search": "<button id=\"add\">Add</button>",
+            "replace": "<button id=\"add\">Add</button>\n  <button id=\"reset\">Reset</button>",
+        },
+    ],
+})
+
+# Per-file prompts name the one file they want
+_SINGLE_FILE = re.compile(r"Write only the file `([^`]+)`")
+
+# Shared ids and classes for parallel per-file prompts, matching the canned UI
+CONTRACT_OUTPUT = json.dumps({
+    "ids": {"task": "new task input", "add": "add button", "list": "task list"},
+    "classes": {},
+    "data": "list of task strings",
+    "events": ["click on add appends the value of task to list"],
+})
+
+TEXT_OUTPUT = (
+    "# Overview\n\nA small single-page application for the requested feature.\n\n"
+    "## Components\n\n- Input form\n- List view\n- Local state handling\n\n"
+    "## Steps\n\n1. Build the markup\n2. Style the layout\n3. Wire up the interactions\n"
+)
+
+
+class MockSettings:
+    """Behaviour of the mock provider, read from MOCK_* environment variables."""
+
+    def __init__(self):
+        # Prediction latency is log-normal around the median, like real model calls
+        self.latency_median = env_float("MOCK_LATENCY_MEDIAN", 2.0)
+        self.latency_sigma = env_float("MOCK_LATENCY_SIGMA", 0.5)
+        # Share of create calls answered with 429/503 before a prediction exists
+        self.error_rate = env_float("MOCK_ERROR_RATE", 0.0)
+        # Share of predictions that run and then end in "failed"
+        self.failure_rate = env_float("MOCK_FAILURE_RATE", 0.0)
+        # Characters per streamed output token
+        self.token_size = env_int("MOCK_TOKEN_SIZE", 16)
+        self.outputs = {"ui": UI_OUTPUT, "edit": EDIT_OUTPUT, "contract": CONTRACT_OUTPUT, "text": TEXT_OUTPUT}
+        outputs_path = env_str("MOCK_OUTPUTS")
+        if outputs_path:
+            # JSON file with "ui", "edit", "contract" and/or "text" keys overriding the canned outputs
+            with open(outputs_path) as f:
+                self.outputs.update(json.load(f))
+        seed = env_str("MOCK_SEED")
+        self.random = random.Random(int(seed) if seed else None)
+
+    def sample_latency(self) -> float:
+        return self.latency_median * self.random.lognormvariate(0.0, self.latency_sigma)
+
+
+class MockPrediction:
+    """One prediction whose state is derived from the time since it was created."""
+
+    def __init__(self, base_url: str, output: str, latency: float, fails: bool, token_size: int):
+        self.id = uuid.uuid4().hex
+        self.base_url = base_url
+        self.created = time.monotonic()
+        self.latency = latency
+        self.fails = fails
+        self.tokens = [output[i:i + token_size] for i in range(0, len(output), token_size)]
+        self.canceled = False
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.created
+
+    @property
+    def status(self) -> str:
+        if self.canceled:
+            return "canceled"
+        if self.elapsed < self.latency:
+            return "processing"
+        return "failed" if self.fails else "succeeded"
+
+    def output_so_far(self) -> List[str]:
+        """Tokens produced by now; output grows linearly over the prediction's latency."""
+        if self.status == "succeeded":
+            return self.tokens
+        if self.fails:
+            return []
+        produced = int(len(self.tokens) * min(1.0, self.elapsed / self.latency)) if self.latency else len(self.tokens)
+        return self.tokens[:produced]
+
+    def to_dict(self) -> Dict[str, Any]:
+        url = f"{self.base_url}/predictions/{self.id}"
+        return {
+            "id": self.id,
+            "status": self.status,
+            "output": self.output_so_far() or None,
+            "error": "Mock prediction failed" if self.status == "failed" else None,
+            "urls": {"get": url, "stream": f"{url}/stream", "cancel": f"{url}/cancel"},
+        }
+
+
+app = FastAPI(title="Mock Replicate API")
+settings = MockSettings()
+predictions: Dict[str, MockPrediction] = {}
+counters: Dict[str, int] = {}
+
+
+def _count(name: str) -> None:
+    counters[name] = counters.get(name, 0) + 1
+
+
+def _lookup(prediction_id: str) -> MockPrediction:
+    prediction = predictions.get(prediction_id)
+    if prediction is None:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    return prediction
+
+
+def _purge(max_age: float = 600.0) -> None:
+    expired = [key for key, prediction in predictions.items() if prediction.elapsed > max_age]
+    for key in expired:
+        del predictions[key]
+
+
+def _prefer_wait(header: Optional[str]) -> float:
+    """Seconds to block from a "Prefer: wait=N" header (0 when absent)."""
+    if not header or not header.startswith("wait"):
+        return 0.0
+    _, _, value = header.partition("=")
+    return float(value) if value else 60.0
+
+
+@app.post("/v1/models/{owner}/{name}/predictions")
+async def create_prediction(owner: str, name: str, request: Request):
+    _count("creates")
+    if settings.random.random() < settings.error_rate:
+        _count("create_errors")
+        status_code = settings.random.choice([429, 503])
+        return JSONResponse(status_code=status_code, content={"detail": "Mock provider error"})
+
+    body = await request.json()
+    prompt = body.get("input", {}).get("prompt", "")
+    # Edit prompts ask for patches, UI prompts for the three files as JSON,
+    # per-file prompts for one of those files and contract prompts for the
+    # shared ids; everything else gets markdown text
+    single_file = _SINGLE_FILE.search(prompt)
+    if '"edits"' in prompt:
+        output = settings.outputs["edit"]
+    elif single_file:
+        output = json.loads(settings.outputs["ui"]).get(single_file.group(1), "")
+    elif '"index.html"' in prompt:
+        output = settings.outputs["ui"]
+    elif '"ids"' in prompt:
+        output = settings.outputs["contract"]
+    else:
+        output = settings.outputs["text"]
+    base_url = str(request.base_url).rstrip("/") + "/v1"
+    prediction = MockPrediction(
+        base_url,
+        output,
+        settings.sample_latency(),
+        settings.random.random() < settings.failure_rate,
+        settings.token_size,
+    )
+    _purge()
+    predictions[prediction.id] = prediction
+
+    wait = _prefer_wait(request.headers.get("prefer"))
+    if wait:
+        await asyncio.sleep(max(0.0, min(wait, prediction.latency)))
+    return JSONResponse(status_code=201, content=prediction.to_dict())
+
+
+@app.get("/v1/predictions/{prediction_id}")
+async def get_prediction(prediction_id: str):
+    _count("gets")
+    return _lookup(prediction_id).to_dict()
+
+
+@app.post("/v1/predictions/{prediction_id}/cancel")
+async def cancel_prediction(prediction_id: str):
+    _count("cancels")
+    prediction = _lookup(prediction_id)
+    if prediction.status == "processing":
+        prediction.canceled = True
+    return prediction.to_dict()
+
+
+def _sse(event: str, data: str) -> str:
+    lines = "".join(f"data: {line}\n" for line in data.split("\n"))
+    return f"event: {event}\n{lines}\n"
+
+
+async def _stream_events(prediction: MockPrediction) -> AsyncIterator[str]:
+    sent = 0
+    while True:
+        produced = prediction.output_so_far()
+        for token in produced[sent:]:
+            yield _sse("output", token)
+        sent = len(produced)
+
+        status = prediction.status
+        if status == "succeeded":
+            yield _sse("done", "{}")
+            return
+        if status == "failed":
+            yield _sse("error", "Mock prediction failed")
+            return
+        if status == "canceled":
+            yield _sse("done", json.dumps({"reason": "canceled"}))
+            return
+        step = prediction.latency / max(1, len(prediction.tokens))
+        await asyncio.sleep(min(0.25, max(0.005, step)))
+
+
+@app.get("/v1/predictions/{prediction_id}/stream")
+async def stream_prediction(prediction_id: str):
+    _count("streams")
+    prediction = _lookup(prediction_id)
+    return StreamingResponse(_stream_events(prediction), media_type="text/event-stream")
+
+
+@app.get("/mock/stats")
+async def mock_stats():
+    """Call counters, used by the load benchmark to compute provider calls per request."""
+    return {**counters, "live_predictions": len(predictions)}
+
+
+@app.post("/mock/reset")
+async def mock_reset():
+    counters.clear()
+    predictions.clear()
+    return {"reset": True}
+
+
+if __name__ == "__main__":
+    import uvicorn  # type: ignore
+    uvicorn.run(app, host="0.0.0.0", port=env_int("MOCK_PORT", 9000))
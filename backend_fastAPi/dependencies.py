@@ -0,0 +1,39 @@
+# HTTPConnection covers both HTTP requests and WebSocket connections
+from fastapi.requests import HTTPConnection
+
+from services.agent_service import AgentService
+from services.artifact_store import ArtifactStore
+from services.batch_service import BatchRunner
+from services.job_service import JobManager
+from services.llm_service import LLMService
+from services.prd_service import PRDService
+
+
+def get_agent_service(request: HTTPConnection) -> AgentService:
+    """Return the app-wide AgentService created in the lifespan handler."""
+    return request.app.state.agent_service
+
+
+def get_prd_service(request: HTTPConnection) -> PRDService:
+    """Return the app-wide PRDService created in the lifespan handler."""
+    return request.app.state.prd_service
+
+
+def get_llm_service(request: HTTPConnection) -> LLMService:
+    """Return the app-wide LLMService created in the lifespan handler."""
+    return request.app.state.llm_service
+
+
+def get_job_manager(request: HTTPConnection) -> JobManager:
+    """Return the app-wide JobManager created in the lifespan handler."""
+    return request.app.state.job_manager
+
+
+def get_batch_runner(request: HTTPConnection) -> BatchRunner:
+    """Return the app-wide BatchRunner created in the lifespan handler."""
+    return request.app.state.batch_runner
+
+
+def get_artifact_store(request: HTTPConnection) -> ArtifactStore:
+    """Return the app-wide ArtifactStore created in the lifespan handler."""
+    return request.app.state.artifact_store
@@ -1,13 +1,71 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI # type: ignore
 from fastapi.middleware.cors import CORSMiddleware # type: ignore
 
+from config import env_bool, env_str
+from middleware import ServerTimingMiddleware
+from routes.artifacts import router as artifacts_router
+from routes.batch import router as batch_router
 from routes.generate import router as generate_router
+from routes.jobs import router as jobs_router
+from routes.metrics import router as metrics_router
 from routes.prd import router as prd_router
+from routes.session import router as session_router
+from routes.stats import router as stats_router
+from services.agent_service import AgentService
+from services.artifact_store import ArtifactStore
+from services.batch_service import BatchRunner
+from services.http_client import create_http_client
+from services.job_service import JobManager, build_job_handlers
+from services.llm_service import LLMService
+from services.prd_service import PRDService
+from services.response_cache import ResponseCache
+from services.scheduler import LLMScheduler
+from services.session_store import SessionStore
+
+logging.basicConfig(level=env_str("LOG_LEVEL", "INFO").upper())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client and one LLMService are shared by every service
+    http_client = create_http_client()
+    response_cache = ResponseCache.from_env()
+    sessions = SessionStore.from_env()
+    llm_service = LLMService(
+        client=http_client, cache=response_cache, scheduler=LLMScheduler.from_env(), sessions=sessions
+    )
+
+    app.state.http_client = http_client
+    app.state.llm_service = llm_service
+    app.state.agent_service = AgentService(llm_service)
+    app.state.prd_service = PRDService(llm_service)
+    app.state.batch_runner = BatchRunner.from_env()
+    app.state.artifact_store = ArtifactStore.from_env()
+    
+    # Bounded background queue for the async job API
+    job_manager = JobManager.from_env(build_job_handlers(app.state.agent_service, app.state.prd_service))
+    await job_manager.start()
+    app.state.job_manager = job_manager
+    try:
+        yield
+    finally:
+        await job_manager.stop()
+        app.state.agent_service.speculation.close()
+        await http_client.aclose()
+        response_cache.close()
+        sessions.close()
+        app.state.prd_service.store.close()
+        app.state.artifact_store.close()
+
 
 app = FastAPI(
     title="UI Generator AI Agent",
     description="FastAPI backend that acts as an AI agent to generate UI code based on requirements",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -17,11 +75,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+if env_bool("SERVER_TIMING_ENABLED", False):
+    app.add_middleware(ServerTimingMiddleware)
+
 # Include routers
+app.include_router(artifacts_router)
+app.include_router(batch_router)
 app.include_router(generate_router)
 app.include_router(prd_router)
+app.include_router(session_router)
+app.include_router(jobs_router)
+app.include_router(stats_router)
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     import uvicorn # type: ignore
@@ -0,0 +1,38 @@
+from typing import Any, Callable, Dict
+
+from services.metrics import start_request_timings
+
+Scope = Dict[str, Any]
+Message = Dict[str, Any]
+
+
+class ServerTimingMiddleware:
+    """
+    Add a `Server-Timing` header listing the LLM spans and pipeline stages
+    that ran while serving the request.
+
+    Plain ASGI middleware so responses aren't buffered. For streamed
+    responses the header is sent before the work finishes and only covers
+    what ran up to that point (usually just the queue wait).
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = start_request_timings()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                header = timings.header()
+                if header:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", header.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
@@ -1,12 +1,58 @@
 from pydantic import BaseModel, Field # type: ignore
+from typing import List, Literal, Optional
+
+class PipelineOptions(BaseModel):
+    include_analysis: bool = Field(default=True, description="Run the requirement analysis stage")
+    include_plan: bool = Field(default=True, description="Run the implementation planning stage")
+    code_uses_plan: bool = Field(default=False, description="Feed the plan into code generation (code then waits for the plan)")
 
 class GenerateRequest(BaseModel):
     requirement: str = Field(..., description="Description of the UI the user wants to create")
+    pipeline: Optional[PipelineOptions] = Field(default=None, description="Which agent stages to run and how they depend on each other")
+    use_cache: bool = Field(default=True, description="Serve repeated prompts from the LLM response cache; false forces fresh generations")
+    prd_id: Optional[str] = Field(default=None, description="Id of an approved PRD from /generate-prd to implement; skips analysis and plan unless `pipeline` asks for them")
+    prd: Optional[str] = Field(default=None, description="Approved PRD text; overrides the stored one and is used if `prd_id` is unknown or expired")
+    session_id: Optional[str] = Field(default=None, max_length=128, description="Editing session; modification requests update the files this session generated last")
+    known_artifacts: Optional[List[str]] = Field(default=None, description="Artifact hashes the client already holds; those files are left out of `files` and only listed in `artifacts`")
+    bundle: bool = Field(default=False, description="Also store a zip of the files and return its hash as `bundle`")
+
+class BatchGenerateRequest(BaseModel):
+    requirements: List[str] = Field(..., description="Requirements to generate UIs for")
+    pipeline: Optional[PipelineOptions] = Field(default=None, description="Agent stage options applied to every item")
+    use_cache: bool = Field(default=True, description="Serve repeated prompts from the LLM response cache; false forces fresh generations")
+    concurrency: Optional[int] = Field(default=None, ge=1, description="Items processed at once (capped by BATCH_MAX_CONCURRENCY)")
 
 class PRDRequest(BaseModel):
     requirement: str = Field(..., description="User's product requirement")
+    use_cache: bool = Field(default=True, description="Serve repeated prompts from the LLM response cache; false forces fresh generations")
+
+class BatchPRDRequest(BaseModel):
+    requirements: List[str] = Field(..., description="Requirements to write PRDs for")
+    use_cache: bool = Field(default=True, description="Serve repeated prompts from the LLM response cache; false forces fresh generations")
+    concurrency: Optional[int] = Field(default=None, ge=1, description="Items processed at once (capped by BATCH_MAX_CONCURRENCY)")
 
 class PRDApprovalRequest(BaseModel):
-    requirement: str = Field(..., description="Original user requirement")
-    prd: str = Field(..., description="PRD that was generated and approved by the user")
+    prd_id: Optional[str] = Field(default=None, description="Id returned by /generate-prd; the stored requirement and PRD are used")
+    requirement: Optional[str] = Field(default=None, description="Original user requirement (required without prd_id)")
+    prd: Optional[str] = Field(default=None, description="PRD approved by the user (required without prd_id; overrides the stored one, e.g. after edits)")
     approved: bool = Field(..., description="Whether the user approved the PRD")
+    pipeline: Optional[PipelineOptions] = Field(default=None, description="Stages to run; by default analysis and plan are skipped since the PRD covers them")
+    session_id: Optional[str] = Field(default=None, max_length=128, description="Editing session; modification requests update the files this session generated last")
+    use_cache: bool = Field(default=True, description="Serve repeated prompts from the LLM response cache; false forces fresh generations")
+    known_artifacts: Optional[List[str]] = Field(default=None, description="Artifact hashes the client already holds; those files are left out of `files` and only listed in `artifacts`")
+    bundle: bool = Field(default=False, description="Also store a zip of the files and return its hash as `bundle`")
+
+class PRDRejectRequest(BaseModel):
+    prd_id: str = Field(..., description="Id returned by /generate-prd")
+
+class JobRequest(BaseModel):
+    type: Literal["generate", "prd"] = Field(..., description="Kind of work: UI generation or PRD generation")
+    requirement: str = Field(..., description="Requirement to process")
+    pipeline: Optional[PipelineOptions] = Field(default=None, description="Agent stage options for generate jobs")
+    use_cache: bool = Field(default=True, description="Serve repeated prompts from the LLM response cache; false forces fresh generations")
+
+class SessionMessage(BaseModel):
+    type: Literal["turn", "cancel"] = Field(..., description="`turn` edits the session's files (cancelling a turn in flight); `cancel` stops the turn in flight")
+    requirement: Optional[str] = Field(default=None, description="What to change, for `turn` messages")
+    pipeline: Optional[PipelineOptions] = Field(default=None, description="Stages to run; by default turns skip analysis and plan")
+    use_cache: bool = Field(default=True, description="Serve repeated prompts from the LLM response cache; false forces fresh generations")
@@ -1,11 +1,27 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Optional
+from typing import Any, Dict, Optional
 
 class GenerateResponse(BaseModel):
     files: Dict[str, str] = Field(..., description="Generated code files")
     analysis: Optional[str] = Field(default=None, description="Analysis of the requirement")
     plan: Optional[str] = Field(default=None, description="Plan for implementing the UI")
     feedback: Optional[str] = Field(default=None, description="Feedback or suggestions if the requirement isn't clear")
+    timings: Optional[Dict[str, float]] = Field(default=None, description="Wall-clock milliseconds per pipeline stage, plus the total")
+    session_id: Optional[str] = Field(default=None, description="Editing session the files were saved to")
+    artifacts: Optional[Dict[str, str]] = Field(default=None, description="Content hash of every file, fetchable from GET /artifacts/{hash}")
+    bundle: Optional[str] = Field(default=None, description="Hash of a zip of all files, when requested")
+    similar_to: Optional[Dict[str, Any]] = Field(default=None, description="Past requirement the result was served or seeded from, with the action and similarity score")
 
 class PRDResponse(BaseModel):
     prd: str = Field(..., description="Generated Product Requirements Document")
+    prd_id: Optional[str] = Field(default=None, description="Id to pass to /approve-prd instead of re-sending the PRD")
+
+class JobResponse(BaseModel):
+    id: str = Field(..., description="Job identifier to poll with GET /jobs/{id}")
+    type: str = Field(..., description="Kind of work: generate or prd")
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    created_at: float = Field(..., description="Submission time (unix seconds)")
+    started_at: Optional[float] = Field(default=None, description="Time a worker picked the job up")
+    finished_at: Optional[float] = Field(default=None, description="Completion time")
+    result: Optional[Dict[str, Any]] = Field(default=None, description="GenerateResponse or PRDResponse body once succeeded")
+    error: Optional[str] = Field(default=None, description="Error message if the job failed")
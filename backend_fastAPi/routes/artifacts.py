@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from typing import Dict, List
+
+from services.artifact_store import ArtifactStore, brotli
+from dependencies import get_artifact_store
+
+router = APIRouter(tags=["artifacts"])
+
+
+def _accepted_encodings(header: str) -> List[str]:
+    """Content codings the client accepts (q > 0), in the order we prefer them."""
+    weights: Dict[str, float] = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name.strip().lower()] = q
+    preferred = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return [encoding for encoding in preferred if weights.get(encoding, weights.get("*", 0.0)) > 0]
+
+
+def _etag_matches(header: str, digest: str) -> bool:
+    tags = [tag.strip() for tag in header.split(",")]
+    # Every encoding of an artifact has the same content, so any of its tags matches
+    return "*" in tags or any(tag.lstrip("W/").strip('"').split("-")[0] == digest for tag in tags)
+
+
+@router.get("/artifacts/{digest}")
+async def get_artifact(
+    digest: str,
+    request: Request,
+    artifact_store: ArtifactStore = Depends(get_artifact_store),
+) -> Response:
+    """
+    Return a generated file or zip bundle by the hash listed in a response's
+    `artifacts` or `bundle`. Content never changes for a hash, so responses
+    carry a strong ETag, are cacheable forever and honor If-None-Match.
+    Bodies are compressed with brotli or gzip per Accept-Encoding.
+    """
+    artifact = await artifact_store.get(digest)
+    if artifact is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown or expired artifact")
+
+    encoding = "identity"
+    if artifact.compressible:
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = accepted[0] if accepted else "identity"
+    # Each encoding is a different byte sequence, so it gets its own strong tag
+    etag = f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept-Encoding",
+    }
+    if artifact.filename and artifact.filename.endswith(".zip"):
+        headers["Content-Disposition"] = f'attachment; filename="ui-{digest[:12]}.zip"'
+
+    if _etag_matches(request.headers.get("if-none-match", ""), digest):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = await artifact_store.encoded(artifact, encoding)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=artifact.media_type, headers=headers)
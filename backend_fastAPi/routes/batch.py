@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional
+import json
+import logging
+
+from models.request_models import BatchGenerateRequest, BatchPRDRequest
+from services.agent_service import AgentService
+from services.batch_service import BatchRunner, BatchTooLargeError, BatchWorker
+from services.prd_service import PRDService
+from services.scheduler import Priority
+from dependencies import get_agent_service, get_batch_runner, get_prd_service
+
+router = APIRouter(tags=["batch"])
+logger = logging.getLogger(__name__)
+
+
+def _batch_response(
+    runner: BatchRunner,
+    items: List[str],
+    worker: BatchWorker,
+    concurrency: Optional[int],
+) -> StreamingResponse:
+    """Stream a batch as NDJSON: one line per finished item, then a summary line."""
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Batch cannot be empty")
+    try:
+        runner.check(items)
+    except BatchTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+
+    async def lines() -> AsyncIterator[str]:
+        counts = {"succeeded": 0, "failed": 0}
+        async for entry in runner.run(items, worker, concurrency):
+            counts[entry["status"]] += 1
+            yield json.dumps(entry) + "\n"
+        yield json.dumps({"done": True, "total": len(items), **counts}) + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _require_text(requirement: str) -> None:
+    if not requirement or not requirement.strip():
+        raise ValueError("Requirement cannot be empty")
+
+
+@router.post("/generate/batch")
+async def generate_batch(
+    request: BatchGenerateRequest,
+    agent_service: AgentService = Depends(get_agent_service),
+    batch_runner: BatchRunner = Depends(get_batch_runner),
+) -> StreamingResponse:
+    """
+    Generate UIs for many requirements, streaming NDJSON as items finish.
+
+    Each line is `{"index", "status": "succeeded", "result": GenerateResponse}`
+    or `{"index", "status": "failed", "error"}`; the last line is
+    `{"done": true, "total", "succeeded", "failed"}`.
+    """
+    async def worker(requirement: str) -> Dict[str, Any]:
+        _require_text(requirement)
+        # Batches are bulk work; let interactive requests go first
+        return await agent_service.process_requirement(
+            requirement, request.pipeline, use_cache=request.use_cache, priority=Priority.BACKGROUND
+        )
+
+    return _batch_response(batch_runner, request.requirements, worker, request.concurrency)
+
+
+@router.post("/generate-prd/batch")
+async def generate_prd_batch(
+    request: BatchPRDRequest,
+    prd_service: PRDService = Depends(get_prd_service),
+    batch_runner: BatchRunner = Depends(get_batch_runner),
+) -> StreamingResponse:
+    """
+    Write PRDs for many requirements, streaming NDJSON as items finish.
+
+    Results are PRDResponse bodies (with `prd_id` for /approve-prd); the line
+    format is the same as /generate/batch.
+    """
+    async def worker(requirement: str) -> Dict[str, Any]:
+        _require_text(requirement)
+        # Batches are bulk work; let interactive requests go first
+        record = await prd_service.create_prd(
+            requirement, use_cache=request.use_cache, priority=Priority.BACKGROUND
+        )
+        return {"prd": record.prd, "prd_id": record.id}
+
+    return _batch_response(batch_runner, request.requirements, worker, request.concurrency)
@@ -1,22 +1,39 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, AsyncIterator
 import logging
 import json
 
 from models.request_models import GenerateRequest
 from models.response_models import GenerateResponse
+from routes.prd import resolve_prd
 from services.agent_service import AgentService
+from services.artifact_store import ArtifactStore
+from services.cancellation import (
+    ClientDisconnectedError, DeadlineExceededError, iterate_with_deadline, request_deadline, run_cancellable,
+)
 from services.llm_service import LLMServiceError
+from services.prd_service import PRDService
+from services.token_budget import PromptTooLargeError
+from dependencies import get_agent_service, get_artifact_store, get_prd_service
 
 router = APIRouter(tags=["generate"])
 
-agent_service = AgentService()
 logger = logging.getLogger(__name__)
 
 @router.post("/generate", response_model=GenerateResponse, status_code=status.HTTP_200_OK)
-async def generate_ui(request: GenerateRequest) -> GenerateResponse:
+async def generate_ui(
+    request: GenerateRequest,
+    http_request: Request,
+    agent_service: AgentService = Depends(get_agent_service),
+    prd_service: PRDService = Depends(get_prd_service),
+    artifact_store: ArtifactStore = Depends(get_artifact_store),
+) -> GenerateResponse:
     """
-    Generate UI (HTML, CSS, JavaScript) based on the provided requirement
+    Generate UI (HTML, CSS, JavaScript) based on the provided requirement,
+    or on an approved PRD when `prd_id` is given. Every file is also stored
+    by content hash (`artifacts`); files in `known_artifacts` are not resent.
+    The work is cancelled if the client disconnects or REQUEST_DEADLINE passes.
     """
     try:
         if not request.requirement or not request.requirement.strip():
@@ -25,14 +42,32 @@ async def generate_ui(request: GenerateRequest) -> GenerateResponse:
                 detail="Requirement cannot be empty"
             )
             
+        _, prd = await resolve_prd(prd_service, request.prd_id, request.requirement, request.prd)
+        
         # Process the requirement through the agent service
-        result = await agent_service.process_requirement(request.requirement)
+        result = await run_cancellable(
+            agent_service.process_requirement(
+                request.requirement, request.pipeline, use_cache=request.use_cache, prd=prd,
+                session_id=request.session_id, prd_id=request.prd_id
+            ),
+            http_request, request_deadline(), route="/generate"
+        )
         
         # Pretty print for debugging
         logger.debug("Generated code:\n" + json.dumps(result, indent=2))
         
+        await artifact_store.attach(result, request.known_artifacts, request.bundle)
         return GenerateResponse(**result)
         
+    except HTTPException:
+        raise
+    except PromptTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ClientDisconnectedError as e:
+        # Nobody is listening; the status only shows up in access logs
+        raise HTTPException(status_code=499, detail=str(e))
+    except DeadlineExceededError as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
     except LLMServiceError as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -44,3 +79,63 @@ async def generate_ui(request: GenerateRequest) -> GenerateResponse:
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred: {str(e)}"
         )
+
+
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Serialize one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/generate/stream")
+async def generate_ui_stream(
+    request: GenerateRequest,
+    agent_service: AgentService = Depends(get_agent_service),
+    prd_service: PRDService = Depends(get_prd_service),
+    artifact_store: ArtifactStore = Depends(get_artifact_store),
+) -> StreamingResponse:
+    """
+    Stream UI generation as server-sent events.
+
+    Emits `stage` events as analysis, plan and files start/finish, `analysis`
+    and `plan` text deltas, `file` events with incremental file content, a
+    final `result` event shaped like GenerateResponse, then `done`. Failures
+    after the stream has started are reported as an `error` event. With
+    `prd_id` the code is generated from that approved PRD. The `result`
+    lists file hashes and, like /generate, leaves out `known_artifacts`.
+    Closing the connection cancels the generation; past REQUEST_DEADLINE it
+    is cancelled and reported as an `error` event.
+    """
+    if not request.requirement or not request.requirement.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Requirement cannot be empty"
+        )
+    try:
+        agent_service.check_requirement(request.requirement)
+    except PromptTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    _, prd = await resolve_prd(prd_service, request.prd_id, request.requirement, request.prd)
+    
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            events = agent_service.stream_requirement(
+                request.requirement, request.pipeline, use_cache=request.use_cache, prd=prd,
+                session_id=request.session_id, prd_id=request.prd_id
+            )
+            async for event, data in iterate_with_deadline(events, request_deadline(), route="/generate/stream"):
+                if event == "result":
+                    await artifact_store.attach(data, request.known_artifacts, request.bundle)
+                yield _format_sse(event, data)
+        except DeadlineExceededError as e:
+            yield _format_sse("error", {"detail": str(e)})
+        except LLMServiceError as e:
+            yield _format_sse("error", {"detail": f"LLM service error: {str(e)}"})
+        except Exception as e:
+            logger.error(f"Unexpected error while streaming: {str(e)}")
+            yield _format_sse("error", {"detail": f"An unexpected error occurred: {str(e)}"})
+        yield _format_sse("done", {})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
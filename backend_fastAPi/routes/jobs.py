@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+import logging
+
+from models.request_models import JobRequest
+from models.response_models import JobResponse
+from services.job_service import JobManager, QueueFullError
+from dependencies import get_job_manager
+
+router = APIRouter(tags=["jobs"])
+logger = logging.getLogger(__name__)
+
+@router.post("/jobs", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(
+    request: JobRequest,
+    response: Response,
+    job_manager: JobManager = Depends(get_job_manager),
+) -> JobResponse:
+    """
+    Queue a UI or PRD generation job and return immediately; poll GET /jobs/{id} for the result
+    """
+    if not request.requirement or not request.requirement.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Requirement cannot be empty"
+        )
+    
+    try:
+        job = job_manager.submit(request.type, {
+            "requirement": request.requirement,
+            "pipeline": request.pipeline,
+            "use_cache": request.use_cache,
+        })
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return JobResponse(**job.to_dict())
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    job_manager: JobManager = Depends(get_job_manager),
+) -> JobResponse:
+    """
+    Current status of a job, including its result once finished
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found or expired"
+        )
+    return JobResponse(**job.to_dict())
@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from typing import List
+
+from services.job_service import JobManager
+from services.llm_service import LLMService
+from services.metrics import REGISTRY, format_metric
+from services.scheduler import Priority
+from dependencies import get_job_manager, get_llm_service
+
+router = APIRouter(tags=["stats"])
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def runtime_metrics(llm_service: LLMService, job_manager: JobManager) -> List[str]:
+    """Export the counters kept by the cache, scheduler, transport, model router and job queue."""
+    cache = llm_service.cache.stats()
+    singleflight = llm_service.singleflight.stats()
+    scheduler = llm_service.scheduler.stats()
+    transport = llm_service.transport_stats()
+    models = llm_service.router.stats()["models"]
+    jobs = job_manager.stats()
+    lines: List[str] = []
+    lines += format_metric("llm_cache_lookups_total", "counter", "Response cache lookups by result", [
+        # Disk hits are part of `hits`; each lookup is counted under exactly one result
+        ({"result": "memory_hit"}, cache["hits"] - cache["disk_hits"]),
+        ({"result": "disk_hit"}, cache["disk_hits"]),
+        ({"result": "miss"}, cache["misses"]),
+    ])
+    lines += format_metric("llm_cache_evictions_total", "counter", "Entries evicted from the response cache", [
+        ({}, cache["evictions"]),
+    ])
+    lines += format_metric("llm_cache_entries", "gauge", "Entries held in the in-memory cache", [
+        ({}, cache["memory_entries"]),
+    ])
+    lines += format_metric("llm_coalesced_calls_total", "counter", "Calls by single-flight role", [
+        ({"role": "leader"}, singleflight["leaders"]),
+        ({"role": "deduplicated"}, singleflight["deduplicated"]),
+        ({"role": "abandoned"}, singleflight["abandoned"]),
+    ])
+    lines += format_metric("llm_scheduler_active", "gauge", "Provider calls holding a scheduler slot", [
+        ({}, scheduler["active"]),
+    ])
+    lines += format_metric("llm_scheduler_queued", "gauge", "Provider calls waiting for a slot", [
+        ({"priority": priority.name.lower()}, scheduler["queued"][priority.name.lower()]) for priority in Priority
+    ])
+    lines += format_metric("llm_rate_limited_total", "counter", "Times a call waited on the rate limiter", [
+        ({}, scheduler["throttled"]),
+    ])
+    lines += format_metric("llm_retries_total", "counter", "Prediction creates retried after a transient error", [
+        ({}, transport["retries"]),
+    ])
+    lines += format_metric("llm_hedges_total", "counter", "Hedged requests issued and won", [
+        ({"result": "issued"}, transport["hedges"]),
+        ({"result": "won"}, transport["hedge_wins"]),
+    ])
+    lines += format_metric("llm_circuit_state", "gauge", "Circuit breaker state per model (0 closed, 1 half-open, 2 open)", [
+        ({"model": model}, CIRCUIT_STATES[stats["circuit"]["state"]]) for model, stats in models.items()
+    ])
+    lines += format_metric("llm_circuit_rejected_total", "counter", "Calls rejected by a model's open circuit", [
+        ({"model": model}, stats["circuit"]["rejected"]) for model, stats in models.items()
+    ])
+    lines += format_metric("llm_model_calls_total", "counter", "Provider calls per model by outcome", [
+        sample for model, stats in models.items() for sample in (
+            ({"model": model, "outcome": "success"}, stats["calls"] - stats["errors"]),
+            ({"model": model, "outcome": "error"}, stats["errors"]),
+        )
+    ])
+    lines += format_metric("llm_model_fallback_calls_total", "counter", "Calls served by a model as a fallback", [
+        ({"model": model}, stats["fallback_calls"]) for model, stats in models.items()
+    ])
+    lines += format_metric("llm_model_tokens_total", "counter", "Estimated tokens per model", [
+        sample for model, stats in models.items() for sample in (
+            ({"model": model, "direction": "prompt"}, stats["prompt_tokens"]),
+            ({"model": model, "direction": "output"}, stats["output_tokens"]),
+        )
+    ])
+    lines += format_metric("llm_model_cost_usd_total", "counter", "Estimated spend per priced model", [
+        ({"model": model}, stats["cost_usd"]) for model, stats in models.items() if stats["cost_usd"] is not None
+    ])
+    lines += format_metric("jobs_queued", "gauge", "Jobs waiting in the queue", [({}, jobs["queued"])])
+    lines += format_metric("jobs_running", "gauge", "Jobs being processed", [({}, jobs["running"])])
+    lines += format_metric("jobs_total", "counter", "Finished or rejected jobs by outcome", [
+        ({"outcome": "completed"}, jobs["completed"]),
+        ({"outcome": "failed"}, jobs["failed"]),
+        ({"outcome": "rejected"}, jobs["rejected"]),
+    ])
+    return lines
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(
+    llm_service: LLMService = Depends(get_llm_service),
+    job_manager: JobManager = Depends(get_job_manager),
+) -> PlainTextResponse:
+    """
+    Prometheus metrics: stage and span latencies, prompt/response sizes and runtime counters
+    """
+    body = REGISTRY.render() + "\n".join(runtime_metrics(llm_service, job_manager)) + "\n"
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
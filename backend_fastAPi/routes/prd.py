@@ -1,37 +1,110 @@
-from fastapi import APIRouter, HTTPException, status
-from models.request_models import PRDRequest, PRDApprovalRequest
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from models.request_models import PRDRequest, PRDApprovalRequest, PRDRejectRequest
 from models.response_models import PRDResponse, GenerateResponse
 from services.prd_service import PRDService
 from services.agent_service import AgentService
+from services.artifact_store import ArtifactStore
+from services.cancellation import ClientDisconnectedError, DeadlineExceededError, request_deadline, run_cancellable
 from services.llm_service import LLMServiceError
+from services.token_budget import PromptTooLargeError
+from typing import Optional, Tuple
+from dependencies import get_agent_service, get_artifact_store, get_prd_service
 import logging
 
 router = APIRouter(tags=["prd"])
-prd_service = PRDService()
-agent_service = AgentService()
 logger = logging.getLogger(__name__)
 
 @router.post("/generate-prd", response_model=PRDResponse)
-async def generate_prd(request: PRDRequest):
+async def generate_prd(
+    request: PRDRequest,
+    prd_service: PRDService = Depends(get_prd_service),
+    agent_service: AgentService = Depends(get_agent_service),
+):
+    """
+    Write a PRD for the requirement. With SPECULATIVE_ENABLED, the UI is
+    generated from it in the background while the user reviews it.
+    """
     try:
-        prd = await prd_service.generate_prd(request.requirement)
-        return PRDResponse(prd=prd)
+        record = await prd_service.create_prd(request.requirement, use_cache=request.use_cache)
+        agent_service.speculate(record.id, record.requirement, record.prd)
+        return PRDResponse(prd=record.prd, prd_id=record.id)
+    except PromptTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/approve-prd", response_model=GenerateResponse)
-async def approve_prd(request: PRDApprovalRequest):
+async def approve_prd(
+    request: PRDApprovalRequest,
+    http_request: Request,
+    agent_service: AgentService = Depends(get_agent_service),
+    prd_service: PRDService = Depends(get_prd_service),
+    artifact_store: ArtifactStore = Depends(get_artifact_store),
+):
+    """
+    Generate the UI from an approved PRD, referenced by `prd_id` or sent in full.
+    The PRD replaces the analysis stage, so by default only code generation runs.
+    The work is cancelled if the client disconnects or REQUEST_DEADLINE passes.
+    """
     try:
         if not request.approved:
+            if request.prd_id:
+                agent_service.speculation.cancel(request.prd_id)
             raise HTTPException(status_code=400, detail="PRD was not approved")
         
-        # Process the requirement through the agent service
-        result = await agent_service.process_requirement(request.requirement)
+        requirement, prd = await resolve_prd(prd_service, request.prd_id, request.requirement, request.prd)
+        result = await run_cancellable(
+            agent_service.process_requirement(
+                requirement, request.pipeline, use_cache=request.use_cache, prd=prd,
+                session_id=request.session_id, prd_id=request.prd_id
+            ),
+            http_request, request_deadline(), route="/approve-prd"
+        )
         logger.debug(f"Generated UI result: {result}")
+        await artifact_store.attach(result, request.known_artifacts, request.bundle)
         return GenerateResponse(**result)
         
+    except HTTPException:
+        raise
+    except PromptTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ClientDisconnectedError as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except DeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except LLMServiceError as e:
         raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in approve_prd: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/reject-prd", status_code=status.HTTP_204_NO_CONTENT)
+async def reject_prd(
+    request: PRDRejectRequest,
+    agent_service: AgentService = Depends(get_agent_service),
+) -> Response:
+    """Discard a PRD the user rejected, cancelling any UI generation started for it."""
+    agent_service.speculation.cancel(request.prd_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+async def resolve_prd(
+    prd_service: PRDService,
+    prd_id: Optional[str],
+    requirement: Optional[str],
+    prd: Optional[str],
+) -> Tuple[str, Optional[str]]:
+    """
+    Requirement and PRD text for a request: stored values for `prd_id`,
+    overridden by anything the client sent. An unknown id raises 404 unless
+    the client sent the requirement and PRD to fall back on.
+    """
+    if prd_id:
+        record = await prd_service.get_prd(prd_id)
+        if record is None:
+            if prd and requirement and requirement.strip():
+                return requirement, prd
+            raise HTTPException(status_code=404, detail="PRD not found or expired")
+        return requirement or record.requirement, prd or record.prd
+    if not requirement or not requirement.strip():
+        raise HTTPException(status_code=400, detail="Either prd_id or requirement is required")
+    return requirement, prd
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+from typing import Optional
+import logging
+import uuid
+
+from models.request_models import SessionMessage
+from services.agent_service import AgentService
+from services.artifact_store import ArtifactStore
+from services.edit_session import EditSession
+from services.metrics import SESSION_BYTES
+from dependencies import get_agent_service, get_artifact_store
+
+router = APIRouter(tags=["session"])
+
+logger = logging.getLogger(__name__)
+
+@router.websocket("/ws/session")
+async def session_socket(
+    websocket: WebSocket,
+    session_id: Optional[str] = None,
+    agent_service: AgentService = Depends(get_agent_service),
+    artifact_store: ArtifactStore = Depends(get_artifact_store),
+) -> None:
+    """
+    Edit a session's UI over one WebSocket, a chat turn at a time.
+
+    Connect with `?session_id=` to continue a session (e.g. one started on
+    /generate/stream) or without it to start a new one. The server first
+    sends a `session` message with the id and the current files. Client
+    messages are SessionMessage JSON: `{"type": "turn", "requirement": ...}`
+    applies a change to the session's files, cancelling any turn still
+    running, and `{"type": "cancel"}` stops the running turn.
+
+    Server messages are `{"type", "turn", "data"}` carrying the same events
+    as /generate/stream: `stage`, `analysis`, `plan`, `file`, `result`,
+    `error` and `done`, plus `cancelled`. `file` events only cover files
+    that changed, the first one per file with `reset`, and the `result`
+    lists hashes instead of file contents.
+    """
+    if session_id is not None and not 0 < len(session_id) <= 128:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    session = EditSession(session_id or uuid.uuid4().hex, agent_service, artifact_store, websocket.send_json)
+    try:
+        await session.open()
+        while True:
+            raw = await websocket.receive_text()
+            SESSION_BYTES.inc(len(raw), direction="received")
+            try:
+                message = SessionMessage.model_validate_json(raw)
+            except ValidationError as e:
+                await session.send("error", {"detail": f"Invalid message: {str(e)}"})
+                continue
+
+            if message.type == "cancel":
+                await session.cancel()
+            elif not message.requirement or not message.requirement.strip():
+                await session.send("error", {"detail": "Requirement cannot be empty"})
+            else:
+                await session.start_turn(message.requirement, message.pipeline, message.use_cache)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends
+from typing import Dict, Any
+
+from services.agent_service import AgentService
+from services.artifact_store import ArtifactStore
+from services.batch_service import BatchRunner
+from services.job_service import JobManager
+from services.llm_service import LLMService
+from services.prd_service import PRDService
+from dependencies import get_agent_service, get_artifact_store, get_batch_runner, get_job_manager, get_llm_service, get_prd_service
+
+router = APIRouter(tags=["stats"])
+
+@router.get("/stats")
+async def get_stats(
+    llm_service: LLMService = Depends(get_llm_service),
+    job_manager: JobManager = Depends(get_job_manager),
+    prd_service: PRDService = Depends(get_prd_service),
+    batch_runner: BatchRunner = Depends(get_batch_runner),
+    agent_service: AgentService = Depends(get_agent_service),
+    artifact_store: ArtifactStore = Depends(get_artifact_store),
+) -> Dict[str, Any]:
+    """
+    Runtime counters for the LLM layer and job queue (cache hit rates, coalesced calls, per-model latency and cost etc.)
+    """
+    return {
+        "cache": llm_service.cache.stats(),
+        "singleflight": llm_service.singleflight.stats(),
+        "scheduler": llm_service.scheduler.stats(),
+        "transport": llm_service.transport_stats(),
+        "models": llm_service.router.stats(),
+        "jobs": job_manager.stats(),
+        "prds": prd_service.store.stats(),
+        "sessions": llm_service.sessions.stats(),
+        "batches": batch_runner.stats(),
+        "similarity": agent_service.similarity.stats(),
+        "speculation": agent_service.speculation.stats(),
+        "artifacts": artifact_store.stats(),
+    }
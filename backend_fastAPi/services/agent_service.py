@@ -1,42 +1,302 @@
-import re
-from typing import Dict, Any, Optional
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional, AsyncIterator, Callable, List, Tuple
+from models.request_models import PipelineOptions
+from services.completion import ANALYSIS_POLICY
+from services.fence_scanner import extract_ui_blocks
 from services.llm_service import LLMService, LLMServiceError
+from services.patching import PatchError
+from services.pipeline import Pipeline, Stage
+from services.scheduler import Priority
+from services.similarity_index import SimilarityIndex
+from services.speculation import SpeculativeRunner
+
+logger = logging.getLogger(__name__)
+
+# With an approved PRD the analysis is already done; go straight to code
+PRD_PIPELINE = PipelineOptions(include_analysis=False, include_plan=False)
 
 class AgentService:
     """Service that implements AI agent behavior for UI generation."""
     
-    def __init__(self):
-        self.llm_service = LLMService()
+    def __init__(
+        self,
+        llm_service: Optional[LLMService] = None,
+        similarity: Optional[SimilarityIndex] = None,
+        speculation: Optional[SpeculativeRunner] = None,
+    ):
+        self.llm_service = llm_service or LLMService()
+        self.similarity = similarity if similarity is not None else SimilarityIndex.from_env()
+        self.speculation = speculation if speculation is not None else SpeculativeRunner.from_env()
         
-    async def process_requirement(self, requirement: str) -> Dict[str, Any]:
+    async def process_requirement(
+        self,
+        requirement: str,
+        options: Optional[PipelineOptions] = None,
+        use_cache: bool = True,
+        prd: Optional[str] = None,
+        session_id: Optional[str] = None,
+        prd_id: Optional[str] = None,
+        priority: Priority = Priority.NORMAL,
+    ) -> Dict[str, Any]:
+        """
+        Generate the UI for a requirement. With an approved `prd` the code is
+        built from it and, unless `options` say otherwise, the analysis and
+        plan calls are skipped; if `prd_id` was speculated on (see
+        `speculate`), that generation's result is used. With a `session_id`, a modification request
+        is applied to the files that session last generated, and the new
+        files become the session's current ones. Other requirements are
+        looked up among past ones: a near-identical match's result is
+        returned as is and a close match's files are patched instead of
+        generating from scratch (see SimilarityIndex).
+        """
+        self.check_requirement(requirement)
         try:
-            # First check if this is a modification request
-            is_modification = self._is_modification_request(requirement)
-            
-            # Analyze the requirement
-            analysis = await self._analyze_requirement(requirement, is_modification)
-            
-            # Create implementation plan
-            plan = await self._plan_implementation(requirement, analysis, is_modification)
-            
-            # Generate UI code files
-            generated_code = await self.llm_service.generate_ui(requirement)
-            
-            # Return complete response with analysis and plan
-            return {
-                "files": {
-                    "index.html": generated_code.get("index.html", ""),
-                    "style.css": generated_code.get("style.css", ""),
-                    "script.js": generated_code.get("script.js", "")
-                },
-                "analysis": analysis,
-                "plan": plan,
-                "feedback": None  # Add feedback if needed
-            }
+            start = time.perf_counter()
+            previous, similar = await self._starting_point(requirement, session_id, use_cache, prd, options=options)
+            if similar is not None and similar["action"] == "serve":
+                result = self._served_result(similar, start)
+                await self._record_turn(session_id, requirement, result)
+                return result
+            result = await self._claim_speculation(requirement, options, use_cache, prd, prd_id, previous, start)
+            if result is not None:
+                await self._record_turn(session_id, requirement, result)
+                return result
+            
+            # Analysis, plan and code generation run as a dependency graph;
+            # stages that don't depend on each other run concurrently
+            pipeline = self._build_pipeline(
+                requirement, self._options(options, prd), use_cache=use_cache, prd=prd, previous=previous,
+                priority=priority
+            )
+            results, timings = await pipeline.run()
+            
+            # Return complete response with analysis, plan and stage timings
+            result = self._build_result(results["files"], results.get("analysis"), results.get("plan"))
+            self._remember(requirement, result, previous, similar, prd, options)
+            result["timings"] = timings
+            await self._record_turn(session_id, requirement, result)
+            return result
             
         except Exception as e:
             raise LLMServiceError(f"Failed to process requirement: {str(e)}")
     
+    async def _session_files(self, session_id: Optional[str]) -> Optional[Dict[str, str]]:
+        """The files a session generated last, if any."""
+        if not session_id:
+            return None
+        return await self.llm_service.sessions.files(session_id)
+    
+    async def _starting_point(
+        self,
+        requirement: str,
+        session_id: Optional[str],
+        use_cache: bool,
+        prd: Optional[str],
+        edit: bool = False,
+        options: Optional[PipelineOptions] = None,
+    ) -> Tuple[Optional[Dict[str, str]], Optional[Dict[str, Any]]]:
+        """
+        Return (files to modify, similar match) for a requirement.
+
+        A modification request (with `edit`, any requirement) builds on the
+        session's files. Anything else
+        is looked up in the similarity index; the match is returned as
+        `{"action": "serve" | "seed", "requirement", "score", "result"}` and a
+        seed's files become the ones to modify. A result is only served to a
+        request with the same pipeline options, since those decide its
+        analysis and plan. Requests that bypass the cache or build from an
+        approved PRD always generate fresh.
+        """
+        if edit or self._is_modification_request(requirement):
+            previous = await self._session_files(session_id)
+            if previous:
+                return previous, None
+        if not use_cache or prd:
+            return None, None
+        action, entry, score = self.similarity.lookup(requirement, self._similarity_variant(options))
+        if entry is None:
+            return None, None
+        logger.info(f"Requirement is {score:.2f} similar to a past one; action={action}")
+        similar = {"action": action, "requirement": entry.requirement, "score": round(score, 4), "result": entry.result}
+        return (entry.result["files"] if action == "seed" else None), similar
+    
+    def speculate(self, prd_id: str, requirement: str, prd: str) -> bool:
+        """
+        Start generating the UI for a PRD in the background while the user
+        reviews it, at background priority. Returns whether it was started.
+        """
+        return self.speculation.start(
+            prd_id, requirement, prd,
+            lambda: self.process_requirement(requirement, prd=prd, priority=Priority.BACKGROUND),
+        )
+    
+    async def _claim_speculation(
+        self,
+        requirement: str,
+        options: Optional[PipelineOptions],
+        use_cache: bool,
+        prd: Optional[str],
+        prd_id: Optional[str],
+        previous: Optional[Dict[str, str]],
+        start: float,
+    ) -> Optional[Dict[str, Any]]:
+        """The speculative result for an approved PRD, if it matches this request."""
+        # Speculation ran the default PRD pipeline on fresh files with the cache on
+        if not prd_id or not prd or options is not None or not use_cache or previous is not None:
+            return None
+        result = await self.speculation.claim(prd_id, requirement, prd)
+        if result is not None:
+            result["timings"]["speculation_wait"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+    
+    def _served_result(self, similar: Dict[str, Any], start: float) -> Dict[str, Any]:
+        result = similar.pop("result")
+        result["similar_to"] = similar
+        result["timings"] = {"total": round((time.perf_counter() - start) * 1000, 1)}
+        return result
+    
+    def _remember(
+        self,
+        requirement: str,
+        result: Dict[str, Any],
+        previous: Optional[Dict[str, str]],
+        similar: Optional[Dict[str, Any]],
+        prd: Optional[str],
+        options: Optional[PipelineOptions],
+    ) -> None:
+        """Index a standalone generation so later similar requirements can reuse it."""
+        if similar is not None:
+            similar.pop("result", None)
+            result["similar_to"] = similar
+        # A session edit or PRD build answers more than the requirement text says
+        if prd or (previous is not None and similar is None):
+            return
+        self.similarity.add(
+            requirement, {key: result[key] for key in ("files", "analysis", "plan")}, self._similarity_variant(options)
+        )
+
+    def _similarity_variant(self, options: Optional[PipelineOptions]) -> str:
+        """The pipeline options a standalone generation ran with, as a similarity variant."""
+        return self._options(options, None).model_dump_json()
+    
+    async def _record_turn(self, session_id: Optional[str], requirement: str, result: Dict[str, Any]) -> None:
+        if session_id:
+            await self.llm_service.sessions.record_turn(session_id, requirement, result["files"])
+            result["session_id"] = session_id
+    
+    def check_requirement(self, requirement: str) -> None:
+        """Raise PromptTooLargeError before any LLM call if the requirement is over budget."""
+        self.llm_service.budget.check_requirement(requirement)
+    
+    def _options(self, options: Optional[PipelineOptions], prd: Optional[str]) -> PipelineOptions:
+        if options is not None:
+            return options
+        return PRD_PIPELINE if prd else PipelineOptions()
+    
+    def _build_pipeline(
+        self,
+        requirement: str,
+        options: PipelineOptions,
+        emit: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        use_cache: bool = True,
+        prd: Optional[str] = None,
+        previous: Optional[Dict[str, str]] = None,
+        priority: Priority = Priority.NORMAL,
+    ) -> Pipeline:
+        """
+        Build the stage graph for a requirement.
+
+        By default analysis -> plan runs alongside code generation, since the
+        code prompt only needs the raw requirement. With `code_uses_plan` the
+        files stage waits for the plan and includes it in its prompt. When
+        `emit` is given, stages stream their output through it as events.
+        `use_cache=False` bypasses the LLM response cache for every stage.
+        An approved `prd` replaces the analysis stage: the plan (if any) is
+        drawn up from it and the files stage implements it. `previous` holds
+        the files to build on (the session's, or a similar past result's),
+        which are updated with targeted patches, falling back to
+        regenerating them in full. `priority` applies to code generation;
+        analysis and plan always run at background priority.
+        """
+        # First check if this is a modification request
+        is_modification = self._is_modification_request(requirement)
+        stages: List[Stage] = []
+        include_analysis = options.include_analysis and not prd
+        
+        if include_analysis:
+            async def analysis_stage(results: Dict[str, Any]) -> str:
+                if emit is None:
+                    return await self._analyze_requirement(requirement, is_modification, use_cache)
+                return await self._stream_text_stage("analysis", self._analysis_prompt(requirement, is_modification), emit, use_cache)
+            stages.append(Stage("analysis", analysis_stage))
+        
+        if options.include_plan:
+            async def plan_stage(results: Dict[str, Any]) -> str:
+                analysis = prd or results.get("analysis", "")
+                if emit is None:
+                    return await self._plan_implementation(requirement, analysis, is_modification, use_cache)
+                return await self._stream_text_stage("plan", self._plan_prompt(requirement, analysis, is_modification), emit, use_cache)
+            stages.append(Stage("plan", plan_stage, ["analysis"] if include_analysis else []))
+        
+        use_plan = options.code_uses_plan and options.include_plan
+        
+        async def files_stage(results: Dict[str, Any]) -> Dict[str, str]:
+            plan = results.get("plan") if use_plan else None
+            if emit is None:
+                if previous:
+                    return await self.llm_service.modify_ui(
+                        requirement, previous, plan=plan, use_cache=use_cache, priority=priority, prd=prd
+                    )
+                return await self.llm_service.generate_ui(
+                    requirement, plan=plan, use_cache=use_cache, priority=priority, prd=prd
+                )
+            if self.llm_service.can_edit(previous):
+                try:
+                    files = await self.llm_service.edit_ui(
+                        requirement, previous, plan=plan, use_cache=use_cache, prd=prd
+                    )
+                except PatchError:
+                    pass
+                else:
+                    # Patches arrive all at once; send every file so the client has the full set
+                    for filename, content in files.items():
+                        emit("file", {"file": filename, "delta": "", "reset": True})
+                        emit("file", {"file": filename, "delta": content})
+                    return files
+            files = {}
+            async for filename, delta in self.llm_service.stream_ui(
+                requirement, plan=plan, use_cache=use_cache, prd=prd, previous=previous
+            ):
+                if delta is None:
+                    # The file was cut off and is being regenerated from scratch
+                    files[filename] = ""
+                    emit("file", {"file": filename, "delta": "", "reset": True})
+                    continue
+                files[filename] = files.get(filename, "") + delta
+                emit("file", {"file": filename, "delta": delta})
+            return files
+        stages.append(Stage("files", files_stage, ["plan"] if use_plan else []))
+        
+        return Pipeline(stages)
+    
+    async def _stream_text_stage(
+        self,
+        stage: str,
+        prompt: str,
+        emit: Callable[[str, Dict[str, Any]], None],
+        use_cache: bool = True,
+    ) -> str:
+        """Stream a reasoning stage, emitting each token as a `<stage>` event."""
+        text = ""
+        async for token in self.llm_service.stream_text(
+            prompt, ANALYSIS_POLICY, use_cache=use_cache, priority=Priority.BACKGROUND, task=stage
+        ):
+            text += token
+            emit(stage, {"delta": token})
+        return text
+    
     def _is_modification_request(self, requirement: str) -> bool:
         """Check if the requirement is requesting a modification to an existing UI."""
         modification_keywords = [
@@ -47,8 +307,97 @@ class AgentService:
         requirement_lower = requirement.lower()
         return any(keyword in requirement_lower for keyword in modification_keywords)
     
-    async def _analyze_requirement(self, requirement: str, is_modification: bool) -> str:
+    def _build_result(self, generated_code: Dict[str, str], analysis: Optional[str], plan: Optional[str]) -> Dict[str, Any]:
+        """Shape the pipeline outputs into the GenerateResponse structure."""
+        return {
+            "files": {
+                "index.html": generated_code.get("index.html", ""),
+                "style.css": generated_code.get("style.css", ""),
+                "script.js": generated_code.get("script.js", "")
+            },
+            "analysis": analysis,
+            "plan": plan,
+            "feedback": None  # Add feedback if needed
+        }
+    
+    async def stream_requirement(
+        self,
+        requirement: str,
+        options: Optional[PipelineOptions] = None,
+        use_cache: bool = True,
+        prd: Optional[str] = None,
+        session_id: Optional[str] = None,
+        prd_id: Optional[str] = None,
+        edit: bool = False,
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Run the agent pipeline, yielding (event, data) pairs as each stage progresses.
+
+        Emits `stage` events when analysis, plan and files start and finish,
+        `analysis`/`plan` events with text deltas, `file` events with
+        incremental file content, and a final `result` event shaped like
+        GenerateResponse. Concurrent stages interleave their events. `prd`,
+        `prd_id` and `session_id` work as in `process_requirement`; a reused
+        result is sent as whole `file` events. With `edit` the requirement is
+        applied to the session's files whatever its wording, as for a turn
+        of a chat editing session.
+        """
+        self.check_requirement(requirement)
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        def emit(event: str, data: Dict[str, Any]) -> None:
+            queue.put_nowait((event, data))
+        
+        def on_stage(name: str, status: str) -> None:
+            emit("stage", {"stage": name, "status": status})
+        
+        start = time.perf_counter()
+        previous, similar = await self._starting_point(requirement, session_id, use_cache, prd, edit, options)
+        result = None
+        if similar is not None and similar["action"] == "serve":
+            result = self._served_result(similar, start)
+        else:
+            result = await self._claim_speculation(requirement, options, use_cache, prd, prd_id, previous, start)
+        if result is not None:
+            yield "stage", {"stage": "files", "status": "started"}
+            for filename, content in result["files"].items():
+                yield "file", {"file": filename, "delta": "", "reset": True}
+                yield "file", {"file": filename, "delta": content}
+            yield "stage", {"stage": "files", "status": "completed"}
+            await self._record_turn(session_id, requirement, result)
+            yield "result", result
+            return
+        
+        pipeline = self._build_pipeline(requirement, self._options(options, prd), emit, use_cache, prd, previous)
+        task = asyncio.ensure_future(pipeline.run(on_stage))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield item
+            
+            results, timings = task.result()
+            result = self._build_result(results["files"], results.get("analysis"), results.get("plan"))
+            self._remember(requirement, result, previous, similar, prd, options)
+            result["timings"] = timings
+            await self._record_turn(session_id, requirement, result)
+            yield "result", result
+        finally:
+            if not task.done():
+                task.cancel()
+    
+    async def _analyze_requirement(self, requirement: str, is_modification: bool, use_cache: bool = True) -> str:
         """Analyze the user requirement to understand what's needed."""
+        return await self.llm_service.generate_text(
+            self._analysis_prompt(requirement, is_modification), ANALYSIS_POLICY,
+            use_cache=use_cache, priority=Priority.BACKGROUND
+        )
+    
+    def _analysis_prompt(self, requirement: str, is_modification: bool) -> str:
+        """Build the prompt for the analysis stage."""
         if is_modification:
             prompt = f"""
             You are a UI development expert. Carefully analyze the following UI modification requirement:
@@ -78,10 +427,17 @@ class AgentService:
             Return only your analysis, formatted clearly.
             """
         
-        return await self.llm_service.generate_text(prompt)
+        return prompt
     
-    async def _plan_implementation(self, requirement: str, analysis: str, is_modification: bool) -> str:
+    async def _plan_implementation(self, requirement: str, analysis: str, is_modification: bool, use_cache: bool = True) -> str:
         """Create a plan for implementing the UI based on the analysis."""
+        return await self.llm_service.generate_text(
+            self._plan_prompt(requirement, analysis, is_modification), ANALYSIS_POLICY,
+            use_cache=use_cache, priority=Priority.BACKGROUND, task="plan"
+        )
+    
+    def _plan_prompt(self, requirement: str, analysis: str, is_modification: bool) -> str:
+        """Build the prompt for the planning stage."""
         if is_modification:
             prompt = f"""
             Based on this UI modification requirement: '{requirement}'
@@ -111,7 +467,7 @@ class AgentService:
             Return only the concrete implementation plan, formatted as a clear list.
             """
         
-        return await self.llm_service.generate_text(prompt)
+        return prompt
     
     async def _generate_ui_code(self, requirement: str, analysis: str, plan: str) -> str:
         """Generate the actual UI code based on the requirement, analysis and plan."""
@@ -157,15 +513,10 @@ class AgentService:
         if not isinstance(text, str):
             raise ValueError("Generated code must be a string")
 
-        def extract_block(pattern: str) -> Optional[str]:
-            matches = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
-            return matches.group(1).strip() if matches else None
-            
-        html = extract_block(r"```html\s*(.*?)\s*```")
-        css = extract_block(r"```css\s*(.*?)\s*```")
-        javascript = extract_block(r"```javascript\s*(.*?)\s*```")
+        blocks = extract_ui_blocks(text)
+        html, css, javascript = blocks["html"], blocks["css"], blocks["javascript"]
         
         if not any([html, css, javascript]):
             raise ValueError("No code blocks found in generated text")
             
-        return html or "", css or "", javascript or ""
+        return html, css, javascript
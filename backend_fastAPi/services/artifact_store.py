@@ -0,0 +1,321 @@
+import asyncio
+import gzip
+import hashlib
+import io
+import sqlite3
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from config import env_int, env_str
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # Optional: only gzip is offered without it
+    brotli = None
+
+MEDIA_TYPES = {
+    ".html": "text/html",
+    ".css": "text/css",
+    ".js": "text/javascript",
+    ".zip": "application/zip",
+}
+
+# Below this size compression saves less than the headers it costs
+MIN_COMPRESS_BYTES = 256
+
+
+def media_type_for(filename: str) -> str:
+    for extension, media_type in MEDIA_TYPES.items():
+        if filename.endswith(extension):
+            return media_type
+    return "application/octet-stream"
+
+
+class Artifact:
+    """Immutable content plus its lazily compressed encodings."""
+
+    def __init__(
+        self,
+        digest: str,
+        content: bytes,
+        media_type: str,
+        filename: Optional[str] = None,
+        encoded: Optional[Dict[str, bytes]] = None,
+    ):
+        self.hash = digest
+        self.content = content
+        self.media_type = media_type
+        self.filename = filename
+        self._encoded: Dict[str, bytes] = dict(encoded or {})
+
+    def has_encoding(self, encoding: str) -> bool:
+        return encoding == "identity" or encoding in self._encoded
+
+    def encoded(self, encoding: str) -> bytes:
+        """The content in `encoding` ("identity", "gzip" or "br"), compressed once on first use."""
+        if encoding == "identity":
+            return self.content
+        if encoding not in self._encoded:
+            if encoding == "br":
+                self._encoded[encoding] = brotli.compress(self.content)
+            else:
+                # Fixed mtime keeps the bytes (and their ETag) stable
+                self._encoded[encoding] = gzip.compress(self.content, compresslevel=6, mtime=0)
+        return self._encoded[encoding]
+
+    @property
+    def compressible(self) -> bool:
+        # Zip bundles are compressed already
+        return self.media_type.startswith("text/") and len(self.content) >= MIN_COMPRESS_BYTES
+
+    @property
+    def size(self) -> int:
+        return len(self.content) + sum(len(body) for body in self._encoded.values())
+
+
+class MemoryArtifactBackend:
+    """Per-process LRU of artifacts; only suitable for a single worker."""
+
+    blocking = False
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._artifacts: "OrderedDict[str, Artifact]" = OrderedDict()
+        self._bytes = 0
+
+    def put(self, artifact: Artifact) -> None:
+        if artifact.hash in self._artifacts:
+            self._artifacts.move_to_end(artifact.hash)
+        else:
+            self._artifacts[artifact.hash] = artifact
+            self._bytes += artifact.size
+        self._evict()
+
+    def get(self, digest: str) -> Optional[Artifact]:
+        artifact = self._artifacts.get(digest)
+        if artifact is not None:
+            self._artifacts.move_to_end(digest)
+        return artifact
+
+    def add_encoding(self, artifact: Artifact, encoding: str, body: bytes) -> None:
+        # The stored artifact is the same object and already holds the body
+        if self._artifacts.get(artifact.hash) is artifact:
+            self._bytes += len(body)
+            self._evict()
+
+    def _evict(self) -> None:
+        while len(self._artifacts) > 1 and self._bytes > self.max_bytes:
+            _, artifact = self._artifacts.popitem(last=False)
+            self._bytes -= artifact.size
+
+    def size(self) -> int:
+        return len(self._artifacts)
+
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def close(self) -> None:
+        self._artifacts.clear()
+        self._bytes = 0
+
+
+class SQLiteArtifactBackend:
+    """Artifact table in a SQLite file shared by every uvicorn worker on the host."""
+
+    blocking = True
+
+    # Columns holding each compressed encoding
+    ENCODINGS = ("gzip", "br")
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Several workers write to the same file; wait for their locks instead of failing
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS artifacts (
+                hash TEXT PRIMARY KEY,
+                media_type TEXT NOT NULL,
+                filename TEXT,
+                content BLOB NOT NULL,
+                gzip BLOB,
+                br BLOB,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_accessed ON artifacts (accessed_at)")
+
+    def put(self, artifact: Artifact) -> None:
+        now = time.time()
+        with self._lock:
+            self._write(
+                artifact.hash,
+                "INSERT INTO artifacts (hash, media_type, filename, content, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (hash) DO UPDATE SET accessed_at = excluded.accessed_at",
+                (artifact.hash, artifact.media_type, artifact.filename, artifact.content, len(artifact.content), now),
+            )
+
+    def get(self, digest: str) -> Optional[Artifact]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT media_type, filename, content, gzip, br FROM artifacts WHERE hash = ?", (digest,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE artifacts SET accessed_at = ? WHERE hash = ?", (time.time(), digest))
+        encoded = {encoding: body for encoding, body in zip(self.ENCODINGS, row[3:]) if body is not None}
+        return Artifact(digest, row[2], row[0], row[1], encoded)
+
+    def add_encoding(self, artifact: Artifact, encoding: str, body: bytes) -> None:
+        if encoding not in self.ENCODINGS:
+            raise ValueError(f"Unknown encoding: {encoding}")
+        with self._lock:
+            self._write(
+                artifact.hash,
+                f"UPDATE artifacts SET {encoding} = ?, size = size + ? WHERE hash = ? AND {encoding} IS NULL",
+                (body, len(body), artifact.hash),
+            )
+
+    def _write(self, digest: str, sql: str, params: tuple) -> None:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(sql, params)
+            # Keep the most recently used artifacts within max_bytes, never the one just written
+            self._conn.execute(
+                "DELETE FROM artifacts WHERE hash != ? AND hash IN ("
+                "SELECT hash FROM (SELECT hash, SUM(size) OVER (ORDER BY accessed_at DESC, hash) AS running "
+                "FROM artifacts) WHERE running > ?)",
+                (digest, self.max_bytes),
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ArtifactStore:
+    """
+    Content-addressed store of generated files, served from /artifacts/{hash}.
+
+    Each file is kept once under the SHA-256 of its bytes, so a file that
+    didn't change between iterations has the same hash and a client that
+    already holds it never needs it resent. Compressed encodings are built
+    on first request and kept with the artifact. The least recently used
+    artifacts are dropped beyond `max_bytes`. The in-process backend is used
+    by default; with ARTIFACT_SQLITE_PATH set, artifacts live in a SQLite
+    file so any worker can serve a hash another worker produced.
+    """
+
+    def __init__(self, backend: Any):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    @classmethod
+    def from_env(cls) -> "ArtifactStore":
+        max_bytes = env_int("ARTIFACT_MAX_BYTES", 64 * 1024 * 1024)
+        sqlite_path = env_str("ARTIFACT_SQLITE_PATH")
+        if sqlite_path:
+            return cls(SQLiteArtifactBackend(sqlite_path, max_bytes))
+        return cls(MemoryArtifactBackend(max_bytes))
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+        return method(*args)
+
+    async def put(self, content: bytes, media_type: str, filename: Optional[str] = None) -> str:
+        """Store content and return its hash."""
+        digest = hashlib.sha256(content).hexdigest()
+        await self._call(self.backend.put, Artifact(digest, content, media_type, filename))
+        return digest
+
+    async def get(self, digest: str) -> Optional[Artifact]:
+        artifact = await self._call(self.backend.get, digest)
+        if artifact is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return artifact
+
+    async def encoded(self, artifact: Artifact, encoding: str) -> bytes:
+        """The artifact's body in `encoding`; a newly compressed one is kept in the store."""
+        is_new = not artifact.has_encoding(encoding)
+        body = artifact.encoded(encoding)
+        if is_new:
+            await self._call(self.backend.add_encoding, artifact, encoding, body)
+        self.bytes_saved += len(artifact.content) - len(body)
+        return body
+
+    async def put_files(self, files: Dict[str, str]) -> Dict[str, str]:
+        """Store every file and return `{filename: hash}`."""
+        return {
+            filename: await self.put(content.encode("utf-8"), media_type_for(filename), filename)
+            for filename, content in files.items()
+        }
+
+    async def put_bundle(self, files: Dict[str, str]) -> str:
+        """Store a zip of `files` and return its hash; the same files always give the same zip."""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for filename in sorted(files):
+                info = zipfile.ZipInfo(filename, date_time=(1980, 1, 1, 0, 0, 0))
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, files[filename])
+        return await self.put(buffer.getvalue(), MEDIA_TYPES[".zip"], "ui.zip")
+
+    async def attach(
+        self, result: Dict[str, Any], known: Optional[Iterable[str]] = None, bundle: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Add `artifacts` (and a `bundle` hash if asked) to a GenerateResponse-shaped
+        result. Files whose hash is in `known` are left out of `files`; the
+        client already has them.
+        """
+        files = result["files"]
+        result["artifacts"] = await self.put_files(files)
+        if bundle:
+            result["bundle"] = await self.put_bundle(files)
+        if known:
+            known = set(known)
+            result["files"] = {
+                filename: content for filename, content in files.items()
+                if result["artifacts"][filename] not in known
+            }
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": getattr(self.backend, "path", "memory"),
+            "entries": self.backend.size(),
+            "bytes": self.backend.total_bytes(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "compressed_bytes_saved": self.bytes_saved,
+            "brotli": brotli is not None,
+        }
+
+    def close(self) -> None:
+        self.backend.close()
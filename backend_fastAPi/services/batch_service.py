@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from config import env_int
+
+logger = logging.getLogger(__name__)
+
+BatchWorker = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+class BatchTooLargeError(Exception):
+    """Raised when a batch has more items than allowed."""
+
+    def __init__(self, size: int, limit: int):
+        super().__init__(f"Batch has {size} items, limit is {limit}")
+        self.size = size
+        self.limit = limit
+
+
+class BatchRunner:
+    """
+    Fan a list of requirements out to a worker with bounded concurrency.
+
+    Results are yielded as items finish, not in input order, each tagged
+    with its index. A failing item becomes an error entry instead of
+    failing the batch. Overall provider load is still governed by the
+    shared LLM scheduler; `max_concurrency` only keeps one batch from
+    queueing all of its items at once.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_items: int = 100):
+        self.max_concurrency = max_concurrency
+        self.max_items = max_items
+        self.batches = 0
+        self.succeeded = 0
+        self.failed = 0
+        self._active = 0
+
+    @classmethod
+    def from_env(cls) -> "BatchRunner":
+        return cls(
+            max_concurrency=env_int("BATCH_MAX_CONCURRENCY", 4),
+            max_items=env_int("BATCH_MAX_ITEMS", 100),
+        )
+
+    def check(self, items: List[str]) -> None:
+        """Raise BatchTooLargeError up front for an oversized batch."""
+        if len(items) > self.max_items:
+            raise BatchTooLargeError(len(items), self.max_items)
+
+    async def run(
+        self,
+        items: List[str],
+        worker: BatchWorker,
+        concurrency: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run `worker` on every item and yield `{"index", "status", "result"|"error"}`
+        entries as they complete. `concurrency` can lower, but not raise, the
+        configured bound. Unfinished items are cancelled if the consumer stops early.
+        """
+        self.check(items)
+        limit = max(1, min(concurrency or self.max_concurrency, self.max_concurrency))
+        semaphore = asyncio.Semaphore(limit)
+        self.batches += 1
+        self._active += 1
+
+        async def run_item(index: int, item: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    result = await worker(item)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Batch item {index} failed: {str(e)}")
+                    self.failed += 1
+                    return {"index": index, "status": "failed", "error": str(e)}
+                self.succeeded += 1
+                return {"index": index, "status": "succeeded", "result": result}
+
+        pending: Set[asyncio.Future] = {
+            asyncio.ensure_future(run_item(index, item)) for index, item in enumerate(items)
+        }
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            self._active -= 1
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "batches": self.batches,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "max_concurrency": self.max_concurrency,
+            "max_items": self.max_items,
+        }
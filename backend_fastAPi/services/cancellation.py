@@ -0,0 +1,112 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Optional, Set, TypeVar
+
+from fastapi import Request
+
+from config import env_float
+from services.metrics import REQUESTS_CANCELLED
+
+T = TypeVar("T")
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request's work is cancelled for running past its deadline."""
+
+    def __init__(self, deadline: float):
+        super().__init__(f"Request did not finish within {deadline:.0f}s")
+        self.deadline = deadline
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when a request's work is cancelled because the client went away."""
+    pass
+
+
+def request_deadline() -> Optional[float]:
+    """Seconds a request may run before its work is cancelled (REQUEST_DEADLINE, 0 for none)."""
+    deadline = env_float("REQUEST_DEADLINE", 600.0)
+    return deadline if deadline > 0 else None
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    # The body has been read by now, so the next message is the disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_cancellable(
+    work: Awaitable[T],
+    request: Optional[Request] = None,
+    deadline: Optional[float] = None,
+    route: str = "",
+) -> T:
+    """
+    Await `work`, cancelling it when the client disconnects or after `deadline` seconds.
+
+    Cancelling the task cancels everything under it: pipeline stages,
+    scheduler waits and in-flight predictions, which are also cancelled at
+    the provider. Raises ClientDisconnectedError or DeadlineExceededError
+    after the work has unwound.
+    """
+    task = asyncio.ensure_future(work)
+    watchers: Set[asyncio.Future] = set()
+    if request is not None:
+        watchers.add(asyncio.ensure_future(_wait_for_disconnect(request)))
+    try:
+        done, _ = await asyncio.wait({task, *watchers}, timeout=deadline, return_when=asyncio.FIRST_COMPLETED)
+        if task in done:
+            return task.result()
+        reason = "disconnect" if done else "deadline"
+        REQUESTS_CANCELLED.inc(route=route, reason=reason)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        if reason == "deadline":
+            raise DeadlineExceededError(deadline or 0.0)
+        raise ClientDisconnectedError("Client disconnected")
+    finally:
+        for watcher in watchers:
+            watcher.cancel()
+        if not task.done():
+            # Cancelled from outside: let the work unwind before we do
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+async def iterate_with_deadline(
+    events: AsyncIterator[T],
+    deadline: Optional[float] = None,
+    route: str = "",
+) -> AsyncIterator[T]:
+    """
+    Re-yield `events` until they end or `deadline` seconds pass, then close
+    them (cancelling their work) and raise DeadlineExceededError. A consumer
+    that stops early, e.g. on client disconnect, is counted as a disconnect.
+    """
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline if deadline else None
+    try:
+        while True:
+            try:
+                if end is None:
+                    item = await events.__anext__()
+                else:
+                    item = await asyncio.wait_for(events.__anext__(), max(0.0, end - loop.time()))
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                REQUESTS_CANCELLED.inc(route=route, reason="deadline")
+                raise DeadlineExceededError(deadline or 0.0)
+            yield item
+    except (asyncio.CancelledError, GeneratorExit):
+        REQUESTS_CANCELLED.inc(route=route, reason="disconnect")
+        raise
+    finally:
+        await _aclose(events)
+
+
+async def _aclose(events: Any) -> None:
+    aclose = getattr(events, "aclose", None)
+    if aclose is not None:
+        await aclose()
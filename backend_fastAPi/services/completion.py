@@ -0,0 +1,82 @@
+import random
+from dataclasses import dataclass, replace
+from typing import Iterator
+
+from config import env_float, env_int
+
+# Replicate caps the blocking "Prefer: wait" mode at 60 seconds
+MAX_SYNC_WAIT = 60
+
+
+@dataclass(frozen=True)
+class CompletionPolicy:
+    """
+    How LLMService waits for a prediction to finish.
+
+    The create call first asks the provider to block for up to `sync_wait`
+    seconds ("Prefer: wait"). If the prediction is still running after that,
+    the service falls back to polling: `fast_polls` quick polls at
+    `initial_interval`, then exponential backoff capped at `max_interval`
+    with +/- `jitter` randomisation. `deadline` is the wall-clock budget in
+    seconds for the whole call, measured from the create request. `name`
+    labels the kind of call, e.g. for per-kind latency tracking.
+    """
+
+    name: str = "default"
+    sync_wait: int = 60
+    initial_interval: float = 0.25
+    fast_polls: int = 4
+    multiplier: float = 1.6
+    max_interval: float = 4.0
+    jitter: float = 0.2
+    deadline: float = 120.0
+
+    def with_overrides(self, **changes) -> "CompletionPolicy":
+        """Return a copy of the policy with some fields changed."""
+        return replace(self, **changes)
+
+    @property
+    def prefer_header(self) -> str:
+        """Value of the Prefer header for the create request, or '' when disabled."""
+        wait = min(self.sync_wait, MAX_SYNC_WAIT, int(self.deadline))
+        return f"wait={wait}" if wait > 0 else ""
+
+    def poll_delays(self) -> Iterator[float]:
+        """Yield the sleep before each successive poll."""
+        interval = self.initial_interval
+        polls = 0
+        while True:
+            if polls >= self.fast_polls:
+                interval = min(interval * self.multiplier, self.max_interval)
+            polls += 1
+            spread = interval * self.jitter
+            yield max(0.0, interval + random.uniform(-spread, spread))
+
+    @classmethod
+    def from_env(cls) -> "CompletionPolicy":
+        """Default policy, tunable through LLM_* environment variables."""
+        return cls(
+            sync_wait=env_int("LLM_SYNC_WAIT", 60),
+            initial_interval=env_float("LLM_POLL_INITIAL_INTERVAL", 0.25),
+            fast_polls=env_int("LLM_POLL_FAST_POLLS", 4),
+            multiplier=env_float("LLM_POLL_MULTIPLIER", 1.6),
+            max_interval=env_float("LLM_POLL_MAX_INTERVAL", 4.0),
+            jitter=env_float("LLM_POLL_JITTER", 0.2),
+            deadline=env_float("LLM_DEADLINE", 120.0),
+        )
+
+
+DEFAULT_POLICY = CompletionPolicy.from_env()
+
+# Short reasoning calls (analysis, plan, PRD): finish quickly or fail fast
+ANALYSIS_POLICY = DEFAULT_POLICY.with_overrides(
+    name="analysis",
+    deadline=env_float("LLM_ANALYSIS_DEADLINE", 60.0),
+)
+
+# Full UI generation produces much more output and needs a longer budget
+CODE_POLICY = DEFAULT_POLICY.with_overrides(
+    name="code",
+    initial_interval=0.5,
+    deadline=env_float("LLM_CODE_DEADLINE", 300.0),
+)
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from models.request_models import PipelineOptions
+from services.agent_service import AgentService
+from services.artifact_store import ArtifactStore
+from services.cancellation import DeadlineExceededError, request_deadline, run_cancellable
+from services.llm_service import LLMServiceError
+from services.metrics import REQUESTS_CANCELLED, SESSION_BYTES, SESSION_TURNS
+from services.token_budget import PromptTooLargeError
+
+logger = logging.getLogger(__name__)
+
+# Edit turns go straight to the code; analysis and plan only when a turn asks for them
+TURN_PIPELINE = PipelineOptions(include_analysis=False, include_plan=False)
+
+
+class FileEvents:
+    """
+    Rewrite a turn's `file` events against the files the client already holds.
+
+    The first event for a file in a turn carries `reset`, so the client
+    replaces its copy instead of appending to it. A file resent whole
+    without changes (as patch edits and reused results do) is dropped, and
+    the client keeps what it has.
+    """
+
+    def __init__(self, files: Dict[str, str]):
+        self.files = files
+        self._started: Set[str] = set()
+        self._pending: Set[str] = set()
+
+    def rewrite(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        filename = data["file"]
+        if data.get("reset") and not data["delta"]:
+            # Wait for what replaces the file before deciding whether it changed
+            self._pending.add(filename)
+            return []
+        if filename in self._pending:
+            self._pending.discard(filename)
+            if filename not in self._started and data["delta"] == self.files.get(filename):
+                return []
+        elif filename in self._started:
+            return [data]
+        self._started.add(filename)
+        return [{"file": filename, "delta": data["delta"], "reset": True}]
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Resets that were never followed by content: those files are now empty."""
+        events = [{"file": filename, "delta": "", "reset": True} for filename in sorted(self._pending)]
+        self._pending.clear()
+        return events
+
+
+class EditSession:
+    """
+    One live connection to an editing session, driven by chat turns.
+
+    The session's current files stay on the server (in the SessionStore),
+    so a turn only carries the requirement and the server only sends what
+    changed: file deltas, stage progress and a result listing the files'
+    hashes. Each turn edits the files the session holds. A new turn
+    cancels one still in flight, as does `cancel`; the cancelled turn's
+    partial file events should be discarded, the files stay as they were.
+    `send` delivers one JSON-serializable message to the client.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        agent_service: AgentService,
+        artifact_store: ArtifactStore,
+        send: Callable[[Dict[str, Any]], Awaitable[None]],
+    ):
+        self.session_id = session_id
+        self.agent_service = agent_service
+        self.artifact_store = artifact_store
+        self._send = send
+        self._lock = asyncio.Lock()
+        self.files: Dict[str, str] = {}
+        self.turn = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def send(self, message_type: str, data: Dict[str, Any], turn: Optional[int] = None) -> None:
+        message: Dict[str, Any] = {"type": message_type, "data": data}
+        if turn is not None:
+            message["turn"] = turn
+        SESSION_BYTES.inc(len(json.dumps(message)), direction="sent")
+        # A turn's events and replies to the client's messages may be sent concurrently
+        async with self._lock:
+            await self._send(message)
+
+    async def open(self) -> None:
+        """Load the session's files and tell the client what it is editing."""
+        self.files = await self.agent_service.llm_service.sessions.files(self.session_id) or {}
+        await self.send("session", {
+            "session_id": self.session_id,
+            "files": self.files,
+            "artifacts": await self.artifact_store.put_files(self.files),
+        })
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start_turn(
+        self,
+        requirement: str,
+        options: Optional[PipelineOptions] = None,
+        use_cache: bool = True,
+    ) -> int:
+        """Start a turn, cancelling the one in flight, and return its number."""
+        await self.cancel("superseded")
+        self.turn += 1
+        self._task = asyncio.ensure_future(self._run_turn(self.turn, requirement, options or TURN_PIPELINE, use_cache))
+        return self.turn
+
+    async def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel the turn in flight, if any, and tell the client it was cancelled."""
+        if not self.running:
+            return False
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        SESSION_TURNS.inc(result=reason)
+        await self.send("cancelled", {"reason": reason}, self.turn)
+        return True
+
+    async def close(self) -> None:
+        """Stop the turn in flight; the client is gone."""
+        if self._task is None:
+            return
+        if not self._task.done():
+            self._task.cancel()
+            SESSION_TURNS.inc(result="cancelled")
+            REQUESTS_CANCELLED.inc(route="/ws/session", reason="disconnect")
+        # Also collects the error of a turn that failed sending to the closed socket
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run_turn(self, turn: int, requirement: str, options: PipelineOptions, use_cache: bool) -> None:
+        try:
+            await run_cancellable(
+                self._stream_turn(turn, requirement, options, use_cache),
+                deadline=request_deadline(), route="/ws/session",
+            )
+        except PromptTooLargeError as e:
+            await self._fail(turn, str(e))
+        except DeadlineExceededError as e:
+            await self._fail(turn, str(e))
+        except LLMServiceError as e:
+            await self._fail(turn, f"LLM service error: {str(e)}")
+        except Exception as e:
+            logger.error(f"Unexpected error in session turn: {str(e)}")
+            await self._fail(turn, f"An unexpected error occurred: {str(e)}")
+        else:
+            SESSION_TURNS.inc(result="completed")
+        await self.send("done", {}, turn)
+
+    async def _fail(self, turn: int, detail: str) -> None:
+        SESSION_TURNS.inc(result="error")
+        await self.send("error", {"detail": detail}, turn)
+
+    async def _stream_turn(self, turn: int, requirement: str, options: PipelineOptions, use_cache: bool) -> None:
+        file_events = FileEvents(self.files)
+        events = self.agent_service.stream_requirement(
+            requirement, options, use_cache=use_cache, session_id=self.session_id, edit=True
+        )
+        try:
+            async for event, data in events:
+                if event == "file":
+                    for rewritten in file_events.rewrite(data):
+                        await self.send("file", rewritten, turn)
+                    continue
+                if event == "result":
+                    for rewritten in file_events.flush():
+                        await self.send("file", rewritten, turn)
+                    self.files = dict(data["files"])
+                    await self.artifact_store.attach(data)
+                    # Every change already went out as file events; the result only lists hashes
+                    data["files"] = {}
+                await self.send(event, data, turn)
+        finally:
+            # Cancels the pipeline if the turn was cancelled between events
+            await events.aclose()
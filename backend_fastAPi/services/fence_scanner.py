@@ -0,0 +1,166 @@
+from typing import Dict, List, Optional, Tuple
+
+# Fence info strings mapped to the language they are collected under
+LANGUAGE_ALIASES = {
+    "html": "html",
+    "htm": "html",
+    "xhtml": "html",
+    "css": "css",
+    "javascript": "javascript",
+    "js": "javascript",
+    "mjs": "javascript",
+    "ecmascript": "javascript",
+}
+
+
+def canonical_language(info: str) -> str:
+    """The language a fence's info string names, e.g. "JS" -> "javascript"; "" if none."""
+    words = info.split()
+    tag = words[0].lower() if words else ""
+    return LANGUAGE_ALIASES.get(tag, tag)
+
+
+class FenceScanner:
+    """
+    Incrementally extract fenced code blocks (``` or ~~~) from LLM output.
+
+    Makes one pass over the text, a line at a time, so cost stays linear in
+    the size of the output however many fences it contains; a line split
+    across chunks is held until its newline arrives. `feed` returns
+    `(language, line)` pairs for code lines as they complete, and `blocks`
+    collects every block in order, with language aliases folded together.
+
+    A fence closes on a line of at least as many fence characters, or at the
+    end of a line of code that ends with the fence (as models sometimes write
+    `</html>```). If the output stops inside a block, `finish` keeps the
+    block and sets `truncated`.
+    """
+
+    def __init__(self):
+        self.blocks: List[Tuple[str, str]] = []
+        self.truncated = False
+        self._partial: List[str] = []
+        self._language: Optional[str] = None
+        self._fence = ""
+        self._lines: List[str] = []
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume a chunk of output and return the code lines it completed."""
+        lines: List[Tuple[str, str]] = []
+        start = 0
+        newline = chunk.find("\n")
+        while newline != -1:
+            line = chunk[start:newline]
+            if self._partial:
+                self._partial.append(line)
+                line = "".join(self._partial)
+                self._partial = []
+            self._line(line, lines)
+            start = newline + 1
+            newline = chunk.find("\n", start)
+        if start < len(chunk):
+            self._partial.append(chunk[start:])
+        return lines
+
+    def finish(self) -> List[Tuple[str, str]]:
+        """Process the last unterminated line and close a block left open."""
+        lines: List[Tuple[str, str]] = []
+        if self._partial:
+            line = "".join(self._partial)
+            self._partial = []
+            self._line(line, lines)
+        if self._language is not None:
+            self.truncated = True
+            self._close()
+        return lines
+
+    def _line(self, line: str, lines: List[Tuple[str, str]]) -> None:
+        stripped = line.strip()
+        if self._language is None:
+            # Up to three spaces of indentation, as in CommonMark
+            indent = len(line) - len(line.lstrip(" "))
+            if indent <= 3 and line[indent:indent + 3] in ("```", "~~~"):
+                marker = stripped[0]
+                length = len(stripped) - len(stripped.lstrip(marker))
+                self._fence = marker * length
+                self._language = canonical_language(stripped[length:])
+                self._lines = []
+            return
+
+        if stripped.startswith(self._fence) and not stripped.lstrip(self._fence[0]):
+            self._close()
+            return
+        if stripped.endswith(self._fence):
+            # Closing fence glued to the last line of code
+            line = line.rstrip()[:-len(self._fence)]
+            self._lines.append(line)
+            lines.append((self._language, line))
+            self._close()
+            return
+        self._lines.append(line)
+        lines.append((self._language, line))
+
+    def _close(self) -> None:
+        self.blocks.append((self._language, "\n".join(self._lines).strip()))
+        self._language = None
+        self._lines = []
+
+    def by_language(self) -> Dict[str, List[str]]:
+        """Non-empty blocks grouped by language, in order of appearance."""
+        grouped: Dict[str, List[str]] = {}
+        for language, code in self.blocks:
+            if code:
+                grouped.setdefault(language, []).append(code)
+        return grouped
+
+
+def scan_code_blocks(text: str) -> Dict[str, List[str]]:
+    """Every fenced code block in `text`, grouped by canonical language."""
+    scanner = FenceScanner()
+    scanner.feed(text)
+    scanner.finish()
+    return scanner.by_language()
+
+
+def inline_blocks(html: str, tag: str) -> List[str]:
+    """
+    Contents of every inline `<style>` or `<script>` element in `html`, in
+    one forward pass. Scripts with a `src` attribute are external and skipped.
+    """
+    lowered = html.lower()
+    opening = f"<{tag}"
+    closing = f"</{tag}"
+    blocks: List[str] = []
+    position = lowered.find(opening)
+    while position != -1:
+        after = position + len(opening)
+        end_of_tag = lowered.find(">", after)
+        if end_of_tag == -1:
+            break
+        if after < len(lowered) and (lowered[after].isalnum() or lowered[after] in "-_"):
+            # A longer tag name such as <scripts>
+            position = lowered.find(opening, after)
+            continue
+        end = lowered.find(closing, end_of_tag + 1)
+        if end == -1:
+            break
+        if not (tag == "script" and "src=" in lowered[after:end_of_tag].replace(" ", "")):
+            content = html[end_of_tag + 1:end].strip()
+            if content:
+                blocks.append(content)
+        position = lowered.find(opening, end + len(closing))
+    return blocks
+
+
+def extract_ui_blocks(text: str) -> Dict[str, str]:
+    """
+    HTML, CSS and JavaScript from fenced model output, as `{"html", "css",
+    "javascript"}`. Several blocks of one language are joined in order; CSS
+    or JavaScript without a block of its own is taken from inline `<style>`
+    and `<script>` elements in the HTML. Missing languages are empty strings.
+    """
+    blocks = scan_code_blocks(text)
+    html = "\n\n".join(blocks.get("html", []))
+    css = "\n\n".join(blocks.get("css", []) or inline_blocks(html, "style"))
+    javascript = "\n\n".join(blocks.get("javascript", []) or inline_blocks(html, "script"))
+    return {"html": html, "css": css, "javascript": javascript}
@@ -0,0 +1,46 @@
+import logging
+
+import httpx
+
+from config import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    """HTTP/2 support in httpx needs the optional `h2` package."""
+    try:
+        import h2  # type: ignore # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Build the app-wide pooled HTTP client used for every LLM provider call.
+
+    Connections are kept alive between requests so the create POST and all
+    polling GETs reuse the same TCP/TLS session instead of re-handshaking.
+    Pool sizes and timeouts are configurable through the environment.
+    """
+    limits = httpx.Limits(
+        max_connections=env_int("LLM_HTTP_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=env_int("LLM_HTTP_MAX_KEEPALIVE", 20),
+        keepalive_expiry=env_float("LLM_HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+    timeout = httpx.Timeout(
+        timeout=env_float("LLM_HTTP_TIMEOUT", 120.0),
+        connect=env_float("LLM_HTTP_CONNECT_TIMEOUT", 10.0),
+    )
+
+    http2 = env_bool("LLM_HTTP2", True)
+    if http2 and not _http2_available():
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed; falling back to HTTP/1.1")
+        http2 = False
+
+    logger.info(
+        f"Created shared HTTP client (http2={http2}, max_connections={limits.max_connections}, "
+        f"max_keepalive={limits.max_keepalive_connections})"
+    )
+    return httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout)
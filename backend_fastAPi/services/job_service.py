@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import math
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import env_float, env_int
+from services.agent_service import AgentService
+from services.cancellation import request_deadline, run_cancellable
+from services.prd_service import PRDService
+from services.scheduler import Priority
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def build_job_handlers(agent_service: AgentService, prd_service: PRDService) -> Dict[str, JobHandler]:
+    """Job types served by the queue, mapped to the services that run them."""
+
+    async def generate(payload: Dict[str, Any]) -> Dict[str, Any]:
+        # Queued jobs are not interactive; let live requests go first
+        return await agent_service.process_requirement(
+            payload["requirement"], payload.get("pipeline"), use_cache=payload.get("use_cache", True),
+            priority=Priority.BACKGROUND,
+        )
+
+    async def prd(payload: Dict[str, Any]) -> Dict[str, Any]:
+        # Queued jobs are not interactive; let live requests go first
+        record = await prd_service.create_prd(
+            payload["requirement"], use_cache=payload.get("use_cache", True), priority=Priority.BACKGROUND
+        )
+        return {"prd": record.prd, "prd_id": record.id}
+
+    return {"generate": generate, "prd": prd}
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    """A unit of background work and its outcome."""
+
+    def __init__(self, job_type: str, payload: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.payload = payload
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "type": self.type,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    In-process job queue drained by a fixed pool of workers.
+
+    Submissions go into a bounded asyncio queue; when it is full the caller
+    gets a QueueFullError with an estimated retry delay instead of the work
+    fanning out unbounded. Finished jobs are kept for `result_ttl` seconds so
+    clients can poll for them, then dropped. A job running longer than
+    `deadline` seconds is cancelled, provider calls included, and fails.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, JobHandler],
+        workers: int = 4,
+        queue_size: int = 100,
+        result_ttl: float = 3600.0,
+        deadline: Optional[float] = None,
+    ):
+        self.handlers = handlers
+        self.deadline = deadline
+        self.worker_count = workers
+        self.result_ttl = result_ttl
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._jobs: Dict[str, Job] = {}
+        self._workers: List[asyncio.Task] = []
+        self._running = 0
+        # Moving average of job duration, used for Retry-After estimates
+        self._avg_duration = 10.0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, handlers: Dict[str, JobHandler]) -> "JobManager":
+        """Build a manager sized by JOB_* environment variables."""
+        return cls(
+            handlers,
+            workers=env_int("JOB_WORKERS", 4),
+            queue_size=env_int("JOB_QUEUE_SIZE", 100),
+            result_ttl=env_float("JOB_RESULT_TTL", 3600.0),
+            deadline=request_deadline(),
+        )
+
+    async def start(self) -> None:
+        for index in range(self.worker_count):
+            self._workers.append(asyncio.ensure_future(self._worker(index)))
+        logger.info(f"Started {self.worker_count} job workers (queue size {self._queue.maxsize})")
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    def submit(self, job_type: str, payload: Dict[str, Any]) -> Job:
+        """Queue a job, or raise QueueFullError if there is no room."""
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type '{job_type}'")
+        self._purge_expired()
+
+        job = Job(job_type, payload)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(self.retry_after())
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge_expired()
+        return self._jobs.get(job_id)
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up (one job finishing)."""
+        return max(1, math.ceil(self._avg_duration / max(1, self.worker_count)))
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job: Job = await self._queue.get()
+            self._running += 1
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await run_cancellable(
+                    self.handlers[job.type](job.payload), deadline=self.deadline, route=f"job:{job.type}"
+                )
+                job.status = "succeeded"
+                self.completed += 1
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "Job was cancelled"
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.id} ({job.type}) failed: {str(e)}")
+                job.status = "failed"
+                job.error = str(e)
+                self.failed += 1
+            finally:
+                job.finished_at = time.time()
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * (job.finished_at - job.started_at)
+                self._running -= 1
+                self._queue.task_done()
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.worker_count,
+            "queued": self._queue.qsize(),
+            "running": self._running,
+            "queue_size": self._queue.maxsize,
+            "retained": len(self._jobs),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_duration": round(self._avg_duration, 2),
+        }
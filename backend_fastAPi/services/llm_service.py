@@ -1,73 +1,602 @@
 import httpx
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Set, Tuple
 import logging
 import os
 from dotenv import load_dotenv
 import asyncio
-import re
+import time
+
+import backoff
+
+from config import env_bool, env_int, env_str
+from services.completion import CODE_POLICY, DEFAULT_POLICY, CompletionPolicy
+from services.fence_scanner import extract_ui_blocks
+from services.http_client import create_http_client
+from services.metrics import (
+    LLM_CALLS, PREDICTIONS_CANCELLED, UI_CONSISTENCY, UI_EDITS, UI_REPAIRS, WASTED_CALLS,
+    record_prompt, record_response, record_span, span,
+)
+from services.model_router import ModelRouter
+from services.patching import PatchError, apply_edits, parse_edits
+from services.resilience import (
+    RETRYABLE_STATUSES,
+    CircuitBreaker,
+    CircuitOpenError,
+    HedgePolicy,
+    LatencyTracker,
+    RetryableStatusError,
+    RetryPolicy,
+)
+from services.response_cache import ResponseCache, make_cache_key
+from services.scheduler import LLMScheduler, Priority
+from services.session_store import SessionStore
+from services.singleflight import SingleFlight
+from services.stream_parser import FileStreamParser
+from services.token_budget import TokenBudget, estimate_tokens
+from services.ui_contract import ContractError, check_consistency, format_contract, parse_contract, strip_fences
 
 # Load environment variables
 load_dotenv()
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Files every UI generation must produce
+UI_FILES = ("index.html", "style.css", "script.js")
+
+# What each file is responsible for when the files are generated separately
+FILE_ROLES = {
+    "index.html": "It must contain an element for every id in the contract, use the contract's classes, "
+                  "and link style.css and script.js.",
+    "style.css": "Style the elements through the contract's ids and classes.",
+    "script.js": "Implement the behaviour and events, looking elements up by the contract's ids and classes.",
+}
+
 class LLMServiceError(Exception):
     """Exception raised for errors in the LLM service."""
     pass
 
+class PredictionFailedError(LLMServiceError):
+    """The provider ended the prediction without a result; nothing is left running."""
+    pass
+
 class LLMService:
     """Service for interacting with the Replicate API."""
     
-    def __init__(self):
-        # self.base_url = "https://api.replicate.com/v1/models/meta/meta-llama-3-8b-instruct/predictions"
-        self.base_url = "https://api.replicate.com/v1/models/anthropic/claude-3.5-sonnet/predictions"
-        # self.base_url = "https://api.replicate.com/v1/models/anthropic/claude-3.7-sonnet/predictions"
-        # self.base_url = "https://api.replicate.com/v1/models/anthropic/claude-3.7-sonnet/predictions"
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[ResponseCache] = None,
+        scheduler: Optional[LLMScheduler] = None,
+        sessions: Optional[SessionStore] = None,
+    ):
+        # REPLICATE_API_BASE can point at a local stand-in (see bench/mock_replicate.py);
+        # LLM_MODEL selects the default model, e.g. meta/meta-llama-3-8b-instruct or anthropic/claude-3.7-sonnet,
+        # and LLM_MODEL_<TASK> / LLM_FALLBACK_MODEL[_<TASK>] route each kind of call (see ModelRouter)
+        self.api_base = env_str("REPLICATE_API_BASE", "https://api.replicate.com/v1").rstrip("/")
+        self.router = ModelRouter.from_env(self.api_base)
+        self.model = self.router.default_model
+        self.base_url = self.router.url(self.model)
         
         self.api_token = os.getenv("REPLICATE_API_TOKEN")
         if not self.api_token:
             raise LLMServiceError("REPLICATE_API_TOKEN environment variable not set")
         self.timeout = httpx.Timeout(timeout=120.0)
-        self.poll_interval = 1.0
-        self.max_polls = 30
-        # Initialize memory to store previous generations
-        self.memory: Dict[str, Dict[str, str]] = {}
-        self.memory_limit = 5  # Store the last 5 generations
-    
-    async def _poll_for_completion(self, client: httpx.AsyncClient, get_url: str) -> Dict[str, Any]:
-        """Poll the prediction URL until it's complete."""
-        for _ in range(self.max_polls):
-            response = await client.get(
-                get_url,
-                headers={"Authorization": f"Bearer {self.api_token}"}
-            )
-            result = response.json()
+        # Reuse the app-wide pooled client when one is injected; otherwise own a private one
+        self._owns_client = client is None
+        self.client = client if client is not None else create_http_client()
+        self.completion_policy = DEFAULT_POLICY
+        # Content-addressed cache of text responses, keyed by model + prompt + params
+        self.cache = cache if cache is not None else ResponseCache.from_env()
+        # Identical prompts in flight at the same time share one prediction
+        self.singleflight = SingleFlight()
+        # Global concurrency cap, rate limit and priority ordering for provider calls
+        self.scheduler = scheduler if scheduler is not None else LLMScheduler.from_env()
+        # Transport policies: retries on 429/5xx, hedging of slow predictions;
+        # each model has its own circuit breaker in the router
+        self.retry_policy = RetryPolicy.from_env()
+        self.hedge_policy = HedgePolicy.from_env()
+        self.latency = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+        # Predictions abandoned mid-flight, and how many of those the provider was asked to stop
+        self.wasted_calls = 0
+        self.cancelled_predictions = 0
+        self._background: Set[asyncio.Task] = set()
+        # Per-task output limits and prompt context trimming
+        self.budget = TokenBudget.from_env()
+        # Rounds of regenerating only the files missing from a truncated/malformed UI output
+        self.ui_repair_attempts = env_int("LLM_UI_REPAIR_ATTEMPTS", 1)
+        # Generate new UIs one file per call, in parallel, against a shared contract of ids and classes
+        self.ui_parallel = env_bool("LLM_UI_PARALLEL", False)
+        # Apply modifications as search/replace patches instead of regenerating every file
+        self.edit_mode = env_bool("LLM_EDIT_MODE", True)
+        # Previous generations per editing session, used as context for modifications
+        self.sessions = sessions if sessions is not None else SessionStore.from_env()
+    
+    async def aclose(self) -> None:
+        """Close the HTTP client if this service created it."""
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def _poll_for_completion(self, get_url: str, policy: CompletionPolicy, deadline: float) -> Dict[str, Any]:
+        """Poll the prediction URL with adaptive backoff until it's complete or the deadline passes."""
+        loop = asyncio.get_running_loop()
+        for delay in policy.poll_delays():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(delay, remaining))
             
-            if result.get("status") == "succeeded":
+            try:
+                with span("poll"):
+                    response = await self.client.get(
+                        get_url,
+                        headers={"Authorization": f"Bearer {self.api_token}"}
+                    )
+            except httpx.TransportError as e:
+                # A dropped poll doesn't affect the prediction itself; try again next round
+                logger.warning(f"Poll failed, will retry: {str(e)}")
+                continue
+            if response.status_code in RETRYABLE_STATUSES:
+                logger.warning(f"Poll returned {response.status_code}, will retry")
+                continue
+            result = response.json()
+            if self._is_finished(result):
                 return result
-            elif result.get("status") == "failed":
-                raise LLMServiceError(f"Prediction failed: {result.get('error')}")
-            
-            await asyncio.sleep(self.poll_interval)
         
-        raise LLMServiceError("Prediction timed out")
+        raise LLMServiceError(f"Prediction timed out after {policy.deadline:.0f}s")
+    
+    def _is_finished(self, prediction: Dict[str, Any]) -> bool:
+        """Return True for a succeeded prediction, raise for failed/canceled ones."""
+        status = prediction.get("status")
+        if status == "succeeded":
+            return True
+        if status in ("failed", "canceled"):
+            raise PredictionFailedError(f"Prediction {status}: {prediction.get('error')}")
+        return False
+    
+    async def _create_prediction(
+        self, payload: Dict[str, Any], policy: CompletionPolicy, model: str, wait: bool = True
+    ) -> Dict[str, Any]:
+        """POST a new prediction to `model`; with `wait` the provider may block until it finishes."""
+        headers = {
+            "Authorization": f"Bearer {self.api_token}",
+            "Content-Type": "application/json"
+        }
+        timeout = self.timeout
+        if wait and policy.prefer_header:
+            headers["Prefer"] = policy.prefer_header
+            # The create call may now block server-side, so allow for it on the read timeout
+            timeout = httpx.Timeout(timeout=max(120.0, policy.sync_wait + 15.0), connect=10.0)
+        
+        record_prompt(policy.name, payload["input"]["prompt"])
+        with span("create"):
+            response = await self.client.post(
+                self.router.url(model),
+                json=payload,
+                timeout=timeout,
+                headers=headers
+            )
+        
+        logger.debug(f"Response status: {response.status_code}")
+        
+        if response.status_code in RETRYABLE_STATUSES:
+            raise RetryableStatusError(response.status_code, response.text)
+        if response.status_code not in (200, 201):
+            raise LLMServiceError(f"API returned status {response.status_code}: {response.text}")
+        
+        prediction = response.json()
+        if not prediction or 'urls' not in prediction or 'get' not in prediction['urls']:
+            raise LLMServiceError("Invalid response format")
+        return prediction
+    
+    async def _create_with_retries(
+        self, payload: Dict[str, Any], policy: CompletionPolicy, model: str, wait: bool = True
+    ) -> Dict[str, Any]:
+        """Create a prediction, retrying 429/5xx and connection errors with jittered backoff."""
+        create = backoff.on_exception(
+            backoff.expo,
+            (RetryableStatusError, httpx.TransportError),
+            max_tries=self.retry_policy.max_attempts,
+            jitter=backoff.full_jitter,
+            on_backoff=self._on_retry,
+            factor=self.retry_policy.base_delay,
+            max_value=self.retry_policy.max_delay,
+        )(self._create_prediction)
+        return await create(payload, policy, model, wait)
+    
+    def _on_retry(self, details: Dict[str, Any]) -> None:
+        self.retries += 1
+        logger.warning(f"Retrying prediction create (attempt {details['tries']}) after {details['wait']:.2f}s")
+    
+    async def _attempt_prediction(self, payload: Dict[str, Any], policy: CompletionPolicy, model: str) -> Dict[str, Any]:
+        """
+        One prediction from create to final result. If it is cancelled, runs
+        past the policy's deadline or polling fails, the prediction is also
+        cancelled at the provider, so a retry or fallback never runs alongside it.
+        """
+        deadline = asyncio.get_running_loop().time() + policy.deadline
+        prediction = await self._create_cancellable(payload, policy, model)
+        try:
+            if self._is_finished(prediction):
+                return prediction
+            return await self._poll_for_completion(prediction['urls']['get'], policy, deadline)
+        except PredictionFailedError:
+            raise
+        except (asyncio.CancelledError, Exception):
+            self._abandon(prediction, policy.name)
+            raise
+    
+    async def _hedged_prediction(self, payload: Dict[str, Any], policy: CompletionPolicy, model: str) -> Dict[str, Any]:
+        """
+        Run a prediction, racing a backup against it if it is unusually slow.
+
+        The backup is issued once the primary exceeds the recent p95 latency
+        for this kind of call; whichever finishes first wins and the other is
+        cancelled, including at the provider. The backup needs a scheduler
+        slot of its own, so it is skipped while the scheduler is saturated
+        rather than pushing provider concurrency past the limit.
+        """
+        threshold = self.latency.quantile(
+            policy.name, self.hedge_policy.quantile, self.hedge_policy.min_samples
+        ) or self.hedge_policy.after
+        
+        pending: Set[asyncio.Future] = {asyncio.ensure_future(self._attempt_prediction(payload, policy, model))}
+        hedge: Optional[asyncio.Future] = None
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=None if hedge else threshold,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if not self.scheduler.try_acquire():
+                        logger.info(f"Prediction slower than {threshold:.1f}s, scheduler saturated; not hedging")
+                        self.hedges_skipped += 1
+                        threshold = None
+                        continue
+                    logger.info(f"Prediction slower than {threshold:.1f}s, issuing hedged request")
+                    hedge = asyncio.ensure_future(self._hedge_attempt(payload, policy, model))
+                    pending.add(hedge)
+                    self.hedges += 1
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                if hedge is None:
+                    # Failed before a hedge was worth issuing
+                    break
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _hedge_attempt(self, payload: Dict[str, Any], policy: CompletionPolicy, model: str) -> Dict[str, Any]:
+        """The backup prediction, holding the scheduler slot taken for it until it ends."""
+        try:
+            return await self._attempt_prediction(payload, policy, model)
+        finally:
+            self.scheduler.release()
+    
+    async def _create_cancellable(
+        self, payload: Dict[str, Any], policy: CompletionPolicy, model: str, wait: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Create a prediction. If the caller is cancelled while the create is in
+        flight (it may block for a while with "Prefer: wait"), the create is
+        allowed to finish and the prediction it returns is cancelled then.
+        """
+        create = asyncio.ensure_future(self._create_with_retries(payload, policy, model, wait))
+        try:
+            return await asyncio.shield(create)
+        except asyncio.CancelledError:
+            self._background.add(create)
+            create.add_done_callback(self._background.discard)
+            create.add_done_callback(lambda task: self._abandon_created(task, policy.name))
+            raise
+    
+    def _abandon_created(self, create: "asyncio.Future", kind: str) -> None:
+        if not create.cancelled() and create.exception() is None:
+            self._abandon(create.result(), kind)
+    
+    def _abandon(self, prediction: Optional[Dict[str, Any]], kind: str) -> None:
+        """Count a prediction nobody is waiting for any more and stop it at the provider if still running."""
+        if prediction is None or prediction.get('status') in ("succeeded", "failed", "canceled"):
+            return
+        self.wasted_calls += 1
+        WASTED_CALLS.inc(kind=kind)
+        self._cancel_in_background(prediction)
+    
+    def _cancel_in_background(self, prediction: Dict[str, Any]) -> None:
+        """Ask the provider to stop a prediction nobody is waiting for any more."""
+        cancel_url = prediction.get('urls', {}).get('cancel')
+        if not cancel_url:
+            return
+        task = asyncio.ensure_future(self._cancel_prediction(cancel_url))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
     
-    def _save_to_memory(self, prompt: str, response: Dict[str, str]) -> None:
-        """Save the prompt and response to memory."""
-        # Create a simple hash of the prompt as a key
-        key = str(hash(prompt))
-        self.memory[key] = response
+    async def _cancel_prediction(self, cancel_url: str) -> None:
+        try:
+            response = await self.client.post(cancel_url, headers={"Authorization": f"Bearer {self.api_token}"})
+            response.raise_for_status()
+        except Exception as e:
+            PREDICTIONS_CANCELLED.inc(result="failed")
+            logger.warning(f"Failed to cancel prediction: {str(e)}")
+            return
+        self.cancelled_predictions += 1
+        PREDICTIONS_CANCELLED.inc(result="sent")
+    
+    async def _run_prediction(
+        self,
+        payload: Dict[str, Any],
+        policy: Optional[CompletionPolicy] = None,
+        model: Optional[str] = None,
+        fallback: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Create a prediction on `model` (default model if omitted) and wait for its final result.
+
+        The create request uses the provider's blocking "Prefer: wait" mode so
+        short predictions come back in a single round trip; anything still
+        running afterwards is polled until the policy's wall-clock deadline.
+        Transient create failures are retried, slow predictions may be
+        hedged, and the model's circuit breaker fails fast while it is down.
+        `fallback` marks the call as a fallback in the router's stats.
+        """
+        policy = policy or self.completion_policy
+        model = model or self.model
+        breaker = self._check_breaker(model)
+        prompt_tokens = estimate_tokens(payload["input"]["prompt"])
+        start = time.perf_counter()
+        
+        try:
+            if self.hedge_policy.enabled:
+                final_result = await self._hedged_prediction(payload, policy, model)
+            else:
+                final_result = await self._attempt_prediction(payload, policy, model)
+        except asyncio.CancelledError:
+            breaker.record_abandoned()
+            LLM_CALLS.inc(kind=policy.name, outcome="cancelled")
+            raise
+        except LLMServiceError:
+            breaker.record_failure()
+            self.router.record(model, time.perf_counter() - start, prompt_tokens, 0, False, fallback)
+            LLM_CALLS.inc(kind=policy.name, outcome="error")
+            raise
+        except (RetryableStatusError, httpx.TransportError) as e:
+            breaker.record_failure()
+            self.router.record(model, time.perf_counter() - start, prompt_tokens, 0, False, fallback)
+            LLM_CALLS.inc(kind=policy.name, outcome="error")
+            raise LLMServiceError(f"Prediction failed after retries: {str(e)}") from e
+        
+        elapsed = time.perf_counter() - start
+        breaker.record_success()
+        self.latency.record(policy.name, elapsed)
+        output = ''.join(final_result.get('output') or [])
+        self.router.record(model, elapsed, prompt_tokens, estimate_tokens(output), True, fallback)
         
-        # Keep memory within the limit
-        if len(self.memory) > self.memory_limit:
-            # Remove the oldest entry
-            oldest_key = next(iter(self.memory))
-            self.memory.pop(oldest_key)
+        if not output:
+            LLM_CALLS.inc(kind=policy.name, outcome="empty")
+            raise LLMServiceError("No output in prediction")
         
-        logger.debug(f"Saved generation to memory. Memory size: {len(self.memory)}")
+        LLM_CALLS.inc(kind=policy.name, outcome="success")
+        record_response(policy.name, output)
+        return final_result
+    
+    async def _run_routed(self, payload: Dict[str, Any], policy: CompletionPolicy, task: str) -> Dict[str, Any]:
+        """
+        Run a prediction on the model routed for `task`, retrying once on the
+        task's fallback model if that call fails.
+        """
+        model = self.router.select(task)
+        fallback = self.router.fallback(task)
+        try:
+            return await self._run_prediction(payload, policy, model, fallback=model == fallback)
+        except LLMServiceError as e:
+            if fallback is None or model == fallback:
+                raise
+            logger.warning(f"{model} failed for {task}, falling back to {fallback}: {str(e)}")
+            return await self._run_prediction(payload, policy, fallback, fallback=True)
+    
+    def _check_breaker(self, model: str) -> CircuitBreaker:
+        """Return the model's circuit breaker, raising LLMServiceError if it is open."""
+        breaker = self.router.breaker(model)
+        try:
+            breaker.before_call()
+        except CircuitOpenError as e:
+            raise LLMServiceError(f"{model}: {str(e)}") from e
+        return breaker
+    
+    def transport_stats(self) -> Dict[str, Any]:
+        """Retry, hedging and abandoned-prediction counters; circuit breakers are per model, see `router.stats()`."""
+        return {
+            "retries": self.retries,
+            "hedging_enabled": self.hedge_policy.enabled,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedges_skipped": self.hedges_skipped,
+            "wasted_calls": self.wasted_calls,
+            "cancelled_predictions": self.cancelled_predictions,
+        }
+    
+    async def _iter_sse(self, stream_url: str, policy: CompletionPolicy) -> AsyncIterator[Tuple[str, str]]:
+        """Yield (event, data) pairs from a server-sent-events stream."""
+        headers = {
+            "Authorization": f"Bearer {self.api_token}",
+            "Accept": "text/event-stream",
+            "Cache-Control": "no-store"
+        }
+        timeout = httpx.Timeout(timeout=policy.deadline, connect=10.0)
+        async with self.client.stream("GET", stream_url, headers=headers, timeout=timeout) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise LLMServiceError(f"Stream returned status {response.status_code}: {response.text}")
+            
+            event, data = "message", []
+            async for line in response.aiter_lines():
+                if not line:
+                    if data:
+                        yield event, "\n".join(data)
+                    event, data = "message", []
+                elif line.startswith(":"):
+                    continue
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    value = line[len("data:"):]
+                    data.append(value[1:] if value.startswith(" ") else value)
+            if data:
+                yield event, "\n".join(data)
+    
+    def _text_payload(self, prompt: str, task: str, previous_output: str = "") -> Dict[str, Any]:
+        """Prediction payload for a plain text generation, with the output limit for its task."""
+        max_new_tokens = self.budget.output_tokens(task, prompt, previous_output)
+        if max_new_tokens <= 0:
+            raise LLMServiceError("Prompt does not fit in the model's context window")
+        return {
+            "input": {
+                "prompt": prompt,
+                "temperature": 0.7,
+                "max_new_tokens": max_new_tokens
+            }
+        }
+    
+    def _cache_key(self, payload: Dict[str, Any], task: str) -> str:
+        """
+        Cache key for a payload: model URL + prompt + sampling params. The
+        task's primary model is used even when a call was served by the
+        fallback, so a fallback answer is reused once the primary recovers.
+        """
+        params = {k: v for k, v in payload["input"].items() if k != "prompt"}
+        return make_cache_key(self.router.url(self.router.primary(task)), payload["input"]["prompt"], params)
+    
+    async def stream_text(
+        self,
+        prompt: str,
+        policy: Optional[CompletionPolicy] = None,
+        use_cache: bool = True,
+        priority: Priority = Priority.NORMAL,
+        task: Optional[str] = None,
+        previous_output: str = "",
+    ) -> AsyncIterator[str]:
+        """
+        Generate text and yield output tokens as the provider produces them.
+
+        Uses the prediction's stream URL instead of polling. Models that don't
+        expose a stream URL fall back to polling and yield one chunk.
+        A cached response is yielded as a single chunk. `task` picks the
+        output token budget and the model, and defaults to the policy's name;
+        `previous_output` is earlier output this call rewrites, which raises
+        the budget to fit it. If the prediction can't be created on the task's model, it is created
+        on the fallback model instead.
+        """
+        policy = policy or self.completion_policy
+        task = task or policy.name
+        payload = self._text_payload(prompt, task, previous_output)
+        cache_key = self._cache_key(payload, task)
+        
+        if use_cache:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                LLM_CALLS.inc(kind=policy.name, outcome="cached")
+                yield cached
+                return
+        
+        if self.singleflight.in_flight(cache_key):
+            # An identical non-streaming call is already running; share its result
+            yield await self.generate_text(
+                prompt, policy, use_cache=False, priority=priority, task=task, previous_output=previous_output
+            )
+            return
+        
+        payload["stream"] = True
+        chunks: List[str] = []
+        model = self.router.select(task)
+        fallback = self.router.fallback(task)
+        breaker = self._check_breaker(model)
+        prompt_tokens = estimate_tokens(prompt)
+        start = time.perf_counter()
+        prediction: Optional[Dict[str, Any]] = None
+        try:
+            async with self.scheduler.slot(priority):
+                try:
+                    prediction = await self._create_cancellable(payload, policy, model, wait=False)
+                except (LLMServiceError, RetryableStatusError, httpx.TransportError) as e:
+                    if fallback is None or model == fallback:
+                        raise
+                    # Nothing has been streamed yet, so the fallback model can take over
+                    logger.warning(f"{model} failed for {task}, falling back to {fallback}: {str(e)}")
+                    breaker.record_failure()
+                    self.router.record(model, time.perf_counter() - start, prompt_tokens, 0, False)
+                    model = fallback
+                    breaker = self._check_breaker(model)
+                    start = time.perf_counter()
+                    prediction = await self._create_cancellable(payload, policy, model, wait=False)
+                stream_url = prediction['urls'].get('stream')
+                if stream_url:
+                    stream_start = time.perf_counter()
+                    async for event, data in self._iter_sse(stream_url, policy):
+                        if event == "output":
+                            chunks.append(data)
+                            yield data
+                        elif event == "error":
+                            raise PredictionFailedError(f"Prediction failed: {data}")
+                        elif event == "done":
+                            # The done event carries a reason when the prediction didn't succeed
+                            if data and data.strip() not in ("{}", ""):
+                                reason = json.loads(data).get("reason")
+                                if reason:
+                                    raise PredictionFailedError(f"Prediction {reason}")
+                            break
+                    record_span("stream", time.perf_counter() - stream_start)
+                else:
+                    # No stream URL for this model: wait for the prediction we just created
+                    deadline = asyncio.get_running_loop().time() + policy.deadline
+                    if not self._is_finished(prediction):
+                        prediction = await self._poll_for_completion(prediction['urls']['get'], policy, deadline)
+                    text = ''.join(prediction.get('output') or [])
+                    chunks.append(text)
+                    yield text
+                    
+        except (asyncio.CancelledError, GeneratorExit):
+            breaker.record_abandoned()
+            LLM_CALLS.inc(kind=policy.name, outcome="cancelled")
+            # The consumer went away mid-stream; don't let the prediction run on
+            self._abandon(prediction, policy.name)
+            raise
+        except LLMServiceError as e:
+            breaker.record_failure()
+            self.router.record(model, time.perf_counter() - start, prompt_tokens, 0, False, model == fallback)
+            LLM_CALLS.inc(kind=policy.name, outcome="error")
+            if not isinstance(e, PredictionFailedError):
+                # Timed out or the stream broke; the prediction may still be running
+                self._abandon(prediction, policy.name)
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            self.router.record(model, time.perf_counter() - start, prompt_tokens, 0, False, model == fallback)
+            LLM_CALLS.inc(kind=policy.name, outcome="error")
+            self._abandon(prediction, policy.name)
+            logger.error(f"Error streaming text: {str(e)}")
+            raise LLMServiceError(f"Error streaming text: {str(e)}")
+        
+        breaker.record_success()
+        self.router.record(
+            model, time.perf_counter() - start, prompt_tokens, estimate_tokens(''.join(chunks)), True, model == fallback
+        )
+        LLM_CALLS.inc(kind=policy.name, outcome="success")
+        record_response(policy.name, ''.join(chunks))
+        if chunks:
+            await self.cache.set(cache_key, ''.join(chunks))
     
     def _is_modification_request(self, prompt: str) -> bool:
         """Check if the prompt is requesting a modification to an existing UI."""
@@ -79,20 +608,10 @@ class LLMService:
         prompt_lower = prompt.lower()
         return any(keyword in prompt_lower for keyword in modification_keywords)
     
-    def _get_latest_response(self) -> Optional[Dict[str, str]]:
-        """Get the most recent response from memory."""
-        if not self.memory:
-            return None
-        
-        # Return the most recently added response
-        return next(reversed(list(self.memory.values())))
-    
-    def _build_prompt_with_memory(self, prompt: str) -> str:
-        """Build a prompt that includes context from memory if this is a modification request."""
-        latest_response = self._get_latest_response()
-        
-        if not latest_response or not self._is_modification_request(prompt):
-            # If no memory or not a modification request, return the standard prompt
+    def _build_prompt_with_memory(self, prompt: str, previous_files: Optional[Dict[str, str]] = None) -> str:
+        """Build a prompt that includes the session's previous files if this is a modification request."""
+        if not previous_files or not self._is_modification_request(prompt):
+            # If no previous generation or not a modification request, return the standard prompt
             return f"""You are a UI development expert. Create a complete implementation for this requirement: '{prompt}'
 
 Return only the code in three blocks:
@@ -110,22 +629,25 @@ Return only the code in three blocks:
 
 Make the code clean, modern, and production-ready. Include proper styling and interactivity."""
         
-        # For modification requests, include the previous implementation
-        return f"""You are a UI development expert. You previously created this implementation:
+        # For modification requests, include the previous implementation,
+        # condensed if it would take up too much of the prompt
+        previous = self.budget.fit_files({name: previous_files.get(name, "") for name in UI_FILES})
+        return f"""You are a UI development expert. You previously created this implementation
+(parts marked as omitted were left out for brevity; keep their behaviour unchanged):
 
 HTML:
 ```html
-{latest_response.get('html', '')}
+{previous['index.html']}
 ```
 
 CSS:
 ```css
-{latest_response.get('css', '')}
+{previous['style.css']}
 ```
 
 JavaScript:
 ```javascript
-{latest_response.get('javascript', '')}
+{previous['script.js']}
 ```
 
 Now, modify the existing implementation to meet this new requirement: '{prompt}'
@@ -145,54 +667,82 @@ Return the COMPLETE UPDATED code in the same three blocks:
 
 Make sure to preserve the existing functionality while adding the requested changes. Make the code clean, modern, and production-ready."""
 
-    async def generate_text(self, prompt: str) -> str:
+    async def generate_text(
+        self,
+        prompt: str,
+        policy: Optional[CompletionPolicy] = None,
+        use_cache: bool = True,
+        priority: Priority = Priority.NORMAL,
+        task: Optional[str] = None,
+        previous_output: str = "",
+    ) -> str:
         """
         Generate text response (not code blocks) for agent reasoning steps.
         This is a wrapper around generate() but returns only the text, not code blocks.
+        `policy` overrides how long and how eagerly to wait for the prediction.
+        With `use_cache=False` the cache is not consulted, but the fresh
+        response still replaces any cached one. `priority` decides the order
+        in which the shared scheduler admits the call when the provider is busy.
+        `task` ("analysis", "plan", "prd", "code") picks the output token
+        budget and defaults to the policy's name; `previous_output` is
+        earlier output this call rewrites, which raises the budget to fit it.
         """
         # For text generation, we don't use code block extraction or memory features
         try:
-            payload = {
-                "input": {
-                    "prompt": prompt,
-                    "temperature": 0.7,
-                    "max_new_tokens": 1000
-                }
-            }
+            task = task or (policy or self.completion_policy).name
+            payload = self._text_payload(prompt, task, previous_output)
+            cache_key = self._cache_key(payload, task)
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    self.base_url,
-                    json=payload,
-                    headers={
-                        "Authorization": f"Bearer {self.api_token}",
-                        "Content-Type": "application/json"
-                    }
-                )
-                
-                if response.status_code != 201:
-                    raise LLMServiceError(f"API returned status {response.status_code}: {response.text}")
-                
-                prediction = response.json()
-                if not prediction or 'urls' not in prediction or 'get' not in prediction['urls']:
-                    raise LLMServiceError("Invalid response format")
-
-                final_result = await self._poll_for_completion(client, prediction['urls']['get'])
-                
-                if not final_result.get('output'):
-                    raise LLMServiceError("No output in prediction")
-                
-                # Join the output chunks and return
-                return ''.join(final_result['output'])
+            if use_cache:
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    logger.debug("Serving text generation from cache")
+                    LLM_CALLS.inc(kind=(policy or self.completion_policy).name, outcome="cached")
+                    return cached
+            
+            # Concurrent callers with the same prompt and params await one prediction
+            return await self.singleflight.do(
+                cache_key, lambda: self._generate_uncached(payload, policy, cache_key, priority, task)
+            )
                 
         except Exception as e:
             logger.error(f"Error generating text: {str(e)}")
             raise LLMServiceError(f"Error generating text: {str(e)}")
 
-    async def generate(self, prompt: str) -> Dict[str, str]:
-        """Generate UI code based on the requirement."""
+    async def _generate_uncached(
+        self,
+        payload: Dict[str, Any],
+        policy: Optional[CompletionPolicy],
+        cache_key: str,
+        priority: Priority,
+        task: str,
+    ) -> str:
+        """Run a text prediction in a scheduler slot and store its output in the cache."""
+        async with self.scheduler.slot(priority):
+            final_result = await self._run_routed(payload, policy or self.completion_policy, task)
+        
+        # Join the output chunks and return
+        text = ''.join(final_result['output'])
+        await self.cache.set(cache_key, text)
+        return text
+
+    async def generate(self, prompt: str, session_id: Optional[str] = None) -> Dict[str, str]:
+        """
+        Generate UI code based on the requirement. With a `session_id`, a
+        modification request is applied to that session's previous code,
+        as a patch when possible.
+        """
         try:
-            structured_prompt = self._build_prompt_with_memory(prompt)
+            previous_files = await self.sessions.files(session_id) if session_id else None
+            if self._is_modification_request(prompt) and self.can_edit(previous_files):
+                try:
+                    files = await self.edit_ui(prompt, previous_files)
+                except PatchError:
+                    pass
+                else:
+                    await self.sessions.record_turn(session_id, prompt, files)
+                    return {'html': files["index.html"], 'css': files["style.css"], 'javascript': files["script.js"]}
+            structured_prompt = self._build_prompt_with_memory(prompt, previous_files)
 
             # Enhance the prompt to emphasize the need for all three code blocks
             structured_prompt += """
@@ -215,92 +765,97 @@ Example structure:
 ```
 """
 
+            # A modification rewrites the previous code, so leave room for all of it
+            is_modification = bool(previous_files) and self._is_modification_request(prompt)
+            previous_output = "".join(previous_files.values()) if is_modification else ""
             payload = {
                 "input": {
                     "prompt": structured_prompt,
                     "temperature": 0.7,
-                    "max_new_tokens": 1000  # Increased for complete code generation
+                    "max_new_tokens": self.budget.output_tokens("code", structured_prompt, previous_output)
                 }
             }
             
             logger.debug(f"Sending request to Replicate API")
             logger.debug(f"Payload length: {len(structured_prompt)}")
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    self.base_url,
-                    json=payload,
-                    headers={
-                        "Authorization": f"Bearer {self.api_token}",
-                        "Content-Type": "application/json"
-                    }
-                )
-                
-                logger.debug(f"Response status: {response.status_code}")
-                
-                if response.status_code != 201:
-                    raise LLMServiceError(f"API returned status {response.status_code}: {response.text}")
-                
-                prediction = response.json()
-                if not prediction or 'urls' not in prediction or 'get' not in prediction['urls']:
-                    raise LLMServiceError("Invalid response format")
-
-                final_result = await self._poll_for_completion(client, prediction['urls']['get'])
-                
-                if not final_result.get('output'):
-                    raise LLMServiceError("No output in prediction")
-                
-                # Join the output chunks and extract code blocks
-                combined_output = ''.join(final_result['output'])
-                
-                # Extract code blocks using regex
-                html = re.search(r'```html\s*(.*?)\s*```', combined_output, re.DOTALL)
-                css = re.search(r'```css\s*(.*?)\s*```', combined_output, re.DOTALL)
-                js = re.search(r'```javascript\s*(.*?)\s*```', combined_output, re.DOTALL)
-                
-                # Add fallback - if no CSS or JS found, extract any style or script tags from HTML
-                html_content = html.group(1).strip() if html else ""
-                css_content = css.group(1).strip() if css else ""
-                js_content = js.group(1).strip() if js else ""
-                
-                # If CSS or JS is empty, try to extract from HTML
-                if not css_content:
-                    css_match = re.search(r'<style>(.*?)</style>', html_content, re.DOTALL)
-                    if css_match:
-                        css_content = css_match.group(1).strip()
-                
-                if not js_content:
-                    js_match = re.search(r'<script>(.*?)</script>', html_content, re.DOTALL)
-                    if js_match:
-                        js_content = js_match.group(1).strip()
-                
-                # Ensure we have at least minimal content for each section
-                if not css_content:
-                    css_content = "/* Default styles for TODO app */\nbody {\n  font-family: Arial, sans-serif;\n  margin: 0;\n  padding: 20px;\n}\n"
-                
-                if not js_content:
-                    js_content = "// Basic functionality for TODO app\ndocument.addEventListener('DOMContentLoaded', function() {\n  console.log('TODO app initialized');\n});\n"
-                
-                result = {
-                    'html': html_content,
-                    'css': css_content,
-                    'javascript': js_content
-                }
-                
-                # Save the result to memory
-                self._save_to_memory(prompt, result)
-                
-                return result
-                
+            final_result = await self._run_routed(payload, CODE_POLICY, "code")
+            
+            # Join the output chunks and extract code blocks
+            combined_output = ''.join(final_result['output'])
+            
+            # One pass over the output for every fenced block, with inline <style>/<script> as fallback
+            parse_start = time.perf_counter()
+            blocks = extract_ui_blocks(combined_output)
+            html_content = blocks["html"]
+            css_content = blocks["css"]
+            js_content = blocks["javascript"]
+            
+            # Ensure we have at least minimal content for each section
+            if not css_content:
+                css_content = "/* Default styles for TODO app */\nbody {\n  font-family: Arial, sans-serif;\n  margin: 0;\n  padding: 20px;\n}\n"
+            
+            if not js_content:
+                js_content = "// Basic functionality for TODO app\ndocument.addEventListener('DOMContentLoaded', function() {\n  console.log('TODO app initialized');\n});\n"
+            
+            result = {
+                'html': html_content,
+                'css': css_content,
+                'javascript': js_content
+            }
+            record_span("parse", time.perf_counter() - parse_start)
+            
+            if session_id:
+                await self.sessions.record_turn(session_id, prompt, {
+                    "index.html": html_content,
+                    "style.css": css_content,
+                    "script.js": js_content,
+                })
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Error: {str(e)}")
             raise LLMServiceError(f"Error: {str(e)}")
 
-    async def generate_ui(self, requirement: str) -> Dict[str, str]:
-        """Generate UI code files based on the requirement."""
-        prompt = f"""
+    def _spec_sections(
+        self,
+        plan: Optional[str],
+        prd: Optional[str],
+        previous: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """Prompt sections carrying an approved PRD, an implementation plan and/or the code being modified."""
+        prd_section = f"""
+        Implement everything in this approved Product Requirements Document:
+        {prd}
+        """ if prd else ""
+        plan_section = f"""
+        Follow this implementation plan:
+        {plan}
+        """ if plan else ""
+        previous_section = ""
+        if previous:
+            # Condensed if large; omitted parts are marked and must be kept as they are
+            context = self.budget.fit_files(previous)
+            current = "\n\n".join(f"--- {name} ---\n{content}" for name, content in context.items())
+            previous_section = f"""
+        This is the current implementation. Update it to meet the requirement and keep
+        everything else unchanged (parts marked as omitted were left out for brevity):
+        {current}
+        """
+        return prd_section + plan_section + previous_section
+    
+    def _build_ui_prompt(
+        self,
+        requirement: str,
+        plan: Optional[str] = None,
+        prd: Optional[str] = None,
+        previous: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """Prompt asking for the three UI files as a single JSON object."""
+        return f"""
         Create a complete implementation for this requirement: '{requirement}'
-        
+        {self._spec_sections(plan, prd, previous)}
         Return ONLY a JSON object with exactly this structure:
         {{
             "index.html": "<complete HTML code here>",
@@ -312,23 +867,519 @@ Example structure:
         Do not include any explanations or markdown formatting.
         Return only the JSON object.
         """
+    
+    def _build_repair_prompt(
+        self,
+        requirement: str,
+        plan: Optional[str],
+        files: Dict[str, str],
+        missing: List[str],
+        prd: Optional[str] = None,
+        previous: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """Prompt asking only for the files a previous generation failed to deliver."""
+        # Only the earlier versions of the files being regenerated matter here
+        previous = {name: previous[name] for name in missing if name in previous} if previous else None
+        context = self.budget.fit_files(files)
+        existing = "\n\n".join(f"--- {name} ---\n{content}" for name, content in context.items())
+        existing_section = f"""
+        These files were already generated and must not change:
+        {existing}
+        """ if files else ""
+        structure = ",\n".join(f'            "{name}": "<complete content of {name}>"' for name in missing)
+        return f"""
+        Complete the implementation for this requirement: '{requirement}'
+        {self._spec_sections(plan, prd, previous)}{existing_section}
+        Return ONLY a JSON object with exactly these missing files:
+        {{
+{structure}
+        }}
         
+        The files must work together with the existing ones and be fully functional.
+        Do not include any explanations or markdown formatting.
+        Return only the JSON object.
+        """
+    
+    def _previous_output(self, previous: Optional[Dict[str, str]], names=UI_FILES) -> str:
+        """The earlier code a modification rewrites, used to size its output budget."""
+        return "".join(previous.get(name, "") for name in names) if previous else ""
+    
+    def _ui_cache_key(self, prompt: str, previous_output: str = "") -> str:
+        """Cache key generate_text/stream_text use for a UI prompt."""
+        return self._cache_key(self._text_payload(prompt, "code", previous_output), "code")
+    
+    def _validate_ui_files(self, files: Dict[str, str]) -> Dict[str, str]:
+        """Make sure every required file is present in the generated output."""
+        if not all(file in files for file in UI_FILES):
+            raise LLMServiceError("Invalid response structure: missing required files")
+        return files
+
+    async def _complete_ui_files(
+        self,
+        requirement: str,
+        plan: Optional[str],
+        parser: FileStreamParser,
+        policy: CompletionPolicy,
+        use_cache: bool,
+        priority: Priority,
+        prd: Optional[str] = None,
+        previous: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, str]:
+        """
+        Return the complete files from a parsed UI output, regenerating only
+        those that are missing or were cut off (e.g. by the token limit).
+        Raises LLMServiceError if files are still missing after the repair rounds.
+        """
+        files = {name: parser.files[name] for name in parser.completed}
+        for _ in range(self.ui_repair_attempts):
+            missing = [name for name in UI_FILES if name not in files]
+            if not missing:
+                break
+            reason = "truncated" if parser.truncated else "incomplete"
+            logger.warning(f"UI output {reason}; regenerating only {', '.join(missing)}")
+            prompt = self._build_repair_prompt(requirement, plan, files, missing, prd, previous)
+            previous_output = self._previous_output(previous, missing)
+            response = await self.generate_text(
+                prompt, policy, use_cache=use_cache, priority=priority, task="code", previous_output=previous_output
+            )
+            with span("parse"):
+                repair = FileStreamParser()
+                repair.feed(response)
+            repaired = [name for name in missing if name in repair.completed]
+            files.update({name: repair.files[name] for name in repaired})
+            if len(repaired) < len(missing):
+                # Don't keep serving a repair that didn't deliver
+                await self.cache.delete(self._ui_cache_key(prompt, previous_output))
+            UI_REPAIRS.inc(result="complete" if len(repaired) == len(missing) else "partial")
+        return self._validate_ui_files(files)
+
+    def _build_contract_prompt(self, requirement: str, plan: Optional[str] = None, prd: Optional[str] = None) -> str:
+        """Prompt asking for the ids, classes, data and events the UI files must share."""
+        return f"""
+        Design the shared interface of a UI for this requirement: '{requirement}'
+        {self._spec_sections(plan, prd)}
+        The UI consists of index.html, style.css and script.js, which will be written
+        separately and at the same time, so they must agree on every name they share.
+        Return ONLY a JSON object with exactly this structure:
+        {{
+            "ids": {{"<element id>": "<what the element is>"}},
+            "classes": {{"<class name>": "<what it marks or styles>"}},
+            "data": "<shape of the app state, including anything kept in localStorage>",
+            "events": ["<user interaction and the ids it involves>"]
+        }}
+
+        List every id the script needs and every class used by more than one file.
+        Do not include any explanations or markdown formatting.
+        Return only the JSON object.
+        """
+
+    def _build_file_prompt(
+        self,
+        requirement: str,
+        filename: str,
+        contract: Dict[str, Any],
+        plan: Optional[str] = None,
+        prd: Optional[str] = None,
+        issues: Optional[List[str]] = None,
+        files: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """
+        Prompt asking for one UI file written against the shared contract. With
+        `issues`, asks to fix that file given the current `files`.
+        """
+        repair_section = ""
+        if issues:
+            others = self.budget.fit_files({name: content for name, content in files.items() if name != filename})
+            context = "\n\n".join(f"--- {name} ---\n{content}" for name, content in others.items())
+            problems = "\n".join(f"- {filename} {issue}" for issue in issues)
+            repair_section = f"""
+        The other files are:
+        {context}
+
+        This version of {filename} doesn't match them:
+        {files[filename]}
+
+        Fix these problems and return the whole file:
+        {problems}
+        """
+        return f"""
+        Implement part of a UI for this requirement: '{requirement}'
+        {self._spec_sections(plan, prd)}
+        The UI consists of index.html, style.css and script.js, each written separately
+        against this shared contract:
+        {format_contract(contract)}
+
+        Write only the file `{filename}`. {FILE_ROLES[filename]}
+        Use exactly the ids and class names from the contract; don't rename them or
+        rely on names the other files won't define.
+        {repair_section}
+        Return ONLY the complete content of {filename}.
+        Do not include any explanations or markdown formatting.
+        """
+
+    async def _generate_contract(
+        self,
+        requirement: str,
+        plan: Optional[str],
+        prd: Optional[str],
+        policy: CompletionPolicy,
+        use_cache: bool,
+        priority: Priority,
+    ) -> Optional[Dict[str, Any]]:
+        """The shared contract for a parallel generation, or None if the model didn't return one."""
+        prompt = self._build_contract_prompt(requirement, plan, prd)
+        response = await self.generate_text(prompt, policy, use_cache=use_cache, priority=priority, task="contract")
         try:
-            # Generate the response
-            response = await self.generate_text(prompt)
-            
-            # Parse the JSON response
+            return parse_contract(response)
+        except ContractError as e:
+            logger.warning(f"No usable UI contract, generating the files in one call: {str(e)}")
+            await self.cache.delete(self._cache_key(self._text_payload(prompt, "contract"), "contract"))
+            return None
+
+    async def _gather_files(self, prompts: Dict[str, str], policy: CompletionPolicy, use_cache: bool, priority: Priority) -> Dict[str, str]:
+        """Generate one file per prompt concurrently; if any call fails, the others are cancelled."""
+        tasks = [
+            asyncio.ensure_future(self.generate_text(prompt, policy, use_cache=use_cache, priority=priority, task="code"))
+            for prompt in prompts.values()
+        ]
+        try:
+            responses = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return {name: strip_fences(response) for name, response in zip(prompts, responses)}
+
+    async def _reconcile_files(
+        self,
+        requirement: str,
+        contract: Dict[str, Any],
+        files: Dict[str, str],
+        policy: CompletionPolicy,
+        use_cache: bool,
+        priority: Priority,
+        plan: Optional[str] = None,
+        prd: Optional[str] = None,
+    ) -> Dict[str, str]:
+        """
+        Check separately generated files against each other and the contract,
+        and regenerate the ones that don't match, up to `ui_repair_attempts`
+        rounds. Files that still disagree are returned as they are.
+        """
+        files = dict(files)
+        issues = check_consistency(files, contract)
+        repaired = False
+        for _ in range(self.ui_repair_attempts):
+            if not issues:
+                break
+            logger.warning(f"UI files disagree; regenerating {', '.join(sorted(issues))}")
+            prompts = {
+                name: self._build_file_prompt(requirement, name, contract, plan, prd, issues[name], files)
+                for name in UI_FILES if name in issues
+            }
+            files.update(await self._gather_files(prompts, policy, use_cache, priority))
+            issues = check_consistency(files, contract)
+            repaired = True
+        if issues:
+            logger.warning(f"UI files still disagree: {issues}")
+            UI_CONSISTENCY.inc(result="inconsistent")
+        else:
+            UI_CONSISTENCY.inc(result="repaired" if repaired else "consistent")
+        return files
+
+    async def _generate_ui_parallel(
+        self,
+        requirement: str,
+        policy: CompletionPolicy,
+        plan: Optional[str],
+        use_cache: bool,
+        priority: Priority,
+        prd: Optional[str],
+    ) -> Optional[Dict[str, str]]:
+        """
+        Generate a new UI with one call per file, all in flight at once.
+
+        A short first call fixes the contract (ids, classes, data, events)
+        the files share; each file then gets its own output budget, so the
+        UI isn't limited to what one call can return, and takes about as
+        long as its slowest file. Returns None if there is no usable
+        contract, so the caller can fall back to a single call.
+        """
+        contract = await self._generate_contract(requirement, plan, prd, policy, use_cache, priority)
+        if contract is None:
+            return None
+        prompts = {name: self._build_file_prompt(requirement, name, contract, plan, prd) for name in UI_FILES}
+        files = await self._gather_files(prompts, policy, use_cache, priority)
+        return await self._reconcile_files(requirement, contract, files, policy, use_cache, priority, plan, prd)
+
+    async def _stream_ui_parallel(
+        self,
+        requirement: str,
+        contract: Dict[str, Any],
+        policy: CompletionPolicy,
+        plan: Optional[str],
+        use_cache: bool,
+        priority: Priority,
+        prd: Optional[str],
+    ) -> AsyncIterator[Tuple[str, Optional[str]]]:
+        """
+        Stream every file's call at once, interleaving their (filename, delta)
+        pairs as they arrive. Files that had to be cleaned up or repaired
+        afterwards are yielded again after a `None` delta.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        chunks: Dict[str, List[str]] = {name: [] for name in UI_FILES}
+
+        async def pump(filename: str) -> None:
+            prompt = self._build_file_prompt(requirement, filename, contract, plan, prd)
             try:
-                files = json.loads(response)
-            except json.JSONDecodeError:
-                raise LLMServiceError("Failed to parse LLM response as JSON")
+                async for chunk in self.stream_text(prompt, policy, use_cache=use_cache, priority=priority, task="code"):
+                    chunks[filename].append(chunk)
+                    await queue.put((filename, chunk, None))
+            except Exception as e:
+                await queue.put((filename, None, e))
+                return
+            await queue.put((filename, None, None))
+
+        tasks = [asyncio.ensure_future(pump(filename)) for filename in UI_FILES]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                filename, delta, error = await queue.get()
+                if error is not None:
+                    raise error
+                if delta is None:
+                    remaining -= 1
+                    continue
+                yield filename, delta
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        streamed = {name: "".join(parts) for name, parts in chunks.items()}
+        files = {name: strip_fences(content) for name, content in streamed.items()}
+        files = await self._reconcile_files(requirement, contract, files, policy, use_cache, priority, plan, prd)
+        for filename in UI_FILES:
+            if files[filename] != streamed[filename]:
+                yield filename, None
+                yield filename, files[filename]
+
+    async def generate_ui(
+        self,
+        requirement: str,
+        policy: Optional[CompletionPolicy] = None,
+        plan: Optional[str] = None,
+        use_cache: bool = True,
+        priority: Priority = Priority.NORMAL,
+        prd: Optional[str] = None,
+        previous: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, str]:
+        """
+        Generate UI code files based on the requirement (and optionally an
+        implementation plan and/or an approved PRD to implement). With
+        `previous` files the requirement is applied to that existing code.
+
+        The output is extracted with the same fault-tolerant parser as the
+        streaming path, so fences and surrounding prose are ignored; files
+        that are missing or truncated are regenerated on their own rather
+        than failing the whole request. With `ui_parallel` on, a new UI is
+        generated one file per call instead (see `_generate_ui_parallel`).
+        """
+        policy = policy or CODE_POLICY
+        prompt = self._build_ui_prompt(requirement, plan, prd, previous)
+        previous_output = self._previous_output(previous)
+        cache_key = self._ui_cache_key(prompt, previous_output)
+
+        try:
+            if self.ui_parallel and not previous:
+                files = await self._generate_ui_parallel(requirement, policy, plan, use_cache, priority, prd)
+                if files is not None:
+                    return self._validate_ui_files(files)
+
+            response = await self.generate_text(
+                prompt, policy, use_cache=use_cache, priority=priority, task="code", previous_output=previous_output
+            )
+            with span("parse"):
+                parser = FileStreamParser()
+                parser.feed(response)
             
-            # Validate the response structure
-            required_files = {"index.html", "style.css", "script.js"}
-            if not all(file in files for file in required_files):
-                raise LLMServiceError("Invalid response structure: missing required files")
+            try:
+                files = await self._complete_ui_files(requirement, plan, parser, policy, use_cache, priority, prd, previous)
+            except LLMServiceError:
+                # Don't keep serving an unusable response from the cache
+                await self.cache.delete(cache_key)
+                raise
             
+            if parser.missing(UI_FILES):
+                # Cache the repaired result so the next hit needs no repair
+                await self.cache.set(cache_key, json.dumps(files))
             return files
             
         except Exception as e:
             raise LLMServiceError(f"UI generation failed: {str(e)}")
+
+    async def stream_ui(
+        self,
+        requirement: str,
+        policy: Optional[CompletionPolicy] = None,
+        plan: Optional[str] = None,
+        use_cache: bool = True,
+        priority: Priority = Priority.NORMAL,
+        prd: Optional[str] = None,
+        previous: Optional[Dict[str, str]] = None,
+    ) -> AsyncIterator[Tuple[str, Optional[str]]]:
+        """
+        Stream UI generation, yielding (filename, delta) pairs as file content arrives.
+
+        Callers accumulate the deltas to obtain the complete files. If the
+        stream ends with files missing or cut off, only those files are
+        regenerated and yielded afterwards; a `None` delta means the partial
+        content streamed so far for that file must be discarded first.
+        `previous` and `ui_parallel` work as in `generate_ui`; in parallel
+        mode the files' deltas are interleaved.
+        """
+        policy = policy or CODE_POLICY
+        prompt = self._build_ui_prompt(requirement, plan, prd, previous)
+        previous_output = self._previous_output(previous)
+        parser = FileStreamParser()
+        parse_seconds = 0.0
+        try:
+            if self.ui_parallel and not previous:
+                contract = await self._generate_contract(requirement, plan, prd, policy, use_cache, priority)
+                if contract is not None:
+                    async for filename, delta in self._stream_ui_parallel(
+                        requirement, contract, policy, plan, use_cache, priority, prd
+                    ):
+                        yield filename, delta
+                    return
+
+            async for chunk in self.stream_text(
+                prompt, policy, use_cache=use_cache, priority=priority, task="code", previous_output=previous_output
+            ):
+                parse_start = time.perf_counter()
+                deltas = parser.feed(chunk)
+                parse_seconds += time.perf_counter() - parse_start
+                for filename, delta in deltas:
+                    yield filename, delta
+        except Exception as e:
+            raise LLMServiceError(f"UI generation failed: {str(e)}")
+        
+        record_span("parse", parse_seconds)
+        missing = parser.missing(UI_FILES)
+        if not missing:
+            return
+        
+        cache_key = self._ui_cache_key(prompt, previous_output)
+        try:
+            files = await self._complete_ui_files(requirement, plan, parser, policy, use_cache, priority, prd, previous)
+        except LLMServiceError:
+            await self.cache.delete(cache_key)
+            raise
+        except Exception as e:
+            await self.cache.delete(cache_key)
+            raise LLMServiceError(f"UI generation failed: {str(e)}")
+        
+        for filename in missing:
+            if filename in parser.files:
+                yield filename, None
+            yield filename, files[filename]
+        await self.cache.set(cache_key, json.dumps(files))
+    
+    def can_edit(self, previous: Optional[Dict[str, str]]) -> bool:
+        """
+        Whether a modification of `previous` should be tried as a patch. The
+        edit prompt needs the files verbatim, so files too large to inline
+        uncondensed are regenerated instead.
+        """
+        if not self.edit_mode or not previous:
+            return False
+        return estimate_tokens(self._previous_output(previous)) <= self.budget.max_context_tokens
+    
+    def _build_edit_prompt(
+        self,
+        requirement: str,
+        previous: Dict[str, str],
+        plan: Optional[str] = None,
+        prd: Optional[str] = None,
+    ) -> str:
+        """Prompt asking for targeted search/replace edits to the current files."""
+        current = "\n\n".join(f"--- {name} ---\n{previous.get(name, '')}" for name in UI_FILES)
+        return f"""
+        Modify this existing UI to meet the requirement: '{requirement}'
+        {self._spec_sections(plan, prd)}
+        Current files:
+        {current}
+        
+        Return ONLY a JSON object listing the edits to make:
+        {{
+            "edits": [
+                {{"file": "index.html", "search": "<text copied exactly from the current file>", "replace": "<new text>"}}
+            ]
+        }}
+        
+        Rules:
+        - "file" is one of {", ".join(UI_FILES)}.
+        - "search" must be copied exactly from the current file and match only one place in it;
+          a few whole lines are usually enough.
+        - To insert code, search for the line next to the insertion point and repeat it in "replace".
+        - To delete code, use an empty "replace".
+        - Only include the edits the requirement needs; everything else stays as it is.
+        Do not include any explanations or markdown formatting.
+        Return only the JSON object.
+        """
+    
+    async def edit_ui(
+        self,
+        requirement: str,
+        previous: Dict[str, str],
+        policy: Optional[CompletionPolicy] = None,
+        plan: Optional[str] = None,
+        use_cache: bool = True,
+        priority: Priority = Priority.NORMAL,
+        prd: Optional[str] = None,
+    ) -> Dict[str, str]:
+        """
+        Apply a modification to `previous` files as targeted patches.
+
+        The model only returns the changed snippets, so output tokens scale
+        with the size of the change instead of the size of the UI. Raises
+        PatchError if the edits can't be parsed or don't apply cleanly; the
+        caller should then regenerate the files in full.
+        """
+        policy = policy or CODE_POLICY
+        prompt = self._build_edit_prompt(requirement, previous, plan, prd)
+        response = await self.generate_text(prompt, policy, use_cache=use_cache, priority=priority, task="edit")
+        try:
+            with span("parse"):
+                edits = parse_edits(response, UI_FILES)
+                if not edits:
+                    raise PatchError("Model returned no edits")
+                files = apply_edits(previous, edits)
+        except PatchError as e:
+            logger.warning(f"Patch edit failed, regenerating in full: {str(e)}")
+            UI_EDITS.inc(result="fallback")
+            # Don't keep serving edits that don't apply
+            await self.cache.delete(self._cache_key(self._text_payload(prompt, "edit"), "edit"))
+            raise
+        UI_EDITS.inc(result="applied")
+        return self._validate_ui_files(files)
+    
+    async def modify_ui(
+        self,
+        requirement: str,
+        previous: Dict[str, str],
+        policy: Optional[CompletionPolicy] = None,
+        plan: Optional[str] = None,
+        use_cache: bool = True,
+        priority: Priority = Priority.NORMAL,
+        prd: Optional[str] = None,
+    ) -> Dict[str, str]:
+        """Modify `previous` files with a patch when possible, otherwise by full regeneration."""
+        if self.can_edit(previous):
+            try:
+                return await self.edit_ui(requirement, previous, policy, plan, use_cache, priority, prd)
+            except PatchError:
+                pass
+        return await self.generate_ui(
+            requirement, policy, plan=plan, use_cache=use_cache, priority=priority, prd=prd, previous=previous
+        )
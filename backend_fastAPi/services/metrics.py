@@ -0,0 +1,256 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from services.token_budget import estimate_tokens
+
+# Latency buckets in seconds, spanning quick cache hits to multi-minute code generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Render a Prometheus label set, e.g. `{stage="plan"}`."""
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{format_labels(self.labels, key)} {format_number(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        lines: List[str] = []
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = format_labels(self.labels + ("le",), key + (format_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {format_number(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Set of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+def format_metric(
+    name: str,
+    metric_type: str,
+    documentation: str,
+    samples: Sequence[Tuple[Dict[str, str], float]],
+) -> List[str]:
+    """Render one metric family from (labels, value) samples read off existing stats."""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{format_labels(list(labels), list(labels.values()))} {format_number(value)}")
+    return lines
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "pipeline_stage_seconds", "Duration of agent pipeline stages", ["stage"]
+)
+SPAN_SECONDS = REGISTRY.histogram(
+    "llm_span_seconds", "Duration of steps inside LLM calls (create, queue_wait, poll, stream, parse)", ["span"]
+)
+LLM_CALLS = REGISTRY.counter(
+    "llm_calls_total", "Completed LLM calls by kind of call and outcome", ["kind", "outcome"]
+)
+PROMPT_CHARS = REGISTRY.counter("llm_prompt_chars_total", "Characters sent in prompts", ["kind"])
+PROMPT_TOKENS = REGISTRY.counter("llm_prompt_tokens_total", "Estimated prompt tokens sent", ["kind"])
+RESPONSE_CHARS = REGISTRY.counter("llm_response_chars_total", "Characters received in responses", ["kind"])
+RESPONSE_TOKENS = REGISTRY.counter("llm_response_tokens_total", "Estimated response tokens received", ["kind"])
+UI_REPAIRS = REGISTRY.counter(
+    "llm_ui_repairs_total", "UI outputs completed by regenerating only the missing files", ["result"]
+)
+UI_EDITS = REGISTRY.counter(
+    "llm_ui_edits_total", "Modifications applied as patches, or regenerated in full when patching failed", ["result"]
+)
+UI_CONSISTENCY = REGISTRY.counter(
+    "llm_ui_consistency_total", "Parallel UI generations by whether their files agreed on ids and classes", ["result"]
+)
+REQUESTS_CANCELLED = REGISTRY.counter(
+    "requests_cancelled_total", "Requests whose work was cancelled, by route and reason (disconnect, deadline)", ["route", "reason"]
+)
+SESSION_TURNS = REGISTRY.counter(
+    "session_turns_total", "Turns of WebSocket editing sessions by outcome (completed, cancelled, superseded, error)", ["result"]
+)
+SESSION_BYTES = REGISTRY.counter(
+    "session_bytes_total", "Message bytes exchanged on WebSocket editing sessions", ["direction"]
+)
+WASTED_CALLS = REGISTRY.counter(
+    "llm_wasted_calls_total", "Provider predictions started and then abandoned before their output was used", ["kind"]
+)
+PREDICTIONS_CANCELLED = REGISTRY.counter(
+    "llm_predictions_cancelled_total", "Cancel requests sent to the provider for abandoned predictions", ["result"]
+)
+
+
+def record_prompt(kind: str, prompt: str) -> None:
+    PROMPT_CHARS.inc(len(prompt), kind=kind)
+    PROMPT_TOKENS.inc(estimate_tokens(prompt), kind=kind)
+
+
+def record_response(kind: str, text: str) -> None:
+    RESPONSE_CHARS.inc(len(text), kind=kind)
+    RESPONSE_TOKENS.inc(estimate_tokens(text), kind=kind)
+
+
+class RequestTimings:
+    """Span durations accumulated for one HTTP request (for the Server-Timing header)."""
+
+    def __init__(self):
+        self._spans: Dict[str, Tuple[float, int]] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        total, count = self._spans.get(name, (0.0, 0))
+        self._spans[name] = (total + seconds, count + 1)
+
+    def header(self) -> str:
+        entries = []
+        for name, (total, count) in self._spans.items():
+            description = f';desc="{count}x"' if count > 1 else ""
+            entries.append(f"{name};dur={total * 1000:.1f}{description}")
+        return ", ".join(entries)
+
+
+_request_timings: "contextvars.ContextVar[Optional[RequestTimings]]" = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def start_request_timings() -> RequestTimings:
+    """Begin collecting spans for the current request; tasks it spawns share the collector."""
+    timings = RequestTimings()
+    _request_timings.set(timings)
+    return timings
+
+
+def _add_to_request(name: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+def record_span(name: str, seconds: float) -> None:
+    """Record a finished step of an LLM call."""
+    SPAN_SECONDS.observe(seconds, span=name)
+    _add_to_request(name, seconds)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """Record a finished pipeline stage."""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    _add_to_request(f"stage-{name}", seconds)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the enclosed block as an LLM call span."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
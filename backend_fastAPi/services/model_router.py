@@ -0,0 +1,203 @@
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from config import env_float, env_int, env_str
+from services.resilience import CircuitBreaker, LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+# Kinds of calls that can be routed to their own model
+TASKS = ("analysis", "plan", "prd", "code", "edit", "contract")
+
+# Tasks that use another task's model unless configured separately
+INHERITS = {"edit": "code", "contract": "code"}
+
+
+class ModelStats:
+    """Call counts, latency, token usage and estimated cost for one model."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.fallback_calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.latency = LatencyTracker()
+
+    def to_dict(self, priced: bool) -> Dict[str, Any]:
+        p50 = self.latency.quantile("all", 0.5, 1)
+        p95 = self.latency.quantile("all", 0.95, 1)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "fallback_calls": self.fallback_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost, 6) if priced else None,
+            "p50_s": round(p50, 3) if p50 is not None else None,
+            "p95_s": round(p95, 3) if p95 is not None else None,
+        }
+
+
+class ModelRouter:
+    """
+    Pick the Replicate model for each kind of call.
+
+    Every task (analysis, plan, prd, code, edit, contract) has a primary model and an
+    optional fallback. Calls go to the fallback while the primary's circuit
+    breaker is open or its recent p95 latency is above `latency_threshold`;
+    one in `probe_every` calls still goes to a slow primary so its latency
+    keeps being measured. A call that fails on the primary is retried once
+    on the fallback by LLMService.
+    """
+
+    def __init__(
+        self,
+        api_base: str,
+        default_model: str,
+        routes: Optional[Dict[str, str]] = None,
+        fallbacks: Optional[Dict[str, str]] = None,
+        prices: Optional[Dict[str, Tuple[float, float]]] = None,
+        latency_threshold: float = 0.0,
+        min_samples: int = 10,
+        probe_every: int = 10,
+        breaker_failures: int = 5,
+        breaker_reset: float = 30.0,
+    ):
+        self.api_base = api_base.rstrip("/")
+        self.default_model = default_model
+        self.routes = routes or {}
+        self.fallbacks = fallbacks or {}
+        # USD per million (prompt, output) tokens
+        self.prices = prices or {}
+        self.latency_threshold = latency_threshold
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._stats: Dict[str, ModelStats] = {}
+        self._diverted: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls, api_base: str) -> "ModelRouter":
+        """
+        Build the router from LLM_MODEL, LLM_MODEL_<TASK>, LLM_FALLBACK_MODEL[_<TASK>],
+        LLM_FALLBACK_LATENCY, LLM_MODEL_PRICES and LLM_BREAKER_* settings.
+        """
+        default_model = env_str("LLM_MODEL", "anthropic/claude-3.5-sonnet")
+        routes: Dict[str, str] = {}
+        fallbacks: Dict[str, str] = {}
+        default_fallback = env_str("LLM_FALLBACK_MODEL")
+        for task in TASKS:
+            model = env_str(f"LLM_MODEL_{task.upper()}", routes.get(INHERITS.get(task, "")))
+            if model:
+                routes[task] = model
+            fallback = env_str(f"LLM_FALLBACK_MODEL_{task.upper()}", fallbacks.get(INHERITS.get(task, ""), default_fallback))
+            if fallback:
+                fallbacks[task] = fallback
+
+        prices: Dict[str, Tuple[float, float]] = {}
+        raw_prices = env_str("LLM_MODEL_PRICES")
+        if raw_prices:
+            try:
+                prices = {model: (float(price[0]), float(price[1])) for model, price in json.loads(raw_prices).items()}
+            except (ValueError, TypeError, IndexError, AttributeError) as e:
+                logger.warning(f"Ignoring invalid LLM_MODEL_PRICES: {str(e)}")
+
+        return cls(
+            api_base,
+            default_model,
+            routes=routes,
+            fallbacks=fallbacks,
+            prices=prices,
+            latency_threshold=env_float("LLM_FALLBACK_LATENCY", 0.0),
+            min_samples=env_int("LLM_FALLBACK_MIN_SAMPLES", 10),
+            breaker_failures=env_int("LLM_BREAKER_FAILURES", 5),
+            breaker_reset=env_float("LLM_BREAKER_RESET", 30.0),
+        )
+
+    def url(self, model: str) -> str:
+        """Predictions endpoint for a model."""
+        return f"{self.api_base}/models/{model}/predictions"
+
+    def primary(self, task: str) -> str:
+        return self.routes.get(task, self.default_model)
+
+    def fallback(self, task: str) -> Optional[str]:
+        fallback = self.fallbacks.get(task)
+        return fallback if fallback and fallback != self.primary(task) else None
+
+    def select(self, task: str) -> str:
+        """Model to use for the next call of this task."""
+        primary = self.primary(task)
+        fallback = self.fallback(task)
+        if fallback is None:
+            return primary
+        if self.breaker(primary).is_open:
+            return fallback
+        if self._too_slow(primary):
+            # Divert to the fallback, but keep probing the primary now and then
+            self._diverted[task] = self._diverted.get(task, 0) + 1
+            if self._diverted[task] % self.probe_every:
+                return fallback
+        return primary
+
+    def _too_slow(self, model: str) -> bool:
+        if self.latency_threshold <= 0:
+            return False
+        p95 = self._model_stats(model).latency.quantile("all", 0.95, self.min_samples)
+        return p95 is not None and p95 > self.latency_threshold
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+            self._breakers[model] = breaker
+        return breaker
+
+    def _model_stats(self, model: str) -> ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = ModelStats()
+            self._stats[model] = stats
+        return stats
+
+    def record(
+        self,
+        model: str,
+        seconds: float,
+        prompt_tokens: int,
+        output_tokens: int,
+        ok: bool,
+        fallback: bool = False,
+    ) -> None:
+        """Record the outcome of one call to a model."""
+        stats = self._model_stats(model)
+        stats.calls += 1
+        stats.prompt_tokens += prompt_tokens
+        stats.output_tokens += output_tokens
+        if fallback:
+            stats.fallback_calls += 1
+        if not ok:
+            stats.errors += 1
+            return
+        stats.latency.record("all", seconds)
+        price = self.prices.get(model)
+        if price:
+            stats.cost += (prompt_tokens * price[0] + output_tokens * price[1]) / 1_000_000
+
+    def stats(self) -> Dict[str, Any]:
+        models = set(self._stats) | set(self._breakers)
+        return {
+            "routes": {task: {"model": self.primary(task), "fallback": self.fallback(task)} for task in TASKS},
+            "models": {
+                model: {
+                    **self._model_stats(model).to_dict(model in self.prices),
+                    "circuit": self.breaker(model).stats(),
+                }
+                for model in sorted(models)
+            },
+        }
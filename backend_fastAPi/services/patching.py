@@ -0,0 +1,89 @@
+import json
+from typing import Any, Dict, List, Sequence
+
+
+class PatchError(Exception):
+    """Raised when model-generated edits can't be parsed or applied cleanly."""
+    pass
+
+
+def parse_edits(text: str, allowed_files: Sequence[str]) -> List[Dict[str, str]]:
+    """
+    Parse `{"edits": [{"file", "search", "replace"}, ...]}` from model output.
+
+    Fences and prose around the object are ignored. Raises PatchError if
+    there is no such object or an edit is malformed or targets an unknown file.
+    """
+    start = text.find("{")
+    while start != -1:
+        try:
+            data, _ = json.JSONDecoder().raw_decode(text, start)
+        except ValueError:
+            start = text.find("{", start + 1)
+            continue
+        if isinstance(data, dict) and "edits" in data:
+            return _validate_edits(data["edits"], allowed_files)
+        start = text.find("{", start + 1)
+    raise PatchError("No edits object in output")
+
+
+def _validate_edits(edits: Any, allowed_files: Sequence[str]) -> List[Dict[str, str]]:
+    if not isinstance(edits, list):
+        raise PatchError("'edits' must be a list")
+    validated = []
+    for index, edit in enumerate(edits):
+        if not isinstance(edit, dict):
+            raise PatchError(f"Edit {index} is not an object")
+        file, search, replace = edit.get("file"), edit.get("search"), edit.get("replace", "")
+        if file not in allowed_files:
+            raise PatchError(f"Edit {index} targets unknown file {file!r}")
+        if not isinstance(search, str) or not search.strip() or not isinstance(replace, str):
+            raise PatchError(f"Edit {index} needs a non-empty 'search' and a string 'replace'")
+        validated.append({"file": file, "search": search, "replace": replace})
+    return validated
+
+
+def apply_edits(files: Dict[str, str], edits: List[Dict[str, str]]) -> Dict[str, str]:
+    """
+    Apply anchored search/replace edits in order and return the new files.
+
+    Each `search` must occur exactly once in its file. An exact match is
+    tried first, then a line-based match that ignores indentation and
+    trailing whitespace (models often re-indent what they copy). The input
+    is not modified; any edit that doesn't apply raises PatchError.
+    """
+    result = dict(files)
+    for index, edit in enumerate(edits):
+        content = result.get(edit["file"], "")
+        try:
+            result[edit["file"]] = _apply_one(content, edit["search"], edit["replace"])
+        except PatchError as e:
+            raise PatchError(f"Edit {index} on {edit['file']}: {str(e)}")
+    return result
+
+
+def _apply_one(content: str, search: str, replace: str) -> str:
+    count = content.count(search)
+    if count == 1:
+        return content.replace(search, replace, 1)
+    if count > 1:
+        raise PatchError("search text is ambiguous")
+
+    # Fall back to matching whole lines with surrounding whitespace ignored
+    lines = content.splitlines(keepends=True)
+    wanted = [line.strip() for line in search.strip("\n").splitlines()]
+    stripped = [line.strip() for line in lines]
+    matches = [
+        start for start in range(len(lines) - len(wanted) + 1)
+        if stripped[start:start + len(wanted)] == wanted
+    ]
+    if not matches:
+        raise PatchError("search text not found")
+    if len(matches) > 1:
+        raise PatchError("search text is ambiguous")
+    start = matches[0]
+    end = start + len(wanted)
+    replacement = replace if replace.endswith("\n") or not replace else replace + "\n"
+    if end == len(lines) and not lines[-1].endswith("\n"):
+        replacement = replacement.rstrip("\n")
+    return "".join(lines[:start]) + replacement + "".join(lines[end:])
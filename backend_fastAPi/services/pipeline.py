@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from services.metrics import record_stage
+
+StageFn = Callable[[Dict[str, Any]], Awaitable[Any]]
+StageListener = Callable[[str, str], None]
+
+
+class PipelineError(Exception):
+    """Raised when a pipeline graph is invalid."""
+    pass
+
+
+class Stage:
+    """A named async step that runs once all of its dependencies have finished."""
+
+    def __init__(self, name: str, run: StageFn, depends_on: Sequence[str] = ()):
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+
+
+class Pipeline:
+    """
+    A small dependency graph of stages executed with asyncio.
+
+    Every stage starts as soon as the stages it depends on have finished, so
+    independent stages run concurrently. Each stage receives the results of
+    all finished stages keyed by name. If any stage fails, the remaining
+    stages are cancelled and the error is re-raised.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise PipelineError("Duplicate stage names in pipeline")
+        self._order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        visiting: set = set()
+
+        def visit(name: str) -> None:
+            if name in order:
+                return
+            if name in visiting:
+                raise PipelineError(f"Cycle detected at stage '{name}'")
+            if name not in self.stages:
+                raise PipelineError(f"Unknown stage dependency '{name}'")
+            visiting.add(name)
+            for dependency in self.stages[name].depends_on:
+                visit(dependency)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    async def run(self, on_stage: Optional[StageListener] = None) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """
+        Execute the graph and return (results, timings).
+
+        Timings are wall-clock milliseconds per stage, measured from when the
+        stage actually started (not from when it was scheduled), plus a
+        `total` entry for the whole pipeline. `on_stage(name, status)` is
+        called with "started" and "completed" as stages progress.
+        """
+        results: Dict[str, Any] = {}
+        timings: Dict[str, float] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        pipeline_start = time.perf_counter()
+
+        async def execute(stage: Stage) -> Any:
+            if stage.depends_on:
+                await asyncio.gather(*(tasks[name] for name in stage.depends_on))
+            if on_stage:
+                on_stage(stage.name, "started")
+            start = time.perf_counter()
+            results[stage.name] = await stage.run(results)
+            elapsed = time.perf_counter() - start
+            timings[stage.name] = round(elapsed * 1000, 1)
+            record_stage(stage.name, elapsed)
+            if on_stage:
+                on_stage(stage.name, "completed")
+            return results[stage.name]
+
+        for name in self._order:
+            tasks[name] = asyncio.ensure_future(execute(self.stages[name]))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        timings["total"] = round((time.perf_counter() - pipeline_start) * 1000, 1)
+        return results, timings
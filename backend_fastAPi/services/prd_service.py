@@ -1,15 +1,44 @@
+from typing import Optional
+
+from services.completion import ANALYSIS_POLICY
 from services.llm_service import LLMService
+from services.prd_store import PRDRecord, PRDStore
+from services.scheduler import Priority
 
 class PRDService:
     """Service for generating Product Requirement Documents (PRDs)."""
 
-    def __init__(self):
-        self.llm_service = LLMService()
+    def __init__(self, llm_service: Optional[LLMService] = None, store: Optional[PRDStore] = None):
+        self.llm_service = llm_service or LLMService()
+        # Generated PRDs, so an approval can refer to one by id
+        self.store = store if store is not None else PRDStore.from_env()
+
+    async def create_prd(
+        self,
+        requirement: str,
+        use_cache: bool = True,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> PRDRecord:
+        """Generate a PRD and keep it in the store for a later approval."""
+        prd = await self.generate_prd(requirement, use_cache=use_cache, priority=priority)
+        return await self.store.save(requirement, prd)
+
+    async def get_prd(self, prd_id: str) -> Optional[PRDRecord]:
+        """A stored PRD, or None if the id is unknown or expired."""
+        return await self.store.get(prd_id)
 
-    async def generate_prd(self, requirement: str) -> str:
+    async def generate_prd(
+        self,
+        requirement: str,
+        use_cache: bool = True,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> str:
         """
         Generate a PRD based on the user's requirement.
+        The PRD is what the user is actively waiting on, so it is scheduled
+        ahead of background reasoning calls by default.
         """
+        self.llm_service.budget.check_requirement(requirement)
         prompt = f"""
         You are a skilled product manager. Based on this requirement: '{requirement}',
         create a clear, concise, and non-technical Product Requirements Document (PRD).
@@ -36,4 +65,6 @@ class PRDService:
         Do NOT include sections about success metrics, analytics, or out-of-scope items.
         Write in a way that's easy for non-technical stakeholders to understand.
         """
-        return await self.llm_service.generate_text(prompt)
\ No newline at end of file
+        return await self.llm_service.generate_text(
+            prompt, ANALYSIS_POLICY, use_cache=use_cache, priority=priority, task="prd"
+        )
\ No newline at end of file
@@ -0,0 +1,184 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from config import env_float, env_int, env_str
+
+
+class PRDRecord:
+    """A generated PRD and the requirement it was written for."""
+
+    def __init__(self, requirement: str, prd: str, id: Optional[str] = None, created_at: Optional[float] = None):
+        self.id = id or uuid.uuid4().hex
+        self.requirement = requirement
+        self.prd = prd
+        self.created_at = created_at if created_at is not None else time.time()
+
+
+class MemoryPRDBackend:
+    """Per-process LRU of PRDs; only suitable for a single worker."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._records: "OrderedDict[str, PRDRecord]" = OrderedDict()
+
+    def get(self, prd_id: str) -> Optional[PRDRecord]:
+        self._purge_expired()
+        record = self._records.get(prd_id)
+        if record is not None:
+            self._records.move_to_end(prd_id)
+        return record
+
+    def set(self, record: PRDRecord) -> None:
+        self._purge_expired()
+        self._records[record.id] = record
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.ttl
+        # Records are in insertion order apart from LRU moves, so scan them all
+        expired = [prd_id for prd_id, record in self._records.items() if record.created_at < cutoff]
+        for prd_id in expired:
+            del self._records[prd_id]
+
+    def size(self) -> int:
+        return len(self._records)
+
+    def close(self) -> None:
+        self._records.clear()
+
+
+class SQLitePRDBackend:
+    """PRD table in a SQLite file shared by every uvicorn worker on the host."""
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Several workers write to the same file; wait for their locks instead of failing
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS prds (
+                prd_id TEXT PRIMARY KEY,
+                requirement TEXT NOT NULL,
+                prd TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS prds_accessed ON prds (accessed_at)")
+
+    def get(self, prd_id: str) -> Optional[PRDRecord]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT requirement, prd, created_at FROM prds WHERE prd_id = ?", (prd_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[2] < now - self.ttl:
+                self._conn.execute("DELETE FROM prds WHERE prd_id = ?", (prd_id,))
+                return None
+            self._conn.execute("UPDATE prds SET accessed_at = ? WHERE prd_id = ?", (now, prd_id))
+        return PRDRecord(row[0], row[1], id=prd_id, created_at=row[2])
+
+    def set(self, record: PRDRecord) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO prds (prd_id, requirement, prd, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (record.id, record.requirement, record.prd, record.created_at, now),
+                )
+                self._conn.execute("DELETE FROM prds WHERE created_at < ?", (now - self.ttl,))
+                # Drop least recently used PRDs beyond the bound, never the one just written
+                self._conn.execute(
+                    "DELETE FROM prds WHERE prd_id IN ("
+                    "SELECT prd_id FROM prds WHERE prd_id != ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (record.id, max(0, self.max_entries - 1)),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM prds").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class PRDStore:
+    """
+    Store of generated PRDs, keyed by the id returned from /generate-prd.
+
+    Lets /approve-prd build from the PRD the user already reviewed without
+    the client uploading it again. The in-process backend is used by
+    default; with PRD_STORE_SQLITE_PATH set, PRDs live in a SQLite file so
+    an approval can reach any worker. Records expire after `ttl` seconds and
+    the least recently used ones are dropped beyond `max_entries`.
+    """
+
+    def __init__(self, backend: Any):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "PRDStore":
+        max_entries = env_int("PRD_STORE_MAX_ENTRIES", 1000)
+        ttl = env_float("PRD_STORE_TTL", 3600.0)
+        sqlite_path = env_str("PRD_STORE_SQLITE_PATH")
+        if sqlite_path:
+            return cls(SQLitePRDBackend(sqlite_path, max_entries, ttl))
+        return cls(MemoryPRDBackend(max_entries, ttl))
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+        return method(*args)
+
+    async def save(self, requirement: str, prd: str) -> PRDRecord:
+        """Store a PRD and return its record (with the new id)."""
+        record = PRDRecord(requirement, prd)
+        await self._call(self.backend.set, record)
+        return record
+
+    async def get(self, prd_id: str) -> Optional[PRDRecord]:
+        record = await self._call(self.backend.get, prd_id)
+        if record is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return record
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": getattr(self.backend, "path", "memory"),
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self) -> None:
+        self.backend.close()
@@ -0,0 +1,157 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+from config import env_bool, env_float, env_int
+
+# Provider statuses worth retrying: rate limited or a transient server fault
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryableStatusError(Exception):
+    """The provider answered with a transient error status."""
+
+    def __init__(self, status_code: int, body: str):
+        super().__init__(f"API returned status {status_code}: {body}")
+        self.status_code = status_code
+
+
+class CircuitOpenError(Exception):
+    """Calls are being rejected because the provider looks degraded."""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"Provider circuit is open; retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Jittered exponential backoff for retryable create failures."""
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=env_int("LLM_RETRY_MAX_ATTEMPTS", 3),
+            base_delay=env_float("LLM_RETRY_BASE_DELAY", 0.5),
+            max_delay=env_float("LLM_RETRY_MAX_DELAY", 8.0),
+        )
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """
+    When to issue a backup prediction for a slow one.
+
+    Once `min_samples` latencies are known for a kind of call, the hedge
+    fires after their `quantile` (p95 by default); until then it fires
+    after the static `after` seconds.
+    """
+
+    enabled: bool = False
+    after: float = 30.0
+    quantile: float = 0.95
+    min_samples: int = 20
+
+    @classmethod
+    def from_env(cls) -> "HedgePolicy":
+        return cls(
+            enabled=env_bool("LLM_HEDGE_ENABLED", False),
+            after=env_float("LLM_HEDGE_AFTER", 30.0),
+            quantile=env_float("LLM_HEDGE_QUANTILE", 0.95),
+            min_samples=env_int("LLM_HEDGE_MIN_SAMPLES", 20),
+        )
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies per kind of call."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, kind: str, seconds: float) -> None:
+        self._samples.setdefault(kind, deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, kind: str, q: float, min_samples: int) -> Optional[float]:
+        samples = self._samples.get(kind)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the provider is degraded.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls are rejected for `reset_timeout` seconds. Then a single probe call
+    is let through (half-open): success closes the circuit, failure opens it
+    again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.opens = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        return cls(
+            failure_threshold=env_int("LLM_BREAKER_FAILURES", 5),
+            reset_timeout=env_float("LLM_BREAKER_RESET", 30.0),
+        )
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are being rejected outright (open and not yet due for a probe)."""
+        return self.state == "open" and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call should not be attempted."""
+        if self.state == "closed":
+            return
+        elapsed = time.monotonic() - self._opened_at
+        if self.state == "open" and elapsed >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError(max(0.0, self.reset_timeout - elapsed))
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opens += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def record_abandoned(self) -> None:
+        """A call was cancelled before it could tell us anything about the provider."""
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opens": self.opens,
+            "rejected": self.rejected,
+        }
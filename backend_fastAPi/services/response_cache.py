@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from config import env_bool, env_float, env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so prompts differing only in layout share a key."""
+    return " ".join(prompt.split())
+
+
+def make_cache_key(model_url: str, prompt: str, params: Dict[str, Any]) -> str:
+    """Stable digest of everything that determines a model response."""
+    material = json.dumps(
+        {"model": model_url, "prompt": normalize_prompt(prompt), "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheBackend:
+    """On-disk cache table shared across restarts and uvicorn workers."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0], row[1]
+
+    def set(self, key: str, value: str, expires_at: float) -> int:
+        """Store a value and return how many entries were evicted to stay in bounds."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            evicted = self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+            overflow = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                evicted += self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,),
+                ).rowcount
+        return evicted
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Two-level cache for LLM responses.
+
+    An in-memory LRU serves hot entries; an optional SQLite backend keeps
+    entries across restarts and shares them between workers. Both levels
+    honour the same TTL and have their own size bound.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl: float = 24 * 3600,
+        backend: Optional[SQLiteCacheBackend] = None,
+        enabled: bool = True,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """Build the cache from LLM_CACHE_* environment variables."""
+        backend = None
+        sqlite_path = env_str("LLM_CACHE_SQLITE_PATH")
+        if sqlite_path:
+            backend = SQLiteCacheBackend(sqlite_path, env_int("LLM_CACHE_DISK_MAX_ENTRIES", 10000))
+        return cls(
+            max_entries=env_int("LLM_CACHE_MAX_ENTRIES", 512),
+            ttl=env_float("LLM_CACHE_TTL", 24 * 3600),
+            backend=backend,
+            enabled=env_bool("LLM_CACHE_ENABLED", True),
+        )
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached value for a key, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        if self.backend is not None:
+            loop = asyncio.get_running_loop()
+            stored = await loop.run_in_executor(None, self.backend.get, key)
+            if stored is not None:
+                self._remember(key, *stored)
+                self.hits += 1
+                self.disk_hits += 1
+                return stored[0]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        """Store a value under a key in both cache levels."""
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        if self.backend is not None:
+            loop = asyncio.get_running_loop()
+            self.evictions += await loop.run_in_executor(None, self.backend.set, key, value, expires_at)
+
+    async def delete(self, key: str) -> None:
+        """Drop a key, e.g. when a cached response turned out to be unusable."""
+        self._entries.pop(key, None)
+        if self.backend is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.backend.delete, key)
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and sizes for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "disk_backend": self.backend.path if self.backend else None,
+        }
+
+    def close(self) -> None:
+        if self.backend is not None:
+            self.backend.close()
@@ -0,0 +1,172 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from config import env_float, env_int
+from services.metrics import record_span
+
+
+class Priority(IntEnum):
+    """Scheduling class of an LLM call; lower values are served first."""
+
+    INTERACTIVE = 0  # a user is waiting on this call (e.g. /generate-prd)
+    NORMAL = 1       # primary output of a request (UI code)
+    BACKGROUND = 2   # supporting reasoning (analysis, plan) and batch work
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.throttled = 0
+
+    async def acquire(self) -> None:
+        """Take one token, sleeping until one is available."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                self.throttled += 1
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def try_acquire(self) -> bool:
+        """Take one token if one is available right now, without waiting."""
+        if self._lock.locked():
+            return False
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class LLMScheduler:
+    """
+    App-wide admission control for provider calls.
+
+    At most `max_concurrency` calls run at once. Waiting calls are admitted
+    in priority order (FIFO within a priority), and each admitted call also
+    takes a token from the rate-limit bucket when one is configured, so
+    bursts are smoothed before they reach the provider's rate limits.
+    """
+
+    def __init__(self, max_concurrency: int = 8, rate: float = 0.0, burst: int = 5):
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._granted: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self._wait_total: Dict[Priority, float] = {priority: 0.0 for priority in Priority}
+        self._wait_max: Dict[Priority, float] = {priority: 0.0 for priority in Priority}
+
+    @classmethod
+    def from_env(cls) -> "LLMScheduler":
+        """Build the scheduler from LLM_MAX_CONCURRENCY / LLM_RATE_* settings."""
+        return cls(
+            max_concurrency=env_int("LLM_MAX_CONCURRENCY", 8),
+            rate=env_float("LLM_RATE_LIMIT", 0.0),
+            burst=env_int("LLM_RATE_BURST", 5),
+        )
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.NORMAL) -> AsyncIterator[None]:
+        """Hold one provider slot for the duration of the block."""
+        start = time.perf_counter()
+        await self._acquire(priority)
+        try:
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            self._record_wait(priority, time.perf_counter() - start)
+            yield
+        finally:
+            self._release()
+
+    def try_acquire(self) -> bool:
+        """
+        Take a slot only if one is free, nobody is waiting and the rate limit
+        allows a call now; never queues. Pair a successful call with `release`.
+        """
+        if self._active >= self.max_concurrency or self._pending():
+            return False
+        if self.bucket is not None and not self.bucket.try_acquire():
+            return False
+        self._active += 1
+        return True
+
+    def release(self) -> None:
+        """Give back a slot taken with `try_acquire`."""
+        self._release()
+
+    async def _acquire(self, priority: Priority) -> None:
+        if self._active < self.max_concurrency and not self._pending():
+            self._active += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as we were cancelled
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        self._active -= 1
+        while self._waiters and self._active < self.max_concurrency:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if waiter.done():
+                continue
+            self._active += 1
+            waiter.set_result(None)
+
+    def _pending(self) -> int:
+        return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+    def _record_wait(self, priority: Priority, waited: float) -> None:
+        record_span("queue_wait", waited)
+        self._granted[priority] += 1
+        self._wait_total[priority] += waited
+        self._wait_max[priority] = max(self._wait_max[priority], waited)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, active calls and wait times per priority."""
+        queued = {priority.name.lower(): 0 for priority in Priority}
+        for level, _, waiter in self._waiters:
+            if not waiter.done():
+                queued[Priority(level).name.lower()] += 1
+
+        priorities: Dict[str, Dict[str, Optional[float]]] = {}
+        for priority in Priority:
+            granted = self._granted[priority]
+            priorities[priority.name.lower()] = {
+                "granted": granted,
+                "avg_wait_ms": round(self._wait_total[priority] / granted * 1000, 1) if granted else 0.0,
+                "max_wait_ms": round(self._wait_max[priority] * 1000, 1),
+            }
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queued": queued,
+            "rate_limit": self.bucket.rate if self.bucket else None,
+            "throttled": self.bucket.throttled if self.bucket else 0,
+            "priorities": priorities,
+        }
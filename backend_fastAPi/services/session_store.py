@@ -0,0 +1,233 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import env_float, env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+
+class MemorySessionBackend:
+    """Per-process LRU of sessions; only suitable for a single worker."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, session_id: str) -> Optional[str]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            self.delete(session_id)
+            return None
+        self._entries.move_to_end(session_id)
+        return entry[0]
+
+    def set(self, session_id: str, value: str, expires_at: float) -> int:
+        """Store a session and return how many sessions were evicted to stay in bounds."""
+        self.delete(session_id)
+        self._entries[session_id] = (value, expires_at)
+        self._bytes += len(value)
+        evicted = 0
+        now = time.time()
+        for key in [key for key, (_, expires) in self._entries.items() if expires <= now]:
+            self.delete(key)
+            evicted += 1
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self.delete(key)
+            evicted += 1
+        return evicted
+
+    def delete(self, session_id: str) -> None:
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    def size(self) -> Tuple[int, int]:
+        return len(self._entries), self._bytes
+
+    def close(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+
+class SQLiteSessionBackend:
+    """Session table in a SQLite file shared by every uvicorn worker on the host."""
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int, max_bytes: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Several workers write to the same file; wait for their locks instead of failing
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed_at)")
+
+    def get(self, session_id: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, expires_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                return None
+            self._conn.execute("UPDATE sessions SET accessed_at = ? WHERE session_id = ?", (now, session_id))
+        return row[0]
+
+    def set(self, session_id: str, value: str, expires_at: float) -> int:
+        """Store a session and return how many sessions were evicted to stay in bounds."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sessions (session_id, data, size, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (session_id, value, len(value), expires_at, now),
+                )
+                evicted = self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+                count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+                # Drop least recently used sessions until both bounds hold, never the one just written
+                for key, size in self._conn.execute(
+                    "SELECT session_id, size FROM sessions WHERE session_id != ? ORDER BY accessed_at ASC",
+                    (session_id,),
+                ).fetchall():
+                    if count <= self.max_entries and total <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (key,))
+                    count -= 1
+                    total -= size
+                    evicted += 1
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return evicted
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def size(self) -> Tuple[int, int]:
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        return count, total
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SessionStore:
+    """
+    Conversation state per editing session: the current UI files and the
+    recent requirements that produced them.
+
+    Follow-up requests with the same `session_id` are applied to that
+    session's files, never to another user's. The in-process backend is
+    used by default; with SESSION_SQLITE_PATH set, sessions live in a
+    SQLite file so every worker process sees the same state. Sessions expire
+    after `ttl` seconds of inactivity and the least recently used ones are
+    evicted beyond `max_entries` sessions or `max_bytes` of stored data.
+    """
+
+    def __init__(self, backend: Any, ttl: float = 24 * 3600, history: int = 5):
+        self.backend = backend
+        self.ttl = ttl
+        self.history = history
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        """Build the store from SESSION_* environment variables."""
+        max_entries = env_int("SESSION_MAX_ENTRIES", 1000)
+        max_bytes = env_int("SESSION_MAX_BYTES", 64 * 1024 * 1024)
+        sqlite_path = env_str("SESSION_SQLITE_PATH")
+        if sqlite_path:
+            backend: Any = SQLiteSessionBackend(sqlite_path, max_entries, max_bytes)
+        else:
+            backend = MemorySessionBackend(max_entries, max_bytes)
+        return cls(backend, ttl=env_float("SESSION_TTL", 24 * 3600), history=env_int("SESSION_HISTORY", 5))
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+        return method(*args)
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Session state (`files`, `requirements`, `updated_at`), or None for a new/expired session."""
+        raw = await self._call(self.backend.get, session_id)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def save(self, session_id: str, state: Dict[str, Any]) -> None:
+        state["updated_at"] = time.time()
+        raw = json.dumps(state, ensure_ascii=False)
+        self.evictions += await self._call(self.backend.set, session_id, raw, time.time() + self.ttl)
+
+    async def delete(self, session_id: str) -> None:
+        await self._call(self.backend.delete, session_id)
+
+    async def files(self, session_id: str) -> Optional[Dict[str, str]]:
+        """The session's current files, if it has any."""
+        state = await self.get(session_id)
+        return state.get("files") if state else None
+
+    async def record_turn(self, session_id: str, requirement: str, files: Dict[str, str]) -> None:
+        """Make `files` the session's current files and remember the requirement."""
+        state = await self.get(session_id) or {}
+        requirements: List[str] = state.get("requirements", [])
+        requirements.append(requirement)
+        await self.save(session_id, {
+            "files": files,
+            "requirements": requirements[-self.history:],
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        entries, size = self.backend.size()
+        return {
+            "backend": getattr(self.backend, "path", "memory"),
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "ttl": self.ttl,
+        }
+
+    def close(self) -> None:
+        self.backend.close()
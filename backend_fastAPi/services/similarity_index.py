@@ -0,0 +1,213 @@
+import copy
+import hashlib
+import random
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from config import env_bool, env_float, env_int
+
+# Filler words that don't change what is being asked for; negations are kept on purpose
+_STOPWORDS = frozenset(
+    "a an the and or with for of to in on that this me my i we please create make build "
+    "generate simple basic".split()
+)
+_WORDS = re.compile(r"[a-z0-9]+")
+_PRIME = (1 << 61) - 1
+
+
+def shingles(text: str, size: int = 3) -> FrozenSet[str]:
+    """
+    Shingle a requirement into words plus character n-grams of each word.
+
+    Word order, punctuation, case and filler words are ignored, so
+    "dark-mode todo list" and "a todo list with dark mode" share every
+    shingle; the n-grams let inflections ("filter"/"filters") still overlap.
+    """
+    words = [word for word in _WORDS.findall(text.lower()) if word not in _STOPWORDS]
+    result: Set[str] = set(words)
+    for word in words:
+        padded = f"#{word}#"
+        result.update(padded[i:i + size] for i in range(len(padded) - size + 1))
+    return frozenset(result)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class SimilarEntry:
+    """A past requirement, the result generated for it and the variant of the request."""
+
+    def __init__(
+        self,
+        entry_id: int,
+        requirement: str,
+        result: Dict[str, Any],
+        shingle_set: FrozenSet[str],
+        signature: List[int],
+        variant: str = "",
+    ):
+        self.id = entry_id
+        self.requirement = requirement
+        self.result = result
+        self.variant = variant
+        self.shingles = shingle_set
+        self.signature = signature
+        self.created_at = time.time()
+
+
+class SimilarityIndex:
+    """
+    MinHash/LSH index over past requirements and their generated results.
+
+    Each requirement's shingles are reduced to a MinHash signature, which is
+    split into `bands`; requirements sharing any band land in the same bucket
+    and become candidates, whose exact Jaccard similarity is then computed.
+    Adding and looking up are incremental and cost O(num_perm) per call
+    rather than a scan over every stored requirement. Beyond `max_entries`
+    the least recently used entries (added, served or seeded) are dropped.
+
+    `lookup` classifies the best match: at or above `serve_threshold` its
+    result can be returned as is, at or above `seed_threshold` its files are
+    a good starting point for a cheap patch edit. A `variant` describes what
+    else shaped a result (e.g. which pipeline stages ran); a match of
+    another variant is at most a seed, never served.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        serve_threshold: float = 0.9,
+        seed_threshold: float = 0.6,
+        max_entries: int = 5000,
+        num_perm: int = 64,
+        bands: int = 16,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.enabled = enabled
+        self.serve_threshold = serve_threshold
+        self.seed_threshold = seed_threshold
+        self.max_entries = max_entries
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Fixed seed: signatures must not depend on the process
+        rng = random.Random(1)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._entries: "OrderedDict[int, SimilarEntry]" = OrderedDict()
+        self._buckets: List[Dict[Tuple[int, ...], Set[int]]] = [{} for _ in range(bands)]
+        self._next_id = 0
+        self.lookups = 0
+        self.served = 0
+        self.seeded = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "SimilarityIndex":
+        """Build the index from SIMILARITY_* environment variables."""
+        return cls(
+            enabled=env_bool("SIMILARITY_ENABLED", True),
+            serve_threshold=env_float("SIMILARITY_SERVE_THRESHOLD", 0.9),
+            seed_threshold=env_float("SIMILARITY_SEED_THRESHOLD", 0.6),
+            max_entries=env_int("SIMILARITY_MAX_ENTRIES", 5000),
+            num_perm=env_int("SIMILARITY_NUM_PERM", 64),
+            bands=env_int("SIMILARITY_BANDS", 16),
+        )
+
+    def _signature(self, shingle_set: FrozenSet[str]) -> List[int]:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+            for shingle in shingle_set
+        ] or [0]
+        return [min((a * value + b) % _PRIME for value in hashes) for a, b in self._perms]
+
+    def _band_keys(self, signature: List[int]) -> List[Tuple[int, ...]]:
+        return [tuple(signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def add(self, requirement: str, result: Dict[str, Any], variant: str = "") -> None:
+        """Index a requirement with the result generated for it."""
+        if not self.enabled:
+            return
+        shingle_set = shingles(requirement)
+        if not shingle_set:
+            return
+        signature = self._signature(shingle_set)
+        entry = SimilarEntry(self._next_id, requirement, copy.deepcopy(result), shingle_set, signature, variant)
+        self._next_id += 1
+        self._entries[entry.id] = entry
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, set()).add(entry.id)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        for band, key in enumerate(self._band_keys(entry.signature)):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def nearest(self, requirement: str) -> Optional[Tuple[SimilarEntry, float]]:
+        """The most similar indexed requirement and its Jaccard similarity, if any share a band."""
+        shingle_set = shingles(requirement)
+        if not shingle_set:
+            return None
+        candidates: Set[int] = set()
+        for band, key in enumerate(self._band_keys(self._signature(shingle_set))):
+            candidates.update(self._buckets[band].get(key, ()))
+        best: Optional[Tuple[SimilarEntry, float]] = None
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            score = jaccard(shingle_set, entry.shingles)
+            # Prefer the newest result among equally similar ones
+            if best is None or score > best[1] or (score == best[1] and entry.id > best[0].id):
+                best = (entry, score)
+        return best
+
+    def lookup(self, requirement: str, variant: str = "") -> Tuple[str, Optional[SimilarEntry], float]:
+        """
+        Return `("serve" | "seed" | "miss", entry, score)` for a requirement
+        of the given variant. The entry's result is a copy the caller may modify.
+        """
+        if not self.enabled:
+            return "miss", None, 0.0
+        self.lookups += 1
+        match = self.nearest(requirement)
+        if match is not None:
+            entry, score = match
+            if score >= self.seed_threshold:
+                self._entries.move_to_end(entry.id)
+            if score >= self.serve_threshold and entry.variant == variant:
+                self.served += 1
+                return "serve", self._copy(entry), score
+            if score >= self.seed_threshold:
+                self.seeded += 1
+                return "seed", self._copy(entry), score
+        self.misses += 1
+        return "miss", None, match[1] if match else 0.0
+
+    def _copy(self, entry: SimilarEntry) -> SimilarEntry:
+        clone = copy.copy(entry)
+        clone.result = copy.deepcopy(entry.result)
+        return clone
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "served": self.served,
+            "seeded": self.seeded,
+            "misses": self.misses,
+            "serve_rate": round(self.served / self.lookups, 4) if self.lookups else 0.0,
+            "seed_rate": round(self.seeded / self.lookups, 4) if self.lookups else 0.0,
+            "serve_threshold": self.serve_threshold,
+            "seed_threshold": self.seed_threshold,
+        }
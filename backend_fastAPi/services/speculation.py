@@ -0,0 +1,156 @@
+import asyncio
+import copy
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+
+class Speculation:
+    """A UI generation started for a PRD before the user approved it."""
+
+    def __init__(self, key: str, requirement: str, prd: str, task: "asyncio.Task"):
+        self.key = key
+        self.requirement = requirement
+        self.prd = prd
+        self.task = task
+        self.started_at = time.time()
+
+
+class SpeculativeRunner:
+    """
+    Background UI generations for PRDs the user is still reviewing, keyed by PRD id.
+
+    At most `max_jobs` run at once; further PRDs are simply not speculated
+    on. An approval claims its PRD's generation, waiting for it if it is
+    still running, as long as the PRD wasn't edited in the meantime. A
+    rejection, an edited PRD or an entry older than `ttl` cancels the
+    generation. Finished results beyond `max_results` are dropped oldest first.
+    """
+
+    def __init__(self, enabled: bool = False, max_jobs: int = 4, max_results: int = 100, ttl: float = 600.0):
+        self.enabled = enabled
+        self.max_jobs = max_jobs
+        self.max_results = max_results
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Speculation]" = OrderedDict()
+        self.started = 0
+        self.skipped = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.failed = 0
+        self.hits_ready = 0
+        self.hits_running = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "SpeculativeRunner":
+        return cls(
+            enabled=env_bool("SPECULATIVE_ENABLED", False),
+            max_jobs=env_int("SPECULATIVE_MAX_JOBS", 4),
+            max_results=env_int("SPECULATIVE_MAX_RESULTS", 100),
+            ttl=env_float("SPECULATIVE_TTL", 600.0),
+        )
+
+    @property
+    def running(self) -> int:
+        return sum(1 for entry in self._entries.values() if not entry.task.done())
+
+    def start(self, key: str, requirement: str, prd: str, run: Callable[[], Awaitable[Dict[str, Any]]]) -> bool:
+        """Start `run()` for a PRD unless disabled, already started or at capacity."""
+        if not self.enabled or key in self._entries:
+            return False
+        self._purge()
+        if self.running >= self.max_jobs:
+            self.skipped += 1
+            return False
+        task = asyncio.ensure_future(run())
+        task.add_done_callback(self._finished)
+        self._entries[key] = Speculation(key, requirement, prd, task)
+        self.started += 1
+        return True
+
+    def _finished(self, task: "asyncio.Task") -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self.failed += 1
+            logger.warning(f"Speculative generation failed: {str(task.exception())}")
+        finished = [key for key, entry in self._entries.items() if entry.task.done()]
+        for key in finished[:max(0, len(finished) - self.max_results)]:
+            del self._entries[key]
+
+    def cancel(self, key: str) -> bool:
+        """Drop a PRD's speculation, cancelling it if still running."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        if not entry.task.done():
+            entry.task.cancel()
+            self.cancelled += 1
+        return True
+
+    async def claim(self, key: str, requirement: str, prd: str) -> Optional[Dict[str, Any]]:
+        """
+        The result generated for this PRD, waiting for it if still running.
+        None if there is none, the PRD or requirement changed since, or it failed.
+        """
+        self._purge()
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.prd != prd or entry.requirement != requirement:
+            # The user edited the PRD; what was generated no longer applies
+            self.cancel(key)
+            self.misses += 1
+            return None
+        if entry.task.done():
+            self.hits_ready += 1
+        else:
+            self.hits_running += 1
+        try:
+            # Shielded: if this caller goes away, the generation stays claimable
+            result = await asyncio.shield(entry.task)
+        except asyncio.CancelledError:
+            if entry.task.cancelled():
+                return None
+            raise
+        except Exception:
+            return None
+        finally:
+            if entry.task.done():
+                self._entries.pop(key, None)
+        return copy.deepcopy(result)
+
+    def _purge(self) -> None:
+        cutoff = time.time() - self.ttl
+        for key in [key for key, entry in self._entries.items() if entry.started_at < cutoff]:
+            entry = self._entries.pop(key)
+            entry.task.cancel()
+            self.expired += 1
+
+    def close(self) -> None:
+        for entry in self._entries.values():
+            entry.task.cancel()
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        claims = self.hits_ready + self.hits_running + self.misses
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "ready": len(self._entries) - self.running,
+            "started": self.started,
+            "skipped": self.skipped,
+            "cancelled": self.cancelled,
+            "expired": self.expired,
+            "failed": self.failed,
+            "hits_ready": self.hits_ready,
+            "hits_running": self.hits_running,
+            "misses": self.misses,
+            "hit_rate": round((self.hits_ready + self.hits_running) / claims, 4) if claims else 0.0,
+            "max_jobs": self.max_jobs,
+        }
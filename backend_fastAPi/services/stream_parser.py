@@ -0,0 +1,155 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+# Single-character JSON escapes; \uXXXX is handled separately
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class FileStreamParser:
+    """
+    Incrementally extract `{"filename": "content", ...}` pairs from streamed LLM output.
+
+    Chunks are fed as they arrive from the provider; each call to `feed`
+    returns `(filename, delta)` pairs containing the newly decoded part of a
+    file's content, so callers can forward code to the client before the
+    JSON object is complete. Escape sequences split across chunks are
+    buffered until they can be decoded.
+
+    Text around the object (markdown fences, prose) is skipped, and a `{`
+    in leading prose that doesn't open a `{"filename": "content"}` object
+    (such as `{files}` or `{"roles"}`) is ignored. Only files
+    listed in `completed` had their closing quote; if the output stops early
+    `truncated` is set and the last file in `files` is partial.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, str] = {}
+        self.completed: List[str] = []
+        self._state = "object"  # object -> key -> colon -> before_value -> value -> after_value
+        self._key = ""
+        self._current: Optional[str] = None
+        self._escape = ""
+        self._high_surrogate = ""
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume a chunk of output and return the decoded content deltas it produced."""
+        deltas: List[Tuple[str, str]] = []
+        value: List[str] = []
+
+        for char in chunk:
+            state = self._state
+
+            if state == "value":
+                decoded = self._decode(char)
+                if decoded is None:
+                    continue
+                if decoded is _END:
+                    self._flush(value, deltas)
+                    self.completed.append(self._current)
+                    self._current = None
+                    self._state = "after_value"
+                    continue
+                value.append(decoded)
+            elif state == "key":
+                decoded = self._decode(char)
+                if decoded is None:
+                    continue
+                if decoded is _END:
+                    self._state = "colon"
+                    continue
+                self._key += decoded
+            elif state == "object":
+                if char == "{":
+                    self._state = "before_key"
+            elif state == "before_key":
+                if char == '"':
+                    self._key = ""
+                    self._state = "key"
+                elif char == "}":
+                    self._state = "done"
+                elif not char.isspace() and not self.files:
+                    # A brace in prose, not the start of the object; keep looking
+                    self._state = "object"
+            elif state == "colon":
+                if char == ":":
+                    self._state = "before_value"
+                elif not char.isspace() and not self.files:
+                    # A quoted word in prose, not a key; keep looking
+                    self._state = "object"
+            elif state == "before_value":
+                if char == '"':
+                    self._current = self._key
+                    self.files.setdefault(self._current, "")
+                    self._state = "value"
+                elif not char.isspace() and not self.files:
+                    # Not a {"filename": "content"} object
+                    self._state = "object"
+            elif state == "after_value":
+                if char == ",":
+                    self._state = "before_key"
+                elif char == "}":
+                    self._state = "done"
+
+        self._flush(value, deltas)
+        return deltas
+
+    @property
+    def done(self) -> bool:
+        """True once the closing brace of the object has been seen."""
+        return self._state == "done"
+
+    @property
+    def truncated(self) -> bool:
+        """True if an object was started but the output ended before it was closed."""
+        return self._state not in ("object", "done")
+
+    def missing(self, required) -> List[str]:
+        """Required filenames that were not completely received."""
+        return [name for name in required if name not in self.completed]
+
+    def _flush(self, value: List[str], deltas: List[Tuple[str, str]]) -> None:
+        if value and self._current is not None:
+            text = "".join(value)
+            self.files[self._current] += text
+            deltas.append((self._current, text))
+        value.clear()
+
+    def _decode(self, char: str):
+        """Decode one character inside a JSON string; None means 'need more input'."""
+        if self._escape:
+            self._escape += char
+            if self._escape[1] == "u":
+                if len(self._escape) < 6:
+                    return None
+                escape, self._escape = self._escape, ""
+                code = int(escape[2:], 16) if all(c in "0123456789abcdefABCDEF" for c in escape[2:]) else -1
+                if 0xD800 <= code <= 0xDBFF and not self._high_surrogate:
+                    # Emoji etc. arrive as surrogate pairs; wait for the low half
+                    self._high_surrogate = escape
+                    return None
+                escape, self._high_surrogate = self._high_surrogate + escape, ""
+                try:
+                    return json.loads(f'"{escape}"')
+                except ValueError:
+                    return escape
+            decoded = _ESCAPES.get(char, char)
+            self._escape = ""
+            return decoded
+        if char == "\\":
+            self._escape = char
+            return None
+        if char == '"':
+            return _END
+        return char
+
+
+_END = object()
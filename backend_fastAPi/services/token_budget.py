@@ -0,0 +1,161 @@
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, List
+
+from config import env_int
+
+# Word pieces and individual punctuation marks, roughly how BPE tokenizers split text and code
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+# Lines worth keeping when prior code has to be condensed: markup with ids/classes,
+# CSS selectors and at-rules, and top-level JS declarations
+_OUTLINE = {
+    ".html": re.compile(r"<(?:[a-zA-Z][^>]*\b(?:id|class)=|(?:form|input|button|select|textarea|section|main|nav|header|footer|script|link)\b)"),
+    ".css": re.compile(r"^\s*[^\s{}][^{}]*\{|^\s*@"),
+    ".js": re.compile(r"^(?:export\s+)?(?:async\s+)?(?:function\b|class\b|const\b|let\b|var\b)|addEventListener\("),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate how many tokens a text takes up.
+
+    Counts word pieces and punctuation, with long words counting as several
+    tokens, which tracks BPE tokenizers far better than a flat characters
+    per token ratio on code. Errs slightly on the high side.
+    """
+    return sum(1 + len(piece) // 6 for piece in _PIECES.findall(text))
+
+
+class PromptTooLargeError(Exception):
+    """Raised when a request cannot fit in the model's prompt budget."""
+
+    def __init__(self, tokens: int, limit: int):
+        super().__init__(f"Requirement is too large: about {tokens} tokens, limit is {limit}")
+        self.tokens = tokens
+        self.limit = limit
+
+
+def condense_code(filename: str, content: str, max_tokens: int) -> str:
+    """
+    Shrink a file to about `max_tokens` for use as prompt context.
+
+    First keeps only its structural outline (elements with ids/classes, CSS
+    selectors, JS declarations), which is what follow-up prompts need to
+    stay consistent with the existing code; if that is still too large the
+    head and tail are kept and the middle is elided.
+    """
+    if estimate_tokens(content) <= max_tokens:
+        return content
+
+    extension = filename[filename.rfind("."):] if "." in filename else ""
+    pattern = _OUTLINE.get(extension)
+    if pattern is not None:
+        outline = [line.rstrip() for line in content.splitlines() if pattern.search(line)]
+        condensed = "\n".join(outline)
+        if outline and estimate_tokens(condensed) <= max_tokens:
+            return f"{_omitted_marker(extension, 'outline only; bodies omitted')}\n{condensed}"
+        content = condensed or content
+
+    lines = content.splitlines()
+    head: List[str] = []
+    tail: List[str] = []
+    used = 0
+    # Alternate between the start and the end of the file until the budget is spent
+    for index in range(len(lines)):
+        line = lines[index // 2] if index % 2 == 0 else lines[-(index // 2) - 1]
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        (head if index % 2 == 0 else tail).append(line)
+        used += cost
+    omitted = len(lines) - len(head) - len(tail)
+    return "\n".join(head + [_omitted_marker(extension, f"{omitted} lines omitted")] + tail[::-1])
+
+
+def _omitted_marker(extension: str, note: str) -> str:
+    if extension == ".html":
+        return f"<!-- ... {note} ... -->"
+    return f"/* ... {note} ... */"
+
+
+@dataclass(frozen=True)
+class TokenBudget:
+    """
+    Token limits for prompts and generations.
+
+    Output limits are picked per task instead of one fixed `max_new_tokens`:
+    short reasoning calls reserve little, code generation reserves enough for
+    three complete files and grows with the size of the code being modified.
+    Every limit is also capped so prompt + output fit the context window.
+    """
+
+    context_window: int = 200000
+    max_output_tokens: int = 8192
+    max_requirement_tokens: int = 4000
+    max_context_tokens: int = 6000
+    analysis_tokens: int = 600
+    plan_tokens: int = 900
+    prd_tokens: int = 1500
+    code_tokens: int = 4096
+    edit_tokens: int = 1024
+    contract_tokens: int = 800
+
+    @classmethod
+    def from_env(cls) -> "TokenBudget":
+        return cls(
+            context_window=env_int("LLM_CONTEXT_WINDOW", 200000),
+            max_output_tokens=env_int("LLM_MAX_OUTPUT_TOKENS", 8192),
+            max_requirement_tokens=env_int("LLM_MAX_REQUIREMENT_TOKENS", 4000),
+            max_context_tokens=env_int("LLM_MAX_CONTEXT_TOKENS", 6000),
+            analysis_tokens=env_int("LLM_ANALYSIS_MAX_TOKENS", 600),
+            plan_tokens=env_int("LLM_PLAN_MAX_TOKENS", 900),
+            prd_tokens=env_int("LLM_PRD_MAX_TOKENS", 1500),
+            code_tokens=env_int("LLM_CODE_MAX_TOKENS", 4096),
+            edit_tokens=env_int("LLM_EDIT_MAX_TOKENS", 1024),
+            contract_tokens=env_int("LLM_CONTRACT_MAX_TOKENS", 800),
+        )
+
+    def check_requirement(self, requirement: str) -> None:
+        """Reject a user requirement up front if it would blow the prompt budget."""
+        tokens = estimate_tokens(requirement)
+        if tokens > self.max_requirement_tokens:
+            raise PromptTooLargeError(tokens, self.max_requirement_tokens)
+
+    def output_tokens(self, task: str, prompt: str, previous_output: str = "") -> int:
+        """
+        `max_new_tokens` for a call of the given task ("analysis", "plan",
+        "prd", "code", "edit", "contract"; anything else gets the analysis budget).
+
+        When the call rewrites earlier output (a modification), the limit is
+        raised to fit that output plus headroom for the change.
+        """
+        base = {
+            "analysis": self.analysis_tokens,
+            "plan": self.plan_tokens,
+            "prd": self.prd_tokens,
+            "code": self.code_tokens,
+            "edit": self.edit_tokens,
+            "contract": self.contract_tokens,
+        }.get(task, self.analysis_tokens)
+        if previous_output:
+            base = max(base, math.ceil(estimate_tokens(previous_output) * 1.25) + 500)
+        available = self.context_window - estimate_tokens(prompt)
+        return max(0, min(base, self.max_output_tokens, available))
+
+    def fit_files(self, files: Dict[str, str], max_tokens: int = 0) -> Dict[str, str]:
+        """
+        Condense files used as prompt context so together they stay within
+        `max_tokens` (default `max_context_tokens`). Each file gets a share of
+        the budget proportional to its size; small files are left untouched.
+        """
+        limit = max_tokens or self.max_context_tokens
+        sizes = {name: estimate_tokens(content) for name, content in files.items()}
+        total = sum(sizes.values())
+        if total <= limit:
+            return dict(files)
+        return {
+            name: condense_code(name, content, max(1, limit * sizes[name] // total))
+            for name, content in files.items()
+        }
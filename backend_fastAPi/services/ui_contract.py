@@ -0,0 +1,126 @@
+import json
+import re
+from typing import Any, Dict, List, Set, Tuple
+
+_ID_ATTR = re.compile(r"""\bid\s*=\s*\\?["']([^"'\\\s]+)""")
+_CLASS_ATTR = re.compile(r"""\bclass(?:Name)?\s*=\s*\\?["']([^"'\\]+)""")
+_GET_BY_ID = re.compile(r"""getElementById\(\s*["'`]([^"'`]+)["'`]""")
+_QUERY = re.compile(r"""querySelector(?:All)?\(\s*["'`]([^"'`]+)["'`]""")
+_CLASS_LIST = re.compile(r"""classList\.(?:add|remove|toggle|replace)\(([^)]*)\)""")
+_STRING = re.compile(r"""["'`]([^"'`]+)["'`]""")
+_SELECTOR_ID = re.compile(r"#([A-Za-z_][\w-]*)")
+_SELECTOR_CLASS = re.compile(r"\.([A-Za-z_][\w-]*)")
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_CSS_RULE = re.compile(r"([^{}]+)\{")
+_FENCE = re.compile(r"^\s*```[\w-]*\s*\n(.*?)\n?```\s*$", re.DOTALL)
+
+
+class ContractError(Exception):
+    """Raised when a UI contract can't be parsed from model output."""
+    pass
+
+
+def parse_contract(text: str) -> Dict[str, Any]:
+    """
+    Parse the shared UI contract from model output:
+    `{"ids": {id: purpose}, "classes": {class: purpose}, "data": ..., "events": [...]}`.
+
+    Fences and prose around the object are ignored, and `ids`/`classes` may
+    also be plain lists. Raises ContractError if there is no such object.
+    """
+    start = text.find("{")
+    while start != -1:
+        try:
+            data, _ = json.JSONDecoder().raw_decode(text, start)
+        except ValueError:
+            start = text.find("{", start + 1)
+            continue
+        if isinstance(data, dict) and "ids" in data:
+            return {
+                "ids": _names(data.get("ids")),
+                "classes": _names(data.get("classes")),
+                "data": data.get("data"),
+                "events": data.get("events") if isinstance(data.get("events"), list) else [],
+            }
+        start = text.find("{", start + 1)
+    raise ContractError("No contract object in output")
+
+
+def _names(value: Any) -> Dict[str, str]:
+    if isinstance(value, dict):
+        return {str(name).lstrip("#."): str(purpose) for name, purpose in value.items()}
+    if isinstance(value, list):
+        return {str(name).lstrip("#."): "" for name in value}
+    return {}
+
+
+def format_contract(contract: Dict[str, Any]) -> str:
+    """The contract as compact JSON for prompts."""
+    return json.dumps(contract, ensure_ascii=False, separators=(",", ":"))
+
+
+def strip_fences(text: str) -> str:
+    """File content without a markdown fence around it."""
+    match = _FENCE.match(text)
+    return match.group(1).strip("\n") + "\n" if match else text
+
+
+def _selector_names(selectors: List[str]) -> Tuple[Set[str], Set[str]]:
+    ids: Set[str] = set()
+    classes: Set[str] = set()
+    for selector in selectors:
+        # Attribute values and pseudo-class arguments aren't selectors of their own
+        selector = re.sub(r"\[[^\]]*\]|\([^)]*\)", "", selector)
+        ids.update(_SELECTOR_ID.findall(selector))
+        classes.update(_SELECTOR_CLASS.findall(selector))
+    return ids, classes
+
+
+def check_consistency(files: Dict[str, str], contract: Dict[str, Any]) -> Dict[str, List[str]]:
+    """
+    Cross-reference ids and class names between the files and the contract.
+
+    Returns `{filename: [issue, ...]}` for files that need fixing: contract
+    ids missing from the markup, and ids or classes that script.js or
+    style.css select but nothing defines (markup, contract, or elements the
+    script creates), plus empty files. Empty when the files agree.
+    """
+    html = files.get("index.html", "")
+    js = files.get("script.js", "")
+    css = _CSS_COMMENT.sub("", files.get("style.css", ""))
+
+    # Markup the script builds (innerHTML templates, className, classList) counts as defined
+    defined_ids = set(_ID_ATTR.findall(html)) | set(_ID_ATTR.findall(js))
+    defined_classes = {name for value in _CLASS_ATTR.findall(html) + _CLASS_ATTR.findall(js) for name in value.split()}
+    for args in _CLASS_LIST.findall(js):
+        defined_classes.update(name for value in _STRING.findall(args) for name in value.split())
+    known_classes = defined_classes | set(contract.get("classes", {}))
+
+    issues: Dict[str, List[str]] = {}
+
+    def add(filename: str, issue: str) -> None:
+        issues.setdefault(filename, []).append(issue)
+
+    for filename, content in files.items():
+        if not content.strip():
+            add(filename, "is empty")
+    for name in sorted(set(contract.get("ids", {})) - defined_ids):
+        add("index.html", f"missing the element with id '{name}' from the contract")
+
+    js_ids, js_classes = _selector_names(_QUERY.findall(js))
+    js_ids.update(_GET_BY_ID.findall(js))
+    for name in sorted(js_ids - defined_ids):
+        add("script.js", f"looks up id '{name}', which index.html doesn't define")
+    for name in sorted(js_classes - known_classes):
+        add("script.js", f"selects class '{name}', which nothing defines")
+
+    selectors = [
+        rule for rule in _CSS_RULE.findall(css)
+        if not rule.strip().startswith("@") and not re.match(r"^\s*(?:from|to|\d+%)\s*$", rule)
+    ]
+    css_ids, css_classes = _selector_names(selectors)
+    for name in sorted(css_ids - defined_ids):
+        add("style.css", f"styles id '{name}', which index.html doesn't define")
+    for name in sorted(css_classes - known_classes):
+        add("style.css", f"styles class '{name}', which nothing defines")
+    return issues
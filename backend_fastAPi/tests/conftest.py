@@ -0,0 +1,23 @@
+import httpx
+import pytest
+
+from services.llm_service import LLMService
+from services.response_cache import ResponseCache
+from services.scheduler import LLMScheduler
+
+
+@pytest.fixture
+def make_llm_service(monkeypatch):
+    """Build an LLMService whose provider calls go to `handler` (an httpx MockTransport handler)."""
+    monkeypatch.setenv("REPLICATE_API_TOKEN", "test-token")
+    monkeypatch.setenv("REPLICATE_API_BASE", "https://provider.test/v1")
+
+    def make(handler=None, max_concurrency: int = 8) -> LLMService:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler or (lambda request: httpx.Response(500))))
+        return LLMService(
+            client=client,
+            cache=ResponseCache(enabled=False),
+            scheduler=LLMScheduler(max_concurrency=max_concurrency),
+        )
+
+    return make
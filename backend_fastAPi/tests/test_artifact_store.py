@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from services.artifact_store import ArtifactStore, MemoryArtifactBackend, SQLiteArtifactBackend
+
+HTML = "<ul id=\"list\">" + "<li>task</li>" * 100 + "</ul>"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    def make(max_bytes=64 * 1024 * 1024):
+        if request.param == "memory":
+            return MemoryArtifactBackend(max_bytes)
+        return SQLiteArtifactBackend(str(tmp_path / "artifacts.db"), max_bytes)
+    return make
+
+
+def test_stored_file_is_fetched_by_hash(make_backend):
+    async def run():
+        store = ArtifactStore(make_backend())
+        hashes = await store.put_files({"index.html": HTML})
+        return hashes, await store.get(hashes["index.html"]), await store.get("unknown"), store.stats()
+
+    hashes, artifact, unknown, stats = asyncio.run(run())
+    assert (artifact.content, artifact.media_type, artifact.filename) == (HTML.encode(), "text/html", "index.html")
+    assert unknown is None
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_compressed_encoding_is_kept(make_backend):
+    async def run():
+        store = ArtifactStore(make_backend())
+        digest = await store.put(HTML.encode(), "text/html")
+        body = await store.encoded(await store.get(digest), "gzip")
+        return body, (await store.get(digest)).has_encoding("gzip"), store.stats()["bytes"]
+
+    body, kept, size = asyncio.run(run())
+    assert kept
+    assert size == len(HTML) + len(body)
+
+
+def test_least_recently_used_artifact_is_evicted(make_backend):
+    async def run():
+        store = ArtifactStore(make_backend(max_bytes=2 * len(HTML) + 10))
+        first = await store.put(HTML.encode(), "text/html")
+        second = await store.put(HTML.encode() + b"2", "text/html")
+        # Reading the first makes the second the least recently used
+        await store.get(first)
+        third = await store.put(HTML.encode() + b"3", "text/html")
+        return [await store.get(digest) is not None for digest in (first, second, third)]
+
+    assert asyncio.run(run()) == [True, False, True]
+
+
+def test_workers_sharing_a_sqlite_file_serve_each_other_s_artifacts(tmp_path):
+    path = str(tmp_path / "artifacts.db")
+
+    async def run():
+        producer = ArtifactStore(SQLiteArtifactBackend(path, 1024 * 1024))
+        server = ArtifactStore(SQLiteArtifactBackend(path, 1024 * 1024))
+        result = await producer.attach({"files": {"index.html": HTML}}, bundle=True)
+        return [await server.get(digest) for digest in (result["artifacts"]["index.html"], result["bundle"])]
+
+    html, bundle = asyncio.run(run())
+    assert html.content == HTML.encode()
+    assert bundle.media_type == "application/zip"
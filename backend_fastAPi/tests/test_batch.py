@@ -0,0 +1,39 @@
+import asyncio
+
+import httpx
+
+from bench.mock_replicate import UI_OUTPUT
+from models.request_models import BatchGenerateRequest, PipelineOptions
+from routes.batch import generate_batch
+from services.agent_service import AgentService
+from services.batch_service import BatchRunner
+
+
+def _provider(request: httpx.Request) -> httpx.Response:
+    # Every prediction finishes in the create call with the canned UI
+    return httpx.Response(201, json={
+        "id": "p1", "status": "succeeded", "output": [UI_OUTPUT],
+        "urls": {"get": "https://provider.test/v1/predictions/p1"},
+    })
+
+
+def test_batch_items_are_scheduled_in_the_background(make_llm_service, monkeypatch):
+    monkeypatch.setenv("SIMILARITY_ENABLED", "false")
+    monkeypatch.setenv("SPECULATIVE_ENABLED", "false")
+    service = make_llm_service(_provider)
+    agent = AgentService(service)
+    request = BatchGenerateRequest(
+        requirements=["A todo list", "A weather dashboard"],
+        pipeline=PipelineOptions(include_analysis=True, include_plan=False),
+        use_cache=False,
+    )
+
+    async def run():
+        response = await generate_batch(request, agent_service=agent, batch_runner=BatchRunner())
+        return [line async for line in response.body_iterator]
+
+    lines = asyncio.run(run())
+    assert '"succeeded": 2' in lines[-1]
+    granted = {name: stats["granted"] for name, stats in service.scheduler.stats()["priorities"].items()}
+    # Analysis and code for both items, none of them ahead of live traffic
+    assert granted == {"interactive": 0, "normal": 0, "background": 4}
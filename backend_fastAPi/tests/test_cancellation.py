@@ -0,0 +1,124 @@
+import asyncio
+import itertools
+import json
+
+import httpx
+import pytest
+
+from services.cancellation import run_cancellable
+from services.completion import CompletionPolicy
+from services.llm_service import LLMServiceError
+
+# Polls fast and gives up quickly, so deadlines pass within the test
+SHORT_POLICY = CompletionPolicy(name="code", sync_wait=0, initial_interval=0.01, fast_polls=100, jitter=0.0, deadline=0.1)
+
+
+class _Provider:
+    """Fake predictions API: every prediction stays `poll_status` until it is cancelled."""
+
+    def __init__(self, poll_status="processing", stream=False):
+        self.poll_status = poll_status
+        self.stream = stream
+        self.log = []
+        self._ids = itertools.count(1)
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if request.method == "POST" and path.endswith("/predictions"):
+            prediction_id = f"p{next(self._ids)}"
+            self.log.append(("create", path.split("/models/")[1].rsplit("/", 1)[0], prediction_id))
+            urls = {
+                "get": f"https://provider.test/v1/predictions/{prediction_id}",
+                "cancel": f"https://provider.test/v1/predictions/{prediction_id}/cancel",
+            }
+            if self.stream:
+                urls["stream"] = f"https://provider.test/v1/predictions/{prediction_id}/stream"
+            return httpx.Response(201, json={"id": prediction_id, "status": "starting", "urls": urls})
+        if request.method == "POST" and path.endswith("/cancel"):
+            self.log.append(("cancel", path.split("/")[-2]))
+            return httpx.Response(200, json={"status": "canceled"})
+        if path.endswith("/stream"):
+            return httpx.Response(503, text="stream unavailable")
+        return httpx.Response(200, json={"status": self.poll_status, "error": "boom", "output": None})
+
+    def cancelled(self):
+        return [entry[1] for entry in self.log if entry[0] == "cancel"]
+
+
+async def _settle(service):
+    # Provider cancels are sent from background tasks
+    await asyncio.gather(*list(service._background), return_exceptions=True)
+
+
+def test_timed_out_prediction_is_cancelled_before_the_fallback_starts(make_llm_service, monkeypatch):
+    monkeypatch.setenv("LLM_MODEL", "primary/model")
+    monkeypatch.setenv("LLM_FALLBACK_MODEL", "fallback/model")
+    provider = _Provider()
+    service = make_llm_service(provider)
+
+    async def run():
+        with pytest.raises(LLMServiceError, match="timed out"):
+            await service.generate_text("Build a todo list", SHORT_POLICY, use_cache=False, task="code")
+        await _settle(service)
+
+    asyncio.run(run())
+    creates = [entry for entry in provider.log if entry[0] == "create"]
+    assert [entry[1] for entry in creates] == ["primary/model", "fallback/model"]
+    # The primary was stopped before the fallback was created, and the fallback when it timed out too
+    assert provider.log.index(("cancel", "p1")) < provider.log.index(creates[1])
+    assert sorted(provider.cancelled()) == ["p1", "p2"]
+    assert service.wasted_calls == 2
+
+
+def test_failed_prediction_is_not_cancelled(make_llm_service):
+    provider = _Provider(poll_status="failed")
+    service = make_llm_service(provider)
+
+    async def run():
+        with pytest.raises(LLMServiceError, match="Prediction failed"):
+            await service.generate_text("Build a todo list", SHORT_POLICY, use_cache=False, task="code")
+        await _settle(service)
+
+    asyncio.run(run())
+    assert provider.cancelled() == []
+    assert service.wasted_calls == 0
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_streamed_prediction_is_cancelled_when_it_fails_to_finish(make_llm_service, stream):
+    # Without a stream URL the prediction is polled until the deadline; with one the stream breaks
+    provider = _Provider(stream=stream)
+    service = make_llm_service(provider)
+
+    async def run():
+        with pytest.raises(LLMServiceError):
+            async for _ in service.stream_text("Build a todo list", SHORT_POLICY, use_cache=False, task="code"):
+                pass
+        await _settle(service)
+
+    asyncio.run(run())
+    assert provider.cancelled() == ["p1"]
+    assert service.scheduler.stats()["active"] == 0
+
+
+def test_cancelled_caller_waits_for_the_work_to_unwind():
+    events = []
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        finally:
+            # Cleanup that itself awaits, like cancelling a prediction at the provider
+            await asyncio.sleep(0.01)
+            events.append("work cleaned up")
+
+    async def run():
+        caller = asyncio.ensure_future(run_cancellable(work(), deadline=10))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        events.append("caller cancelled")
+
+    asyncio.run(run())
+    assert events == ["work cleaned up", "caller cancelled"]
@@ -0,0 +1,105 @@
+import pytest
+
+from bench.fence_bench import regex_extract
+from services.fence_scanner import FenceScanner, canonical_language, extract_ui_blocks, scan_code_blocks
+
+HTML = "<!DOCTYPE html>\n<html>\n<body>\n  <ul id=\"list\"></ul>\n</body>\n</html>"
+CSS = "ul {\n  padding: 0;\n}"
+JS = "const list = document.getElementById('list');\nlist.textContent = `${1 + 1}`;"
+
+
+def _output(html=HTML, css=CSS, js=JS, js_tag="javascript"):
+    return (
+        "Here is the implementation.\n\n"
+        f"```html\n{html}\n```\n\n"
+        f"Some styles:\n```css\n{css}\n```\n\n"
+        f"```{js_tag}\n{js}\n```\n\nLet me know if you need changes."
+    )
+
+
+def _streamed(text: str, size: int):
+    scanner = FenceScanner()
+    for start in range(0, len(text), size):
+        scanner.feed(text[start:start + size])
+    scanner.finish()
+    return scanner
+
+
+# Outputs where the scanner must find exactly what the old regex searches found
+SAME_AS_REGEX = {
+    "typical": _output(),
+    "crlf": _output().replace("\n", "\r\n"),
+    "fence glued to code": f"```html\n{HTML}```\n```css\n{CSS}```\n```javascript\n{JS}```",
+    "indented fences": _output().replace("```", "  ```"),
+    "html only with inline tags": f"```html\n<style>\n{CSS}\n</style>\n{HTML}\n<script>\n{JS}\n</script>\n```",
+    "no fences": "I can't build that.",
+    "empty blocks": "```html\n```\n```css\n\n```",
+}
+
+
+@pytest.mark.parametrize("name", list(SAME_AS_REGEX))
+def test_matches_regex_extraction(name):
+    text = SAME_AS_REGEX[name]
+    assert extract_ui_blocks(text) == regex_extract(text)
+
+
+@pytest.mark.parametrize("size", [1, 5, 64])
+@pytest.mark.parametrize("name", ["typical", "crlf", "fence glued to code"])
+def test_streamed_chunks_give_the_same_blocks(name, size):
+    text = SAME_AS_REGEX[name]
+    assert _streamed(text, size).by_language() == scan_code_blocks(text)
+
+
+def test_crlf_fences_are_recognised():
+    blocks = scan_code_blocks(_output().replace("\n", "\r\n"))
+    assert set(blocks) == {"html", "css", "javascript"}
+    assert blocks["css"] == [CSS.replace("\n", "\r\n")]
+
+
+@pytest.mark.parametrize("info, language", [
+    ("html", "html"), ("HTML", "html"), ("htm", "html"), ("js", "javascript"), ("JavaScript", "javascript"),
+    ("mjs", "javascript"), ("css title=style.css", "css"), ("", ""), ("python", "python"),
+])
+def test_language_tags(info, language):
+    assert canonical_language(info) == language
+
+
+def test_language_aliases_are_found_where_regexes_missed_them():
+    text = _output(js_tag="js")
+    assert regex_extract(text)["javascript"] == ""
+    assert extract_ui_blocks(text)["javascript"] == JS
+
+
+def test_several_blocks_of_one_language_are_joined():
+    text = _output() + "\n\nAnd the extra handler:\n```javascript\nlist.remove();\n```"
+    assert extract_ui_blocks(text)["javascript"] == JS + "\n\nlist.remove();"
+
+
+def test_unterminated_last_block_is_kept_and_flagged():
+    text = _output()[:_output().index(JS) + 20]
+    scanner = _streamed(text, 7)
+
+    assert scanner.truncated
+    assert scanner.by_language()["javascript"] == [JS[:20]]
+    assert regex_extract(text)["javascript"] == ""
+
+
+def test_nested_fences_stay_inside_the_longer_fence():
+    text = f"````markdown\nUse it like this:\n```html\n{HTML}\n```\n````\n```css\n{CSS}\n```"
+    blocks = scan_code_blocks(text)
+
+    assert "html" not in blocks
+    assert blocks["markdown"] == [f"Use it like this:\n```html\n{HTML}\n```"]
+    assert blocks["css"] == [CSS]
+
+
+def test_backticks_inside_code_do_not_close_the_block():
+    js = "const fence = '```';\nrender(fence);"
+    text = _output(js=js)
+    assert extract_ui_blocks(text)["javascript"] == js
+    assert regex_extract(text)["javascript"] == "const fence = '"
+
+
+def test_tilde_fences_close_only_on_tildes():
+    text = f"~~~css\n{CSS}\n```\n~~~"
+    assert scan_code_blocks(text)["css"] == [f"{CSS}\n```"]
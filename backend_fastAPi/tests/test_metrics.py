@@ -0,0 +1,32 @@
+import asyncio
+import re
+
+from routes.metrics import runtime_metrics
+from services.job_service import JobManager
+from services.response_cache import ResponseCache, SQLiteCacheBackend
+
+
+def _lookups(lines):
+    counts = {}
+    for line in lines:
+        match = re.match(r'llm_cache_lookups_total\{result="(\w+)"\} (\d+)', line)
+        if match:
+            counts[match.group(1)] = int(match.group(2))
+    return counts
+
+
+def test_cache_lookups_count_each_lookup_once(make_llm_service, tmp_path):
+    path = str(tmp_path / "cache.db")
+    service = make_llm_service()
+
+    async def run():
+        await ResponseCache(backend=SQLiteCacheBackend(path, 100)).set("stored", "value")
+        # A fresh process: the first read comes from disk, the second from memory
+        service.cache = ResponseCache(backend=SQLiteCacheBackend(path, 100))
+        for key in ("stored", "stored", "missing"):
+            await service.cache.get(key)
+
+    asyncio.run(run())
+    counts = _lookups(runtime_metrics(service, JobManager({})))
+    assert counts == {"memory_hit": 1, "disk_hit": 1, "miss": 1}
+    assert sum(counts.values()) == 3
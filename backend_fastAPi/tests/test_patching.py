@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import pytest
+
+from services.llm_service import UI_FILES
+from services.patching import PatchError, apply_edits, parse_edits
+
+FILES = {
+    "index.html": "<body>\n  <ul id=\"list\"></ul>\n  <button id=\"add\">Add</button>\n</body>",
+    "style.css": "ul {\n  padding: 0;\n}\n\nli {\n  padding: 0;\n}\n",
+    "script.js": "const list = document.getElementById('list');\n",
+}
+
+
+def _edit(file, search, replace):
+    return {"file": file, "search": search, "replace": replace}
+
+
+def test_parses_edits_around_prose_and_fences():
+    edits = [_edit("index.html", "<button id=\"add\">Add</button>", "")]
+    text = "Here is the {patch}:\n```json\n" + json.dumps({"edits": edits}) + "\n```"
+    assert parse_edits(text, UI_FILES) == edits
+
+
+@pytest.mark.parametrize("text", [
+    "No JSON here",
+    json.dumps({"files": {}}),
+    json.dumps({"edits": {"file": "index.html"}}),
+    json.dumps({"edits": [_edit("index.html", "   ", "x")]}),
+])
+def test_rejects_malformed_edits(text):
+    with pytest.raises(PatchError):
+        parse_edits(text, UI_FILES)
+
+
+def test_rejects_edits_to_unknown_files():
+    with pytest.raises(PatchError, match="unknown file 'app.js'"):
+        parse_edits(json.dumps({"edits": [_edit("app.js", "x", "y")]}), UI_FILES)
+
+
+def test_applies_edits_in_order_without_touching_the_input():
+    edits = [
+        _edit("index.html", "<button id=\"add\">Add</button>", "<button id=\"add\">Add</button>\n  <button id=\"reset\">Reset</button>"),
+        _edit("index.html", "<button id=\"reset\">Reset</button>", "<button id=\"reset\">Clear</button>"),
+    ]
+    files = apply_edits(FILES, edits)
+    assert files["index.html"].endswith("<button id=\"add\">Add</button>\n  <button id=\"reset\">Clear</button>\n</body>")
+    assert files["style.css"] == FILES["style.css"]
+    assert "reset" not in FILES["index.html"]
+
+
+def test_matches_lines_with_different_indentation():
+    files = apply_edits(FILES, [_edit("index.html", "<ul id=\"list\"></ul>\n<button id=\"add\">Add</button>", "  <ol id=\"list\"></ol>")])
+    assert files["index.html"] == "<body>\n  <ol id=\"list\"></ol>\n</body>"
+
+
+def test_search_that_does_not_match_fails():
+    with pytest.raises(PatchError, match="not found"):
+        apply_edits(FILES, [_edit("script.js", "document.querySelector('#list')", "")])
+
+
+def test_search_that_matches_more_than_once_fails():
+    with pytest.raises(PatchError, match="ambiguous"):
+        apply_edits(FILES, [_edit("style.css", "padding: 0;", "padding: 4px;")])
+    # Also when only the whitespace-insensitive fallback finds several matches
+    with pytest.raises(PatchError, match="ambiguous"):
+        apply_edits(FILES, [_edit("style.css", "    padding: 0;\n}", "")])
+
+
+def test_edit_to_a_file_that_does_not_exist_fails():
+    files = {name: content for name, content in FILES.items() if name != "script.js"}
+    with pytest.raises(PatchError, match="Edit 0 on script.js"):
+        apply_edits(files, [_edit("script.js", "const list", "let list")])
+
+
+class _Service:
+    """LLMService with generate_text and generate_ui replaced by canned responses."""
+
+    def __init__(self, service, edit_response):
+        self.service = service
+        self.regenerated = []
+
+        async def generate_text(prompt, *args, **kwargs):
+            return edit_response
+
+        async def generate_ui(requirement, *args, **kwargs):
+            self.regenerated.append(kwargs.get("previous"))
+            return {name: f"regenerated {name}" for name in UI_FILES}
+
+        service.generate_text = generate_text
+        service.generate_ui = generate_ui
+
+
+@pytest.mark.parametrize("edit_response", [
+    json.dumps({"edits": [_edit("script.js", "no such line", "")]}),
+    json.dumps({"edits": []}),
+    "Sorry, I can't produce edits for that.",
+])
+def test_modification_falls_back_to_full_regeneration(make_llm_service, edit_response):
+    stub = _Service(make_llm_service(), edit_response)
+    files = asyncio.run(stub.service.modify_ui("Add a reset button", FILES))
+
+    assert files == {name: f"regenerated {name}" for name in UI_FILES}
+    assert stub.regenerated == [FILES]
+
+
+def test_modification_applies_a_clean_patch(make_llm_service):
+    edits = [_edit("index.html", "<button id=\"add\">Add</button>", "<button id=\"add\">Add</button>\n  <button id=\"reset\">Reset</button>")]
+    stub = _Service(make_llm_service(), json.dumps({"edits": edits}))
+    files = asyncio.run(stub.service.modify_ui("Add a reset button", FILES))
+
+    assert "<button id=\"reset\">Reset</button>" in files["index.html"]
+    assert files["script.js"] == FILES["script.js"]
+    assert stub.regenerated == []
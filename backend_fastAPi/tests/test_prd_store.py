@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from routes.prd import resolve_prd
+from services.prd_service import PRDService
+from services.prd_store import MemoryPRDBackend, PRDStore, SQLitePRDBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    def make(max_entries=1000, ttl=3600.0):
+        if request.param == "memory":
+            return MemoryPRDBackend(max_entries, ttl)
+        return SQLitePRDBackend(str(tmp_path / "prds.db"), max_entries, ttl)
+    return make
+
+
+def test_saved_prd_can_be_fetched_by_id(make_backend):
+    async def run():
+        store = PRDStore(make_backend())
+        record = await store.save("A todo list", "1. Overview")
+        return record, await store.get(record.id), await store.get("unknown"), store.stats()
+
+    record, fetched, unknown, stats = asyncio.run(run())
+    assert (fetched.id, fetched.requirement, fetched.prd) == (record.id, "A todo list", "1. Overview")
+    assert unknown is None
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_expired_prds_are_not_returned(make_backend):
+    async def run():
+        store = PRDStore(make_backend(ttl=0.0))
+        record = await store.save("A todo list", "1. Overview")
+        return await store.get(record.id)
+
+    assert asyncio.run(run()) is None
+
+
+def test_least_recently_used_prd_is_dropped(make_backend):
+    async def run():
+        store = PRDStore(make_backend(max_entries=2))
+        first = await store.save("first", "prd")
+        second = await store.save("second", "prd")
+        await store.get(first.id)
+        await store.save("third", "prd")
+        return await store.get(first.id), await store.get(second.id)
+
+    first, second = asyncio.run(run())
+    assert first is not None
+    assert second is None
+
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "prds.db")
+
+    async def run():
+        # Each uvicorn worker builds its own store on the same file
+        writer = PRDStore(SQLitePRDBackend(path, 1000, 3600.0))
+        reader = PRDStore(SQLitePRDBackend(path, 1000, 3600.0))
+        record = await writer.save("A todo list", "1. Overview")
+        return record, await reader.get(record.id)
+
+    record, fetched = asyncio.run(run())
+    assert fetched is not None and fetched.prd == record.prd
+
+
+def _service() -> PRDService:
+    return PRDService(llm_service=object(), store=PRDStore(MemoryPRDBackend(1000, 3600.0)))
+
+
+def test_unknown_id_falls_back_to_the_prd_the_client_sent():
+    resolved = asyncio.run(resolve_prd(_service(), "unknown", "A todo list", "1. Overview"))
+    assert resolved == ("A todo list", "1. Overview")
+
+
+def test_unknown_id_without_a_fallback_is_not_found():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(resolve_prd(_service(), "unknown", "A todo list", None))
+    assert error.value.status_code == 404
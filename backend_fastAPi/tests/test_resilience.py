@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from services import resilience
+from services.completion import CODE_POLICY
+from services.resilience import CircuitBreaker, CircuitOpenError, HedgePolicy
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opens == 1
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.rejected == 1
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    clock.now += 30.0
+
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_the_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    clock.now += 30.0
+    breaker.before_call()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opens == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_abandoned_probe_frees_the_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    clock.now += 30.0
+    breaker.before_call()
+
+    breaker.record_abandoned()
+    assert breaker.state == "half_open"
+    breaker.before_call()
+
+
+class _Attempts:
+    """Stand-in for LLMService._attempt_prediction: the first call hangs, later ones succeed."""
+
+    def __init__(self, service):
+        self.service = service
+        self.calls = 0
+        self.cancelled = 0
+        self.peak_active = 0
+
+    async def __call__(self, payload, policy, model):
+        self.calls += 1
+        self.peak_active = max(self.peak_active, self.service.scheduler.stats()["active"])
+        if self.calls > 1:
+            return {"status": "succeeded", "output": ["hedge"]}
+        try:
+            await asyncio.sleep(0.2)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return {"status": "succeeded", "output": ["primary"]}
+
+
+def _hedging_service(make_llm_service, max_concurrency):
+    service = make_llm_service(max_concurrency=max_concurrency)
+    service.hedge_policy = HedgePolicy(enabled=True, after=0.01, min_samples=1000)
+    attempts = _Attempts(service)
+    service._attempt_prediction = attempts
+    return service, attempts
+
+
+def test_hedge_wins_and_cancels_the_primary(make_llm_service):
+    service, attempts = _hedging_service(make_llm_service, max_concurrency=2)
+
+    async def run():
+        async with service.scheduler.slot():
+            return await service._hedged_prediction({}, CODE_POLICY, service.model)
+
+    result = asyncio.run(run())
+    assert result["output"] == ["hedge"]
+    assert attempts.cancelled == 1
+    assert (service.hedges, service.hedge_wins, service.hedges_skipped) == (1, 1, 0)
+    # The hedge ran in a slot of its own, and both slots were given back
+    assert attempts.peak_active == 2
+    assert service.scheduler.stats()["active"] == 0
+
+
+def test_hedge_is_skipped_when_the_scheduler_is_saturated(make_llm_service):
+    service, attempts = _hedging_service(make_llm_service, max_concurrency=1)
+
+    async def run():
+        async with service.scheduler.slot():
+            return await service._hedged_prediction({}, CODE_POLICY, service.model)
+
+    result = asyncio.run(run())
+    assert result["output"] == ["primary"]
+    assert attempts.calls == 1
+    assert (service.hedges, service.hedges_skipped) == (0, 1)
+    assert service.scheduler.stats()["active"] == 0
+
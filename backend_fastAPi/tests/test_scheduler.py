@@ -0,0 +1,129 @@
+import asyncio
+
+from services.job_service import build_job_handlers
+from services.scheduler import LLMScheduler, Priority
+
+
+async def _admission_order(scheduler: LLMScheduler, priorities):
+    order = []
+    release = asyncio.Event()
+
+    async def hold():
+        async with scheduler.slot(Priority.NORMAL):
+            await release.wait()
+
+    async def call(name, priority):
+        async with scheduler.slot(priority):
+            order.append(name)
+
+    holder = asyncio.ensure_future(hold())
+    await asyncio.sleep(0)
+    waiters = [asyncio.ensure_future(call(name, priority)) for name, priority in priorities]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(holder, *waiters)
+    return order
+
+
+def test_waiting_calls_are_admitted_by_priority():
+    order = asyncio.run(_admission_order(LLMScheduler(max_concurrency=1), [
+        ("background", Priority.BACKGROUND),
+        ("normal", Priority.NORMAL),
+        ("interactive", Priority.INTERACTIVE),
+    ]))
+    assert order == ["interactive", "normal", "background"]
+
+
+def test_equal_priorities_are_first_in_first_out():
+    order = asyncio.run(_admission_order(LLMScheduler(max_concurrency=1), [
+        ("first", Priority.NORMAL),
+        ("second", Priority.NORMAL),
+        ("third", Priority.NORMAL),
+    ]))
+    assert order == ["first", "second", "third"]
+
+
+def test_concurrency_never_exceeds_limit():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=2)
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with scheduler.slot():
+                peak = max(peak, scheduler.stats()["active"])
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        return peak, scheduler.stats()["active"]
+
+    assert asyncio.run(run()) == (2, 0)
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=1)
+        release = asyncio.Event()
+        order = []
+
+        async def hold():
+            async with scheduler.slot():
+                await release.wait()
+
+        async def call(name, priority):
+            async with scheduler.slot(priority):
+                order.append(name)
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(call("cancelled", Priority.INTERACTIVE))
+        waiting = asyncio.ensure_future(call("waiting", Priority.BACKGROUND))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        release.set()
+        await asyncio.gather(holder, waiting, cancelled, return_exceptions=True)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(run())
+    assert order == ["waiting"]
+    assert stats["active"] == 0
+    assert stats["queued"] == {"interactive": 0, "normal": 0, "background": 0}
+
+
+class _RecordingAgent:
+    def __init__(self):
+        self.priority = None
+
+    async def process_requirement(self, requirement, options=None, use_cache=True, priority=Priority.NORMAL):
+        self.priority = priority
+        return {"requirement": requirement}
+
+
+def test_queued_generate_jobs_run_at_background_priority():
+    agent = _RecordingAgent()
+    handlers = build_job_handlers(agent, prd_service=None)
+    asyncio.run(handlers["generate"]({"requirement": "A todo list"}))
+    assert agent.priority == Priority.BACKGROUND
+
+
+def test_try_acquire_takes_only_a_free_slot():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=2)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot():
+                await release.wait()
+
+        holders = [asyncio.ensure_future(hold()) for _ in range(3)]
+        await asyncio.sleep(0)
+        # Two slots held and one call queued: a free slot must not be taken past the queue
+        saturated = scheduler.try_acquire()
+        release.set()
+        await asyncio.gather(*holders)
+        free = scheduler.try_acquire()
+        active = scheduler.stats()["active"]
+        scheduler.release()
+        return saturated, free, active, scheduler.stats()["active"]
+
+    assert asyncio.run(run()) == (False, True, 1, 0)
@@ -0,0 +1,102 @@
+from bench.load_test import requirement_for
+from services.similarity_index import SimilarityIndex, jaccard, shingles
+
+RESULT = {"files": {"index.html": "<ul id=\"list\"></ul>"}}
+
+
+def _index(**kwargs) -> SimilarityIndex:
+    return SimilarityIndex(serve_threshold=0.9, seed_threshold=0.6, **kwargs)
+
+
+def _bucket_ids(index: SimilarityIndex):
+    return {entry_id for buckets in index._buckets for ids in buckets.values() for entry_id in ids}
+
+
+def test_rewording_is_served():
+    index = _index()
+    index.add("a todo list with dark mode", RESULT)
+    action, entry, score = index.lookup("Create a dark-mode todo list")
+
+    assert (action, score) == ("serve", 1.0)
+    assert entry.result == RESULT
+
+
+def test_lookup_classifies_by_threshold():
+    index = _index()
+    index.add("todo list with dark mode", RESULT)
+    requirement = "todo list with dark mode and due dates"
+    score = jaccard(shingles(requirement), shingles("todo list with dark mode"))
+    assert 0.6 <= score < 0.9
+
+    assert index.lookup(requirement)[0] == "seed"
+    index.seed_threshold = score + 0.01
+    assert index.lookup(requirement)[0] == "miss"
+    index.seed_threshold, index.serve_threshold = 0.6, score
+    assert index.lookup(requirement)[0] == "serve"
+    assert (index.lookups, index.served, index.seeded, index.misses) == (3, 1, 1, 1)
+
+
+def test_unrelated_requirement_misses():
+    index = _index()
+    index.add("todo list with dark mode", RESULT)
+    action, entry, _ = index.lookup("weather dashboard for three cities")
+
+    assert (action, entry) == ("miss", None)
+
+
+def test_served_result_is_a_copy():
+    index = _index()
+    index.add("todo list", RESULT)
+    _, entry, _ = index.lookup("todo list")
+    entry.result["files"]["index.html"] = "changed"
+
+    assert index.lookup("todo list")[1].result == RESULT
+
+
+def test_least_recently_used_entry_is_evicted():
+    index = _index(max_entries=2)
+    index.add("todo list with dark mode", RESULT)
+    index.add("weather dashboard for three cities", RESULT)
+    # Serving the first requirement makes the second the least recently used
+    assert index.lookup("todo list with dark mode")[0] == "serve"
+    index.add("calculator with memory buttons", RESULT)
+
+    assert index.lookup("todo list with dark mode")[0] == "serve"
+    assert index.lookup("weather dashboard for three cities")[0] == "miss"
+    assert len(index._entries) == 2
+
+
+def test_evicted_entries_leave_no_buckets_behind():
+    index = _index(max_entries=3)
+    for number in range(20):
+        index.add(f"dashboard number {number} with chart {number * 7}", RESULT)
+
+    assert _bucket_ids(index) == set(index._entries)
+    assert len(index._entries) == 3
+
+
+def test_disabled_index_never_matches():
+    index = _index(enabled=False)
+    index.add("todo list", RESULT)
+
+    assert index.lookup("todo list") == ("miss", None, 0.0)
+    assert index.stats()["entries"] == 0
+
+
+def test_match_of_another_variant_is_only_seeded():
+    index = _index()
+    index.add("todo list with dark mode", RESULT, variant="full")
+
+    assert index.lookup("todo list with dark mode", variant="code-only")[0] == "seed"
+    assert index.lookup("todo list with dark mode", variant="full")[0] == "serve"
+
+
+def test_bench_requirements_are_unrelated():
+    index = _index()
+    for variant in range(100):
+        index.add(requirement_for(variant), RESULT)
+
+    assert index.lookup(requirement_for(100))[0] == "miss"
+    assert max(
+        jaccard(shingles(requirement_for(0)), shingles(requirement_for(variant))) for variant in range(1, 100)
+    ) < 0.2
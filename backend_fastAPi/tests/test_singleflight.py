@@ -0,0 +1,71 @@
+import asyncio
+
+from services.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def run():
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(3)))
+        return results, calls, flight.stats()
+
+    results, calls, stats = asyncio.run(run())
+    assert results == ["result"] * 3
+    assert calls == 1
+    assert (stats["leaders"], stats["deduplicated"], stats["in_flight"]) == (1, 2, 0)
+
+
+def test_shared_call_survives_one_waiter_leaving():
+    async def run():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "result"
+
+        leaving = asyncio.ensure_future(flight.do("key", work))
+        staying = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        return await staying, flight.stats()
+
+    result, stats = asyncio.run(run())
+    assert result == "result"
+    assert stats["abandoned"] == 0
+
+
+def test_caller_joining_right_after_the_last_waiter_left_starts_a_new_call():
+    async def run():
+        flight = SingleFlight()
+        started = []
+
+        async def work():
+            started.append(len(started))
+            await asyncio.sleep(0.01)
+            return f"call {len(started)}"
+
+        async def leave_then_join():
+            try:
+                await flight.do("key", work)
+            except asyncio.CancelledError:
+                pass
+            # Same step: the abandoned call has been told to cancel but hasn't finished yet
+            return await flight.do("key", work)
+
+        caller = asyncio.ensure_future(leave_then_join())
+        await asyncio.sleep(0)
+        caller.cancel()
+        return await caller, started, flight.stats()
+
+    result, started, stats = asyncio.run(run())
+    assert result == "call 2"
+    assert started == [0, 1]
+    assert (stats["leaders"], stats["abandoned"], stats["in_flight"]) == (2, 1, 0)
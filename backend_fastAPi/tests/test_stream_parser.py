@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import pytest
+
+from services.completion import CODE_POLICY
+from services.llm_service import LLMServiceError
+from services.scheduler import Priority
+from services.stream_parser import FileStreamParser
+
+FILES = {
+    "index.html": '<button class="add" data-label="Say \\"hi\\"">Add</button>',
+    "style.css": "body {\n  content: \"\\201C\";\n}",
+    "script.js": "alert('caf\u00e9 \u2713 \U0001F600');\n",
+}
+
+
+def _feed(parser: FileStreamParser, text: str, size: int):
+    deltas = []
+    for start in range(0, len(text), size):
+        deltas.extend(parser.feed(text[start:start + size]))
+    return deltas
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_decodes_escapes_split_across_chunks(size):
+    # ensure_ascii turns the non-ASCII characters (and the emoji's surrogate pair) into \u escapes
+    text = json.dumps(FILES, ensure_ascii=True)
+    parser = FileStreamParser()
+    deltas = _feed(parser, text, size)
+
+    assert parser.files == FILES
+    assert parser.completed == list(FILES)
+    assert parser.done and not parser.truncated
+    for name, content in FILES.items():
+        assert "".join(delta for file, delta in deltas if file == name) == content
+
+
+def test_skips_leading_prose_with_braces():
+    text = 'Sure! The {files} map to {"roles"} below:\n```json\n' + json.dumps(FILES) + "\n```\nDone {ok}."
+    parser = FileStreamParser()
+    parser.feed(text)
+
+    assert parser.files == FILES
+    assert parser.done
+
+
+def test_truncated_output_keeps_completed_files():
+    text = json.dumps(FILES)
+    cut = text.index("script.js") + len('script.js": "alert(')
+    parser = FileStreamParser()
+    parser.feed(text[:cut])
+
+    assert parser.truncated and not parser.done
+    assert parser.completed == ["index.html", "style.css"]
+    assert parser.files["script.js"] == "alert("
+    assert parser.missing(FILES) == ["script.js"]
+
+
+def test_output_without_an_object_is_not_truncated():
+    parser = FileStreamParser()
+    parser.feed("I can't help with that {sorry}.")
+
+    assert parser.files == {}
+    assert not parser.truncated and not parser.done
+
+
+class _Responses:
+    """Stand-in for LLMService.generate_text that records the prompts it gets."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    async def __call__(self, prompt, *args, **kwargs):
+        self.prompts.append(prompt)
+        return self.responses.pop(0)
+
+
+def _truncated_parser() -> FileStreamParser:
+    text = json.dumps(FILES)
+    parser = FileStreamParser()
+    parser.feed(text[:text.index('"style.css"') + len('"style.css": "body')])
+    return parser
+
+
+def test_repair_regenerates_only_the_missing_files(make_llm_service):
+    service = make_llm_service()
+    service.generate_text = _Responses(json.dumps({name: FILES[name] for name in ("style.css", "script.js")}))
+
+    files = asyncio.run(service._complete_ui_files(
+        "A button", None, _truncated_parser(), CODE_POLICY, use_cache=False, priority=Priority.NORMAL
+    ))
+
+    assert files == FILES
+    [prompt] = service.generate_text.prompts
+    assert '"style.css": "<complete content of style.css>"' in prompt
+    assert '"script.js": "<complete content of script.js>"' in prompt
+    assert '"index.html": "<complete content' not in prompt
+    # The file that did arrive is passed along as context, unchanged
+    assert FILES["index.html"] in prompt
+
+
+def test_repair_that_does_not_deliver_fails(make_llm_service):
+    service = make_llm_service()
+    service.ui_repair_attempts = 2
+    service.generate_text = _Responses(
+        json.dumps({"style.css": FILES["style.css"]}),
+        '{"script.js": "cut off',
+    )
+
+    with pytest.raises(LLMServiceError):
+        asyncio.run(service._complete_ui_files(
+            "A button", None, _truncated_parser(), CODE_POLICY, use_cache=False, priority=Priority.NORMAL
+        ))
+    # The second round only asked for what the first one still lacked
+    assert '"style.css": "<complete' not in service.generate_text.prompts[1]
+    assert '"script.js": "<complete content of script.js>"' in service.generate_text.prompts[1]
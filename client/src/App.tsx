@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useMemo, useRef } from "react";
 import Editor from "@monaco-editor/react";
 import { ThemeProvider } from "@emotion/react";
 import styled from "@emotion/styled";
@@ -12,26 +12,26 @@ import { PRDPanel } from "./components/PRDPanel";
 import { ChatPanel } from "./components/ChatPanel";
 import { ChatThread } from "./components/ChatThread";
 import { Message, MessageCategory } from "./types/chat";
-
-interface GenerateResponse {
-  files: {
-    "index.html": string;
-    "style.css": string;
-    "script.js": string;
-  };
-  analysis?: string;
-  plan?: string;
-  feedback?: string;
-}
+import { GenerateResponse } from "./types/generate";
+import {
+  StreamHandlers,
+  StreamRequestError,
+  streamGenerate,
+} from "./utils/streamGenerate";
+import { SessionSocket } from "./utils/sessionSocket";
 
 interface PRDResponse {
   prd: string;
+  prd_id?: string;
 }
 
 function App() {
   const [requirement, setRequirement] = useState("");
   const [loading, setLoading] = useState(false);
   const [prd, setPRD] = useState<string | null>(null);
+  const [prdId, setPRDId] = useState<string | null>(null);
+  // Follow-up requests in this tab modify the UI generated for this session
+  const [sessionId] = useState(() => crypto.randomUUID());
   const [response, setResponse] = useState<GenerateResponse | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [copyStatus, setCopyStatus] = useState<{ [key: string]: boolean }>({});
@@ -40,6 +40,60 @@ function App() {
   const [activeFile, setActiveFile] = useState("index.html");
   const [messages, setMessages] = useState<Message[]>([]);
   const [files, setFiles] = useState<Record<string, string>>({});
+  const [streaming, setStreaming] = useState(false);
+  // Follow-up edits go over one connection; the server keeps the files
+  const sessionSocket = useMemo(
+    () => new SessionSocket("ws://localhost:8000/ws/session", sessionId),
+    [sessionId]
+  );
+
+  useEffect(() => () => sessionSocket.close(), [sessionSocket]);
+
+  // Files as of the last finished edit turn; a cancelled turn's partial edits roll back to them
+  const committedFiles = useRef<Record<string, string>>({});
+  const turnsRunning = useRef(0);
+
+  const handleEditTurn = async (message: string) => {
+    if (turnsRunning.current === 0) {
+      committedFiles.current = files;
+    }
+    turnsRunning.current += 1;
+    let working = { ...committedFiles.current };
+    setStreaming(true);
+    try {
+      const outcome = await sessionSocket.turn(message, {
+        onFileDelta: (file, delta, reset) => {
+          working = {
+            ...working,
+            [file]: (reset ? "" : working[file] || "") + delta,
+          };
+          setFiles(working);
+        },
+        onResult: (result) => setResponse(result),
+      });
+      if (outcome === "done") {
+        committedFiles.current = working;
+      } else {
+        setFiles(committedFiles.current);
+      }
+    } catch (err) {
+      console.error("Error:", err);
+      setFiles(committedFiles.current);
+      setMessages((prev) => [
+        ...prev,
+        {
+          type: "agent",
+          content: "Sorry, that change failed. Please try again.",
+          category: "error",
+        },
+      ]);
+    } finally {
+      turnsRunning.current -= 1;
+      if (turnsRunning.current === 0) {
+        setStreaming(false);
+      }
+    }
+  };
 
   const handleSendMessage = async (message: string) => {
     setMessages((prev) => [
@@ -51,6 +105,12 @@ function App() {
       },
     ]);
 
+    if (response) {
+      // Sending a new change while one is running cancels the running one
+      await handleEditTurn(message);
+      return;
+    }
+
     setLoading(true);
     try {
       // Generate PRD first
@@ -70,6 +130,7 @@ function App() {
 
       // Set PRD and wait for approval
       setPRD(prdResult.data.prd);
+      setPRDId(prdResult.data.prd_id ?? null);
       setRequirement(message);
     } catch (err) {
       console.error("Error:", err);
@@ -89,44 +150,80 @@ function App() {
 
   const handlePRDApproval = async (approved: boolean) => {
     if (!approved || !prd || !requirement) {
+      // Stop any UI generation the backend started for this PRD
+      if (!approved && prdId) {
+        axios
+          .post("http://localhost:8000/reject-prd", { prd_id: prdId })
+          .catch((err) => console.error("Error:", err));
+      }
       setPRD(null);
       return;
     }
 
     setLoading(true);
-    try {
-      const result = await axios.post<GenerateResponse>(
-        "http://localhost:8000/approve-prd",
-        { requirement, prd, approved }
-      );
-
-      if (result.data.analysis) {
-        setMessages((prev) => [
-          ...prev,
-          {
-            type: "agent",
-            content: result.data.analysis!,
-            category: "analysis",
-          },
-        ]);
-      }
-      if (result.data.plan) {
-        setMessages((prev) => [
+    // Stream the generation so code renders in the editor as it arrives;
+    // the approved PRD is referenced by id so the backend builds from it
+    const url = "http://localhost:8000/generate/stream";
+    const body = {
+      requirement,
+      session_id: sessionId,
+      ...(prdId ? { prd_id: prdId } : { prd }),
+      // Files we already have come back as hashes only
+      known_artifacts: Object.values(response?.artifacts ?? {}),
+    };
+    const handlers: StreamHandlers = {
+      onStage: (stage, status) => {
+        if (stage === "files" && status === "started") {
+          setFiles({});
+          setStreaming(true);
+          setPRD(null);
+        }
+      },
+      onFileDelta: (file, delta, reset) => {
+        setFiles((prev) => ({
           ...prev,
-          {
-            type: "agent",
-            content: result.data.plan!,
-            category: "plan",
-          },
-        ]);
-      }
+          [file]: (reset ? "" : prev[file] || "") + delta,
+        }));
+      },
+      onResult: (result) => {
+        if (result.analysis) {
+          setMessages((prev) => [
+            ...prev,
+            {
+              type: "agent",
+              content: result.analysis!,
+              category: "analysis",
+            },
+          ]);
+        }
+        if (result.plan) {
+          setMessages((prev) => [
+            ...prev,
+            {
+              type: "agent",
+              content: result.plan!,
+              category: "plan",
+            },
+          ]);
+        }
 
-      setResponse(result.data);
-      setPRD(null);
+        setResponse(result);
+        setPRD(null);
+      },
+    };
+    try {
+      try {
+        await streamGenerate(url, body, handlers);
+      } catch (err) {
+        // A backend worker that didn't write the PRD may not know its id; send the PRD itself
+        if (!(err instanceof StreamRequestError && err.status === 404 && prdId)) throw err;
+        await streamGenerate(url, { ...body, prd }, handlers);
+      }
     } catch (err) {
       console.error("Error:", err);
       setError("Failed to generate UI. Please try again.");
     } finally {
+      setStreaming(false);
       setLoading(false);
     }
   };
@@ -168,10 +265,11 @@ function App() {
     }));
   };
 
-  // Initialize files when response changes
+  // Initialize files when response changes; files left out of the
+  // response are unchanged and already in state
   useEffect(() => {
     if (response?.files) {
-      setFiles(response.files);
+      setFiles((prev) => ({ ...prev, ...response.files }));
     }
   }, [response]);
 
@@ -187,7 +285,7 @@ function App() {
               onReject={() => handlePRDApproval(false)}
             />
           </InitialLayout>
-        ) : !response ? (
+        ) : !response && !streaming ? (
           <InitialLayout>
             <ChatThread
               messages={messages}
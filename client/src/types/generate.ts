@@ -0,0 +1,14 @@
+export interface GenerateResponse {
+  files: {
+    "index.html": string;
+    "style.css": string;
+    "script.js": string;
+  };
+  analysis?: string;
+  plan?: string;
+  feedback?: string;
+  // Content hash per file, fetchable from /artifacts/{hash}
+  artifacts?: Record<string, string>;
+  bundle?: string;
+  session_id?: string;
+}
@@ -0,0 +1,119 @@
+import { StreamHandlers } from "./streamGenerate";
+
+export type TurnOutcome = "done" | "cancelled";
+
+interface ServerMessage {
+  type: string;
+  turn?: number;
+  data: any;
+}
+
+interface PendingTurn {
+  handlers: StreamHandlers;
+  resolve: (outcome: TurnOutcome) => void;
+  reject: (error: Error) => void;
+  error?: string;
+}
+
+// One WebSocket per editing session. The server keeps the session's files,
+// so a turn only sends the requirement and only changed files come back.
+export class SessionSocket {
+  private socket?: WebSocket;
+  private opening?: Promise<WebSocket>;
+  private turns = new Map<number, PendingTurn>();
+  // The server numbers turns per connection in the order they are sent
+  private turnCount = 0;
+
+  constructor(private url: string, private sessionId: string) {}
+
+  private connect(): Promise<WebSocket> {
+    if (this.socket?.readyState === WebSocket.OPEN) {
+      return Promise.resolve(this.socket);
+    }
+    if (!this.opening) {
+      this.opening = new Promise((resolve, reject) => {
+        const socket = new WebSocket(
+          `${this.url}?session_id=${encodeURIComponent(this.sessionId)}`
+        );
+        socket.onopen = () => {
+          this.socket = socket;
+          this.opening = undefined;
+          this.turnCount = 0;
+          resolve(socket);
+        };
+        socket.onerror = () => {
+          this.opening = undefined;
+          reject(new Error("Session connection failed"));
+        };
+        socket.onmessage = (event) => this.dispatch(JSON.parse(event.data));
+        socket.onclose = () => {
+          this.socket = undefined;
+          // Turns still running were cancelled on the server with the connection
+          this.turns.forEach((turn) => turn.reject(new Error("Session connection closed")));
+          this.turns.clear();
+        };
+      });
+    }
+    return this.opening;
+  }
+
+  // Apply a change to the session's files; a turn still running is cancelled
+  async turn(requirement: string, handlers: StreamHandlers): Promise<TurnOutcome> {
+    const socket = await this.connect();
+    const turn = ++this.turnCount;
+    return new Promise((resolve, reject) => {
+      this.turns.set(turn, { handlers, resolve, reject });
+      socket.send(JSON.stringify({ type: "turn", requirement }));
+    });
+  }
+
+  cancel() {
+    this.socket?.send(JSON.stringify({ type: "cancel" }));
+  }
+
+  close() {
+    this.socket?.close();
+  }
+
+  private dispatch(message: ServerMessage) {
+    if (message.turn === undefined) {
+      if (message.type === "error") console.error("Session error:", message.data.detail);
+      return;
+    }
+    const pending = this.turns.get(message.turn);
+    if (!pending) return;
+
+    const { handlers } = pending;
+    const data = message.data;
+    switch (message.type) {
+      case "stage":
+        handlers.onStage?.(data.stage, data.status);
+        break;
+      case "analysis":
+      case "plan":
+        handlers.onText?.(message.type as "analysis" | "plan", data.delta);
+        break;
+      case "file":
+        handlers.onFileDelta?.(data.file, data.delta, data.reset);
+        break;
+      case "result":
+        handlers.onResult?.(data);
+        break;
+      case "error":
+        pending.error = data.detail;
+        break;
+      case "cancelled":
+        this.turns.delete(message.turn);
+        pending.resolve("cancelled");
+        break;
+      case "done":
+        this.turns.delete(message.turn);
+        if (pending.error) {
+          pending.reject(new Error(pending.error));
+        } else {
+          pending.resolve("done");
+        }
+        break;
+    }
+  }
+}
@@ -0,0 +1,82 @@
+import { GenerateResponse } from "../types/generate";
+
+export interface StreamHandlers {
+  onStage?: (stage: string, status: string) => void;
+  onText?: (stage: "analysis" | "plan", delta: string) => void;
+  // `reset` means the file is being regenerated: drop what was received so far
+  onFileDelta?: (file: string, delta: string, reset?: boolean) => void;
+  onResult?: (result: GenerateResponse) => void;
+}
+
+const dispatchEvent = (raw: string, handlers: StreamHandlers) => {
+  let event = "message";
+  const dataLines: string[] = [];
+
+  raw.split("\n").forEach((line) => {
+    if (line.startsWith("event:")) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith("data:")) {
+      dataLines.push(line.slice(5).trimStart());
+    }
+  });
+  if (dataLines.length === 0) return;
+
+  const data = JSON.parse(dataLines.join("\n"));
+  switch (event) {
+    case "stage":
+      handlers.onStage?.(data.stage, data.status);
+      break;
+    case "analysis":
+    case "plan":
+      handlers.onText?.(event, data.delta);
+      break;
+    case "file":
+      handlers.onFileDelta?.(data.file, data.delta, data.reset);
+      break;
+    case "result":
+      handlers.onResult?.(data);
+      break;
+    case "error":
+      throw new Error(data.detail);
+  }
+};
+
+// The request was rejected before any event was streamed
+export class StreamRequestError extends Error {
+  constructor(public status: number) {
+    super(`Stream request failed with status ${status}`);
+  }
+}
+
+// POST to a server-sent-events endpoint and dispatch events as they arrive
+export const streamGenerate = async (
+  url: string,
+  body: unknown,
+  handlers: StreamHandlers
+): Promise<void> => {
+  const response = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+  });
+  if (!response.ok || !response.body) {
+    throw new StreamRequestError(response.status);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      dispatchEvent(buffer.slice(0, boundary), handlers);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+    }
+  }
+};